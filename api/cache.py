@@ -0,0 +1,91 @@
+"""
+api/cache.py
+------------
+In-process response cache and ETags keyed by the store's per-user data version.
+
+Polled read endpoints hand their computation to :meth:`ResponseCache.respond`.
+The ETag is derived from the user's ``data_version`` (plus any extra
+``vary`` value such as today's date), so
+
+* a client sending a matching ``If-None-Match`` gets ``304 Not Modified``;
+* otherwise a body cached for the same URL and version is replayed;
+
+and in both cases SQLite is never touched. A write bumps the version, which
+changes the key, so stale entries are simply never asked for again and age out
+of the LRU.
+
+Public surface:
+    ResponseCache(max_entries)
+        .respond(request, version, compute, *args, vary, **kwargs) -> Response
+        .stats()                                                   -> dict
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    async def respond(
+        self,
+        request: Request,
+        version: int,
+        compute: Callable[..., Awaitable[Any]],
+        *args: Any,
+        vary: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Response:
+        """Return ``await compute(*args, **kwargs)`` as JSON, cached per data version."""
+        # Versions are stored with the data, so every worker issues the same ETag.
+        etag = f'W/"{version}' + (f"-{vary}" if vary else "") + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        matches = _parse_if_none_match(request.headers.get("if-none-match"))
+        if etag in matches or "*" in matches:
+            self._count("not_modified")
+            return Response(status_code=304, headers=headers)
+
+        key = (str(request.url.path) + "?" + str(request.url.query), etag)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+        if body is not None:
+            self._count("hits")
+        else:
+            self._count("misses")
+            body = json.dumps(jsonable_encoder(await compute(*args, **kwargs))).encode("utf-8")
+            with self._lock:
+                self._entries[key] = body
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats, entries=len(self._entries))
+        served = stats["hits"] + stats["misses"] + stats["not_modified"]
+        stats["hit_rate"] = round((stats["hits"] + stats["not_modified"]) / served, 4) if served else None
+        return stats
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+
+
+def _parse_if_none_match(header: Optional[str]) -> set:
+    if not header:
+        return set()
+    # Weak comparison: W/"x" and "x" match each other.
+    tags = {tag.strip() for tag in header.split(",")}
+    return tags | {f"W/{tag}" for tag in tags if not tag.startswith("W/")}
@@ -0,0 +1,209 @@
+"""
+api/compression.py
+------------------
+Response compression (Brotli when available, otherwise gzip) for the API.
+
+Transaction pages, searches and exports are mostly templated SMS text and
+shrink several-fold. ``CompressionMiddleware`` is plain ASGI, so it adds no
+buffering of its own.
+
+* Complete responses are compressed only when the body reaches
+  ``minimum_size``. Smaller ones are passed through untouched.
+* Streaming responses (NDJSON, CSV exports) are compressed chunk by chunk.
+  Each chunk is flushed, so the client can decode every piece as it arrives.
+* ``text/event-stream``, already-encoded bodies and non-text media types are
+  never touched.
+
+Bytes in and out per encoding go to ``/metrics`` as counters, together with
+a ``http_compression_ratio`` gauge (compressed / original).
+
+Env:
+    COMPRESSION_MIN_BYTES    smallest complete body worth compressing (default 1024)
+    COMPRESSION_LEVEL        gzip level 1-9 (default 6; streams always use 5)
+
+Public surface:
+    CompressionMiddleware(app, minimum_size, gzip_level)   -> ASGI middleware
+    BROTLI_AVAILABLE                                       -> bool
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from services.metrics import MetricFamily, metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+_COMPRESSIBLE_PREFIXES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+)
+# Must reach the client event by event; compression would hold events back.
+_NEVER_COMPRESS = ("text/event-stream",)
+_STREAM_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 4
+
+metrics.describe("http_compression_input_bytes_total", "Response bytes before compression, by encoding")
+metrics.describe("http_compression_output_bytes_total", "Response bytes after compression, by encoding")
+
+
+class _Encoder:
+    """Incremental gzip / br compressor with a flush per streamed chunk."""
+
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=_BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: Any, minimum_size: Optional[int] = None, gzip_level: Optional[int] = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv("COMPRESSION_LEVEL", "6"))
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[int]] = {}     # encoding -> [bytes in, bytes out]
+        metrics.add_collector(self._collect)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self, encoding).run(self.app, scope, receive, send)
+
+    def _record(self, encoding: str, raw: int, compressed: int) -> None:
+        metrics.inc("http_compression_input_bytes_total", raw, encoding=encoding)
+        metrics.inc("http_compression_output_bytes_total", compressed, encoding=encoding)
+        with self._lock:
+            totals = self._totals.setdefault(encoding, [0, 0])
+            totals[0] += raw
+            totals[1] += compressed
+
+    def _collect(self) -> Iterator[MetricFamily]:
+        with self._lock:
+            samples = [({"encoding": enc}, out / raw) for enc, (raw, out) in sorted(self._totals.items()) if raw]
+        yield MetricFamily("http_compression_ratio", "gauge", "Compressed / original response bytes", samples)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start: Optional[Dict[str, Any]] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+        self.raw = self.compressed = 0
+
+    async def run(self, app: Any, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        self.send = send
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Dict[str, Any]) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            self.passthrough = not _compressible(message)
+            if self.passthrough:
+                await self.send(message)
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.encoder is None:
+            if not more and len(body) < self.middleware.minimum_size:
+                # Complete and small: not worth the CPU or the header bytes.
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            level = self.middleware.gzip_level if not more else _STREAM_GZIP_LEVEL
+            self.encoder = _Encoder(self.encoding, level)
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more:
+                del headers["Content-Length"]
+            else:
+                out = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(out))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": out})
+                self.middleware._record(self.encoding, len(body), len(out))
+                return
+            await self.send(self.start)
+
+        out = self.encoder.chunk(body) if more else self.encoder.finish(body)
+        self.raw += len(body)
+        self.compressed += len(out)
+        await self.send({"type": "http.response.body", "body": out, "more_body": more})
+        if not more:
+            self.middleware._record(self.encoding, self.raw, self.compressed)
+
+
+def _compressible(start: Dict[str, Any]) -> bool:
+    if start["status"] < 200 or start["status"] in (204, 304):
+        return False
+    headers = Headers(raw=start["headers"])
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in _NEVER_COMPRESS:
+        return False
+    return media_type.startswith(_COMPRESSIBLE_PREFIXES)
+
+
+def _negotiate(accept_encoding: str) -> Optional[str]:
+    """``"br"`` or ``"gzip"`` if the client accepts it (q > 0), else ``None``."""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        token, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if token:
+            accepted[token] = quality
+    candidates: List[Tuple[float, int, str]] = []
+    for preference, encoding in enumerate(("br", "gzip")):
+        if encoding == "br" and not BROTLI_AVAILABLE:
+            continue
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            candidates.append((quality, -preference, encoding))
+    return max(candidates)[2] if candidates else None
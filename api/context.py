@@ -0,0 +1,162 @@
+"""
+api/context.py
+--------------
+The application context: every long-lived object the routers share, built
+once per process by the FastAPI lifespan handler.
+
+Nothing here is created at import time. Importing ``api.main`` therefore
+opens no database, starts no threads and loads no models. The lifespan
+builds one :class:`AppContext`, which holds a single store (its schema
+checks and migrations run once), the async facade and its thread pool, the
+webhook write buffer, the upload job queue, the response cache and the live
+budget stream. The context is then reachable from any route through the
+``get_context`` dependency.
+
+For pre-fork servers (e.g. gunicorn with ``--preload``), call
+:func:`warm_up` in the parent. It migrates the database and loads the
+classifier model but starts no threads or pools, so forking afterwards is
+safe. Each worker's lifespan then finds the schema already checked and the
+model already in memory.
+
+Public surface:
+    AppContext                      -> dataclass of the shared services
+        .build()                    -> AppContext   (classmethod)
+        .start() / .close()         -> None
+        .collect()                  -> Iterator[MetricFamily]   (/metrics collector)
+    warm_up()                       -> None
+    lifespan(app)                   -> async context manager for FastAPI(lifespan=...)
+    get_context(request)            -> AppContext   (route dependency)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Union
+
+from fastapi import FastAPI, Request
+
+from api.cache import ResponseCache
+from api.events import BudgetStream
+from db.async_session import AsyncPersistence
+from db.jobs import JobStore
+from db.session import DataPersistence
+from db.sharding import ShardedPersistence, open_persistence
+from db.write_buffer import WriteBuffer
+from services.classifier import load_category_model
+from services.jobs import JobQueue
+from services.metrics import MetricFamily, metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AppContext:
+    store:          Union[DataPersistence, ShardedPersistence]
+    db:             AsyncPersistence
+    write_buffer:   WriteBuffer
+    jobs:           JobQueue
+    response_cache: ResponseCache
+    budget_stream:  BudgetStream
+
+    @classmethod
+    def build(cls) -> "AppContext":
+        """Open the store and create the shared services (nothing is started yet)."""
+        store = open_persistence()
+        db = AsyncPersistence(store)
+        return cls(
+            store=store,
+            db=db,
+            # Webhook deliveries are group-committed: one write transaction per
+            # flush instead of one per SMS. Tunable via env for bursty senders.
+            write_buffer=WriteBuffer(
+                store,
+                flush_interval_ms=int(os.getenv("WEBHOOK_FLUSH_MS", "50")),
+                max_batch_rows=int(os.getenv("WEBHOOK_FLUSH_ROWS", "500")),
+                max_queue=int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000")),
+            ),
+            jobs=JobQueue(JobStore(), max_workers=int(os.getenv("UPLOAD_WORKERS", "2"))),
+            # Polled read endpoints answer from here (or with 304) until the data changes.
+            response_cache=ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", "1024"))),
+            budget_stream=BudgetStream(db),
+        )
+
+    def start(self) -> None:
+        load_category_model()
+        self.jobs.store.fail_unfinished("Interrupted by a server restart")
+        self.jobs.on_finished = self._uploaded
+        self.budget_stream.attach()
+        self.write_buffer.start()
+        metrics.add_collector(self.collect)
+
+    def close(self) -> None:
+        metrics.remove_collector(self.collect)
+        self.write_buffer.close()
+        self.jobs.shutdown()
+        self.db.close()
+
+    def _uploaded(self, user_id: str) -> None:
+        # Upload workers write from other processes: the stored data version
+        # already moved, but the write listener never saw those rows. Workers
+        # also leave the columnar mirror alone; this process copies them in.
+        self.budget_stream.invalidate(user_id)
+        self.db.submit(self.store.sync_columnar).add_done_callback(_log_sync_failure)
+
+    def collect(self) -> Iterator[MetricFamily]:
+        """Cache hit rates and queue depths for ``/metrics``."""
+        cache = self.response_cache.stats()
+        yield MetricFamily("response_cache_requests_total", "counter", "Cached read endpoint lookups by outcome",
+                           [({"outcome": k}, cache[k]) for k in ("hits", "misses", "not_modified")])
+        yield MetricFamily("response_cache_hit_ratio", "gauge", "Share of lookups answered without recomputing",
+                           [({}, cache["hit_rate"] or 0.0)])
+        yield MetricFamily("response_cache_entries", "gauge", "Bodies held in the response cache",
+                           [({}, cache["entries"])])
+
+        buffer = self.write_buffer.stats()
+        yield MetricFamily("write_buffer_queue_depth", "gauge", "Webhook rows waiting for a group commit",
+                           [({}, buffer["queue_depth"])])
+        yield MetricFamily("write_buffer_queue_capacity", "gauge", "Webhook write queue capacity",
+                           [({}, buffer["queue_capacity"])])
+        yield MetricFamily("write_buffer_flushes_total", "counter", "Group-commit flushes by outcome",
+                           [({"outcome": "ok"}, buffer["flushes"]), ({"outcome": "failed"}, buffer["failed_flushes"])])
+        yield MetricFamily("write_buffer_rows_flushed_total", "counter", "Webhook rows committed by the buffer",
+                           [({}, buffer["rows_flushed"])])
+        yield MetricFamily("write_buffer_flush_seconds_max", "gauge", "Slowest group commit so far",
+                           [({}, buffer["max_flush_ms"] / 1000.0)])
+
+        jobs = self.jobs.stats()
+        yield MetricFamily("upload_jobs_in_flight", "gauge", "Upload jobs queued or running", [({}, jobs["in_flight"])])
+        yield MetricFamily("upload_workers", "gauge", "Upload worker processes", [({}, jobs["workers"])])
+
+        yield MetricFamily("budget_stream_subscribers", "gauge", "Open /budget/stream connections",
+                           [({}, self.budget_stream.subscribers)])
+
+
+def _log_sync_failure(future: "Future[int]") -> None:
+    if future.exception() is not None:
+        logger.error("Columnar mirror sync failed", exc_info=future.exception())
+
+
+def warm_up() -> None:
+    """Migrate the database and load models ahead of forking worker processes."""
+    open_persistence()
+    if load_category_model():
+        logger.info("Category model loaded")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    context = AppContext.build()
+    context.start()
+    app.state.context = context
+    try:
+        yield
+    finally:
+        context.close()
+
+
+def get_context(request: Request) -> AppContext:
+    return request.app.state.context
@@ -0,0 +1,213 @@
+"""
+api/events.py
+-------------
+Server-sent events stream of the live budget status.
+
+Clients of ``GET /budget/stream`` get the current day / week / month totals
+and remaining budget straight away, then one ``budget`` event per change.
+Between changes a client costs one idle coroutine and a periodic keep-alive
+comment.
+
+Totals are seeded once per user from the daily rollup. After that they are
+advanced from each committed insert's rows through the store's write
+listener, so a webhook delivery costs a few additions rather than a rescan.
+The event body is encoded once per change and shared by every subscriber.
+Changes the listener cannot see as a delta are reported through
+:meth:`BudgetStream.invalidate`: budget edits, deletes, and uploads written
+by the worker processes. The next event is then built from a fresh seed.
+A new day does the same.
+
+Public surface:
+    BudgetStream(db, heartbeat_seconds)
+        .attach()                   -> None   (register the write listener)
+        .invalidate(user_id)        -> None   (any thread)
+        .events(user_id)            -> AsyncIterator[bytes]   (SSE frames)
+        .subscribers                -> int
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import date
+from typing import AsyncIterator, Dict, Optional
+
+import pandas as pd
+
+from db.async_session import AsyncPersistence
+from db.export import dumps
+from services.budgeting import current_period_status_from_daily
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class _UserTotals:
+    """One user's current-period totals; guarded by ``BudgetStream._lock``."""
+
+    def __init__(self) -> None:
+        self.day: Optional[date] = None
+        self.day_total = self.week_total = self.month_total = 0.0
+        self.limits: Dict[str, float] = {}
+        self.seq = 0
+        self.sent_status: Optional[Dict[str, Optional[float]]] = None
+        self.frame = b""
+        self.stale = True       # totals must be re-read before the next event
+        self.seeding = False
+        self.changed = asyncio.Event()   # replaced after each publish
+
+    def apply(self, rows: Optional[pd.DataFrame]) -> bool:
+        """Fold newly inserted rows in; ``False`` if the totals cannot be advanced.
+
+        ``None`` (rows not known) always asks for a re-seed. Rows dated after
+        today or before a period's start leave that period's total alone.
+        """
+        if rows is None or self.stale or self.seeding or self.day != date.today():
+            return False
+        if not {"date", "amount", "transaction_type"} <= set(rows.columns):
+            return False
+        expenses = rows[rows["transaction_type"].astype(str) == "Expense"]
+        if expenses.empty:
+            return True
+        days = pd.to_datetime(expenses["date"], errors="coerce").dt.normalize()
+        amounts = pd.to_numeric(expenses["amount"], errors="coerce")
+        today = pd.Timestamp(self.day)
+        current = days <= today         # NaT and future-dated rows fall out here
+        week_start = today - pd.Timedelta(days=today.weekday())
+        self.day_total += float(amounts[days == today].sum())
+        self.week_total += float(amounts[current & (days >= week_start)].sum())
+        self.month_total += float(amounts[current & (days >= today.replace(day=1))].sum())
+        return True
+
+    def status(self) -> Dict[str, Optional[float]]:
+        def remaining(period: str, total: float) -> Optional[float]:
+            limit = self.limits.get(period, 0.0)
+            return (limit - total) if limit > 0 else None
+
+        return {
+            "daily_spent":       self.day_total,
+            "daily_remaining":   remaining("daily", self.day_total),
+            "weekly_spent":      self.week_total,
+            "weekly_remaining":  remaining("weekly", self.week_total),
+            "monthly_spent":     self.month_total,
+            "monthly_remaining": remaining("monthly", self.month_total),
+        }
+
+
+class BudgetStream:
+    def __init__(self, db: AsyncPersistence, heartbeat_seconds: float = 15.0) -> None:
+        self.db = db
+        self.heartbeat_seconds = heartbeat_seconds
+        self.subscribers = 0
+        self._lock = threading.Lock()
+        self._users: Dict[str, _UserTotals] = {}
+        self._seed_locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self) -> None:
+        self.db.db.add_write_listener(self._on_write)
+
+    # ------------------------------------------------------------------
+    # Change notification (writer threads)
+    # ------------------------------------------------------------------
+
+    def _on_write(self, user_id: str, rows: Optional[pd.DataFrame]) -> None:
+        with self._lock:
+            totals = self._users.get(user_id)
+            if totals is None:          # nobody has subscribed to this user
+                return
+            if not totals.apply(rows):
+                totals.stale = True
+        self._schedule(user_id)
+
+    def invalidate(self, user_id: str) -> None:
+        """Rebuild *user_id*'s totals from the store before the next event."""
+        with self._lock:
+            totals = self._users.get(user_id)
+            if totals is None:
+                return
+            totals.stale = True
+        self._schedule(user_id)
+
+    def _schedule(self, user_id: str) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._changed, user_id)
+
+    # ------------------------------------------------------------------
+    # Event loop side
+    # ------------------------------------------------------------------
+
+    def _changed(self, user_id: str) -> None:
+        totals = self._users[user_id]
+        if totals.stale:
+            asyncio.ensure_future(self._refresh(user_id))
+        else:
+            self._publish(totals)
+
+    def _publish(self, totals: _UserTotals) -> None:
+        with self._lock:
+            status = totals.status()
+            if status == totals.sent_status:
+                return          # e.g. an income or a back-dated expense
+            totals.seq += 1
+            totals.sent_status = status
+        totals.frame = f"event: budget\nid: {totals.seq}\ndata: ".encode() + dumps(status) + b"\n\n"
+        previous, totals.changed = totals.changed, asyncio.Event()
+        previous.set()
+
+    async def _refresh(self, user_id: str) -> _UserTotals:
+        """Re-seed *user_id*'s totals if stale; concurrent callers share one read."""
+        totals = self._users[user_id]
+        lock = self._seed_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            while totals.stale or totals.day != date.today():
+                with self._lock:
+                    totals.stale, totals.seeding = False, True
+                try:
+                    today = pd.Timestamp.today().normalize()
+                    since = min(today.replace(day=1), today - pd.Timedelta(days=today.weekday()))
+                    daily = await self.db.get_daily_series(user_id, start_date=since.strftime("%Y-%m-%d"))
+                    limits = await self.db.get_budgets(user_id)
+                except BaseException:
+                    with self._lock:
+                        totals.stale, totals.seeding = True, False
+                    raise
+                status = (
+                    current_period_status_from_daily(daily, 0.0, 0.0, 0.0) if not daily.empty
+                    else {"day_total": 0.0, "week_total": 0.0, "month_total": 0.0}
+                )
+                with self._lock:
+                    # A write that landed mid-read left ``stale`` set; loop again.
+                    totals.day = today.date()
+                    totals.day_total = status["day_total"]
+                    totals.week_total = status["week_total"]
+                    totals.month_total = status["month_total"]
+                    totals.limits = limits
+                    totals.seeding = False
+                    if totals.stale:
+                        continue
+                self._publish(totals)
+        return totals
+
+    async def events(self, user_id: str = "default") -> AsyncIterator[bytes]:
+        """SSE frames for *user_id*: the current status, then one per change."""
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            totals = self._users.setdefault(user_id, _UserTotals())
+        self.subscribers += 1
+        try:
+            yield b"retry: 3000\n\n"
+            sent = 0
+            while True:
+                if totals.stale or totals.day != date.today():
+                    await self._refresh(user_id)
+                changed = totals.changed
+                if totals.seq != sent:
+                    sent = totals.seq
+                    yield totals.frame
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,27 @@
+"""
+api/jobs.py
+-----------
+Status endpoint for background upload jobs.
+
+The queue itself lives on the application context (see ``services/jobs.py``
+and ``api/context.py``); workers keep each job's row in ``db.jobs.JobStore``
+up to date, and this router only reads it.
+"""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from api.context import AppContext, get_context
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, ctx: AppContext = Depends(get_context)):
+    """Status, row counters (read / parsed / saved), throughput and error of an upload job."""
+    job = await run_in_threadpool(ctx.jobs.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
@@ -5,30 +5,53 @@ FastAPI application for the SMS Budget Tracker.
 
 Endpoints:
     POST   /upload-sms
+    GET    /jobs/{job_id}
     GET    /transactions
+    GET    /transactions/stream
+    GET    /transactions/search
     GET    /transactions/stats
     GET    /budget/status
+    GET    /budget/stream
     GET    /budget/limits
     POST   /budget/limits
     GET    /categories
+    GET    /analytics
+    GET    /export
     DELETE /data
+    GET    /metrics
 """
 
 from __future__ import annotations
 
-import io
-from datetime import datetime
+import asyncio
+import os
+from datetime import date, datetime
 from typing import List, Optional
 
 import pandas as pd
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from api.compression import CompressionMiddleware
+from api.context import AppContext, get_context, lifespan
+from api.events import SSE_HEADERS
+from api.jobs import router as jobs_router
+from api.metrics import MetricsMiddleware
+from api.metrics import router as metrics_router
+from api.uploads import UPLOAD_OPENAPI, receive_upload
 from api.webhook import router as webhook_router
-from core.parser import load_sms_xml, process_sms_dataframe
-from db.session import DataPersistence
-from services.budgeting import current_period_status   # fixed: was `from budget import ...`
+from db.async_session import AsyncPersistence
+from db.export import EXPORT_FORMATS, dumps, frame_records, frame_to_ndjson
+from db.session import _epoch_param
+from services.analytics import (
+    average_daily_spend_from_daily,
+    detect_anomalies,
+    predict_next_7_days_spend_from_daily,
+)
+from services.budgeting import current_period_status_from_daily
+from services.metrics import metrics
 
 # ---------------------------------------------------------------------------
 # Pydantic models (moved inline — db.models does not exist in file tree)
@@ -59,11 +82,31 @@ class TransactionResponse(BaseModel):
     original_message: Optional[str]   = None
 
 
+_TRANSACTION_FIELDS = [
+    "id", "date", "amount", "transaction_type", "category", "merchant",
+]
+
+
+def _transaction_fields(include_message: bool) -> List[str]:
+    # Message bodies are stored compressed; only inflate them when asked.
+    return _TRANSACTION_FIELDS + ["original_message"] if include_message else _TRANSACTION_FIELDS
+
+
+class TransactionPage(BaseModel):
+    items:       List[TransactionResponse]
+    next_cursor: Optional[str] = None   # pass back as ?cursor= for the next page
+
+
+# Rows fetched per query by /transactions/stream.
+STREAM_PAGE_ROWS = int(os.getenv("TRANSACTION_STREAM_PAGE_ROWS", "1000"))
+
+
 # ---------------------------------------------------------------------------
 # App setup
 # ---------------------------------------------------------------------------
 
-app = FastAPI(title="SMS Budget Tracker API", version="1.0.0")
+# Shared state (store, caches, queues) is built by the lifespan; see api/context.py.
+app = FastAPI(title="SMS Budget Tracker API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -72,26 +115,66 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+# Outermost, so request timings include compression.
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(webhook_router)
-
-db = DataPersistence()
+app.include_router(jobs_router)
+app.include_router(metrics_router)
 
 # ---------------------------------------------------------------------------
-# Column detection helper (mirrors Streamlit logic)
+# Helpers
 # ---------------------------------------------------------------------------
 
-_MESSAGE_CANDIDATES = ["body", "content", "message", "sms", "text"]
-_DATE_CANDIDATES    = ["date", "readable_date", "datetime", "timestamp", "time"]
-_SENDER_CANDIDATES  = ["address", "sender", "from", "contact_name"]
 
+def _analytics(df: pd.DataFrame, daily: pd.DataFrame) -> dict:
+    with metrics.timer("pipeline_stage_seconds", stage="analytics"):
+        forecast  = predict_next_7_days_spend_from_daily(daily)
+        anomalies = detect_anomalies(df)
+    for frame in (forecast, anomalies):
+        if "date" in frame.columns:
+            frame["date"] = frame["date"].astype(str)
+    return {
+        "average_daily_spend": float(average_daily_spend_from_daily(daily)),
+        "forecast":            forecast.astype(object).where(forecast.notna(), None).to_dict("records"),
+        "anomalies":           anomalies.astype(object).where(anomalies.notna(), None).to_dict("records"),
+    }
+
+
+def _page_json(df: pd.DataFrame, next_cursor: Optional[str]) -> bytes:
+    # Rows come from our own store in TransactionResponse's shape, so the
+    # per-row pydantic validation of response_model is skipped.
+    return dumps({"items": frame_records(df), "next_cursor": next_cursor})
+
+
+async def _budget_status(db: AsyncPersistence) -> BudgetStatus:
+    budgets = await db.get_budgets()
+    today   = pd.Timestamp.today().normalize()
+    since   = min(today.replace(day=1), today - pd.Timedelta(days=today.weekday()))
+    daily   = await db.get_daily_series(start_date=since.strftime("%Y-%m-%d"))
 
-def _first_match(columns: list[str], candidates: list[str]) -> Optional[str]:
-    lowered = {c.lower(): c for c in columns}
-    for key in candidates:
-        if key in lowered:
-            return lowered[key]
-    return None
+    if daily.empty:
+        return BudgetStatus(
+            daily_spent=0.0,      daily_remaining=budgets.get("daily"),
+            weekly_spent=0.0,     weekly_remaining=budgets.get("weekly"),
+            monthly_spent=0.0,    monthly_remaining=budgets.get("monthly"),
+        )
+
+    status = current_period_status_from_daily(
+        daily,
+        budgets.get("daily",   0.0),
+        budgets.get("weekly",  0.0),
+        budgets.get("monthly", 0.0),
+    )
+    return BudgetStatus(
+        daily_spent=float(status["day_total"]),
+        daily_remaining=status["day_remaining"],
+        weekly_spent=float(status["week_total"]),
+        weekly_remaining=status["week_remaining"],
+        monthly_spent=float(status["month_total"]),
+        monthly_remaining=status["month_remaining"],
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -104,152 +187,230 @@ async def root():
     return {"message": "SMS Budget Tracker API", "version": "1.0.0", "status": "ok"}
 
 
-@app.post("/upload-sms")
-async def upload_sms(file: UploadFile = File(...)):
+@app.post("/upload-sms", status_code=202, openapi_extra=UPLOAD_OPENAPI)
+async def upload_sms(request: Request, ctx: AppContext = Depends(get_context)):
     """
-    Accept a CSV or XML SMS export, parse transactions, persist to DB.
-    Returns a summary and the first five parsed transactions.
+    Accept a CSV or XML SMS export (multipart field ``file``) and queue it for
+    background processing. The body is streamed to disk as it arrives.
+    Returns a job id; poll ``GET /jobs/{job_id}`` for progress and the outcome.
     """
     try:
-        content  = await file.read()
-        file_io  = io.BytesIO(content)
-        filename = (file.filename or "").lower()
-
-        df = load_sms_xml(file_io) if filename.endswith(".xml") else pd.read_csv(file_io)
+        path, filename = await receive_upload(request, ctx.jobs.upload_dir)
+        job_id = await ctx.db.run(ctx.jobs.submit, path, filename)
+    except OSError as exc:
+        raise HTTPException(status_code=500, detail=f"Error queueing file: {exc}") from exc
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
 
-        cols        = list(df.columns)
-        message_col = _first_match(cols, _MESSAGE_CANDIDATES)
-        date_col    = _first_match(cols, _DATE_CANDIDATES)
-        sender_col  = _first_match(cols, _SENDER_CANDIDATES)
 
-        if not message_col or not date_col:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not detect required columns (message body / date).",
-            )
-
-        processed = process_sms_dataframe(df, message_col, date_col, sender_col)
-        if processed.empty:
-            return {"message": "No financial transactions found", "count": 0}
-
-        saved_count = db.save_transactions(processed)
-
-        # Serialize sample safely
-        sample = processed.head(5).copy()
-        if "date" in sample.columns:
-            sample["date"] = sample["date"].astype(str)
-        sample_records = sample.to_dict("records")
-
-        return {
-            "message":             f"Successfully processed {len(processed)} transactions",
-            "count":               len(processed),
-            "total_in_db":         saved_count,
-            "sample_transactions": sample_records,
-        }
-    except HTTPException:
-        raise
+@app.get("/transactions", response_model=TransactionPage)
+async def get_transactions(
+    limit:            int           = Query(100, ge=1, le=1000),
+    cursor:           Optional[str] = None,
+    category:         Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    include_message:  bool          = False,
+    ctx:              AppContext    = Depends(get_context),
+):
+    """Return one page of transactions, newest first, optionally filtered by category or type."""
+    try:
+        df, next_cursor = await ctx.db.get_transaction_page(
+            limit=limit,
+            cursor=cursor,
+            columns=_transaction_fields(include_message),
+            category=category,
+            transaction_type=transaction_type,
+        )
+        body = await ctx.db.run(_page_json, df, next_cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Error processing file: {exc}") from exc
+        raise HTTPException(status_code=500, detail=f"Error fetching transactions: {exc}") from exc
+    return Response(content=body, media_type="application/json")
 
 
-@app.get("/transactions", response_model=List[TransactionResponse])
-async def get_transactions(
-    limit:            Optional[int] = 100,
+@app.get("/transactions/stream")
+async def stream_transactions(
+    limit:            Optional[int] = Query(None, ge=1),
     category:         Optional[str] = None,
     transaction_type: Optional[str] = None,
+    include_message:  bool          = False,
+    ctx:              AppContext    = Depends(get_context),
 ):
-    """Return paginated transactions, optionally filtered by category or type."""
+    """Stream matching transactions as NDJSON, newest first, one object per line.
+
+    Walks the same keyset pages as ``/transactions`` internally, so memory
+    stays at one page however many rows match. ``limit`` caps the total.
+    """
+    columns = _transaction_fields(include_message)
+
+    async def lines():
+        cursor: Optional[str] = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = STREAM_PAGE_ROWS if remaining is None else min(STREAM_PAGE_ROWS, remaining)
+            df, cursor = await ctx.db.get_transaction_page(
+                limit=size,
+                cursor=cursor,
+                columns=columns,
+                category=category,
+                transaction_type=transaction_type,
+            )
+            if not df.empty:
+                yield await ctx.db.run(frame_to_ndjson, df)
+            if cursor is None:
+                break
+            if remaining is not None:
+                remaining -= len(df)
+
+    return StreamingResponse(lines(), media_type=EXPORT_FORMATS["ndjson"])
+
+
+@app.get("/transactions/search", response_model=TransactionPage)
+async def search_transactions(
+    q:               str           = Query(..., min_length=3),
+    field:           Optional[str] = None,
+    limit:           int           = Query(100, ge=1, le=1000),
+    cursor:          Optional[str] = None,
+    include_message: bool          = False,
+    ctx:             AppContext    = Depends(get_context),
+):
+    """Substring search over message bodies and merchants, newest first.
+
+    Covers archived months too (scanned, as they have no search index).
+    """
     try:
-        df = db.get_transactions(category=category, transaction_type=transaction_type)
-        if limit:
-            df = df.head(limit)
-        if "date" in df.columns:
-            df["date"] = df["date"].astype(str)
-        return df.to_dict("records")
+        df, next_cursor = await ctx.db.get_transaction_page(
+            limit=limit,
+            cursor=cursor,
+            columns=_transaction_fields(include_message),
+            search=q,
+            search_field=field,
+        )
+        body = await ctx.db.run(_page_json, df, next_cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Error fetching transactions: {exc}") from exc
+        raise HTTPException(status_code=500, detail=f"Error searching transactions: {exc}") from exc
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/transactions/stats")
-async def get_transaction_stats():
+async def get_transaction_stats(request: Request, ctx: AppContext = Depends(get_context)):
     """Return aggregate statistics across all stored transactions."""
     try:
-        df = db.get_spending_summary()
-        return df
+        return await ctx.response_cache.respond(request, ctx.db.data_version(), ctx.db.get_spending_summary)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {exc}") from exc
 
 
 @app.get("/budget/status", response_model=BudgetStatus)
-async def get_budget_status():
+async def get_budget_status(request: Request, ctx: AppContext = Depends(get_context)):
     """Return current-period spending vs budget limits."""
     try:
-        budgets = db.get_budgets()
-        df      = db.get_transactions()
-
-        if df.empty:
-            return BudgetStatus(
-                daily_spent=0.0,      daily_remaining=budgets.get("daily"),
-                weekly_spent=0.0,     weekly_remaining=budgets.get("weekly"),
-                monthly_spent=0.0,    monthly_remaining=budgets.get("monthly"),
-            )
-
-        status = current_period_status(
-            df,
-            budgets.get("daily",   0.0),
-            budgets.get("weekly",  0.0),
-            budgets.get("monthly", 0.0),
-        )
-        return BudgetStatus(
-            daily_spent=float(status["day_total"]),
-            daily_remaining=status["day_remaining"],
-            weekly_spent=float(status["week_total"]),
-            weekly_remaining=status["week_remaining"],
-            monthly_spent=float(status["month_total"]),
-            monthly_remaining=status["month_remaining"],
+        return await ctx.response_cache.respond(
+            request, ctx.db.data_version(), _budget_status, ctx.db, vary=date.today().isoformat()
         )
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error fetching budget status: {exc}") from exc
 
 
+@app.get("/budget/stream")
+async def stream_budget_status(ctx: AppContext = Depends(get_context)):
+    """Server-sent events: the budget status now and again after every change.
+
+    Each ``budget`` event carries the same fields as ``/budget/status``.
+    """
+    return StreamingResponse(
+        ctx.budget_stream.events("default"), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
 @app.get("/budget/limits")
-async def get_budget_limits():
+async def get_budget_limits(request: Request, ctx: AppContext = Depends(get_context)):
     """Return the configured budget limits for the default user."""
     try:
-        return db.get_budgets()
+        return await ctx.response_cache.respond(request, ctx.db.data_version(), ctx.db.get_budgets)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error fetching budget limits: {exc}") from exc
 
 
 @app.post("/budget/limits")
-async def set_budget_limits(budgets: List[BudgetLimit]):
+async def set_budget_limits(budgets: List[BudgetLimit], ctx: AppContext = Depends(get_context)):
     """Upsert one or more budget limits."""
     try:
         for budget in budgets:
-            db.save_budget("default", budget.period, budget.limit_amount)
+            await ctx.db.save_budget("default", budget.period, budget.limit_amount)
+        ctx.budget_stream.invalidate("default")
         return {"message": "Budget limits updated successfully"}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error setting budget limits: {exc}") from exc
 
 
 @app.get("/categories")
-async def get_categories():
+async def get_categories(request: Request, ctx: AppContext = Depends(get_context)):
     """Return total spending per category."""
     try:
-        df = db.get_transactions()
-        if df.empty:
-            return {}
-        category_totals = df.groupby("category")["amount"].sum()
-        return {k: float(v) for k, v in category_totals.items()}
+        return await ctx.response_cache.respond(request, ctx.db.data_version(), ctx.db.get_category_totals)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error fetching categories: {exc}") from exc
 
 
+@app.get("/analytics")
+async def get_analytics(
+    start_date: Optional[str] = None,
+    end_date:   Optional[str] = None,
+    ctx:        AppContext    = Depends(get_context),
+):
+    """Average daily spend, 7-day forecast and anomalous expenses.
+
+    The average and forecast come from the daily rollup; anomaly detection
+    needs the rows, read from the columnar mirror when one is configured
+    (``BUDGET_COLUMNAR_DIR``).
+    """
+    try:
+        df, daily = await asyncio.gather(
+            ctx.db.get_analytics_frame(start_date=start_date, end_date=end_date),
+            ctx.db.get_daily_series(start_date=start_date, end_date=end_date),
+        )
+        return await ctx.db.run(_analytics, df, daily)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Error computing analytics: {exc}") from exc
+
+
+@app.get("/export")
+async def export_transactions(
+    format:     str           = "csv",
+    start_date: Optional[str] = None,
+    end_date:   Optional[str] = None,
+    ctx:        AppContext    = Depends(get_context),
+):
+    """Stream all transactions as CSV or NDJSON without buffering the export."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format {format!r}; expected one of {sorted(EXPORT_FORMATS)}",
+        )
+    # Rows are read only once the 200 has gone out, so bad dates must fail here.
+    for name, value in (("start_date", start_date), ("end_date", end_date)):
+        if value is not None:
+            try:
+                _epoch_param(value)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=f"Invalid {name} {value!r}") from exc
+    filename = f"transactions_{datetime.now().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        ctx.db.iter_export(start_date=start_date, end_date=end_date, fmt=format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @app.delete("/data")
-async def clear_all_data():
+async def clear_all_data(ctx: AppContext = Depends(get_context)):
     """Permanently delete all data for the default user."""
     try:
-        db.delete_user_data("default")
+        await ctx.db.delete_user_data("default")
+        ctx.budget_stream.invalidate("default")
         return {"message": "All data cleared successfully"}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error clearing data: {exc}") from exc
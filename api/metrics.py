@@ -0,0 +1,69 @@
+"""
+api/metrics.py
+--------------
+Per-endpoint request metrics and the Prometheus scrape endpoint.
+
+``MetricsMiddleware`` is plain ASGI (no ``BaseHTTPMiddleware``), so it adds
+no task or body buffering to streaming responses. Requests are labelled with
+the matched route template (``/jobs/{job_id}``, not the raw path) to keep the
+series count bounded; unmatched paths share the ``<unmatched>`` label.
+
+Public surface:
+    MetricsMiddleware(app, registry)     -> ASGI middleware
+    router                               -> GET /metrics (Prometheus text format)
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import MetricsRegistry, metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics.describe("http_request_duration_seconds", "Time from request start to final response body chunk")
+metrics.describe("http_requests_total", "HTTP requests by route, method and status")
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any, registry: MetricsRegistry = metrics) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route on the shared scope.
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            method = scope["method"]
+            self.registry.observe(
+                "http_request_duration_seconds", time.perf_counter() - started, route=route, method=method
+            )
+            self.registry.inc("http_requests_total", route=route, method=method, status=status)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics() -> PlainTextResponse:
+    """Counters, latency histograms and collector gauges in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
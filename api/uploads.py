@@ -0,0 +1,128 @@
+"""
+api/uploads.py
+--------------
+Stream a multipart upload straight to disk as it arrives.
+
+``UploadFile`` only reaches the endpoint after Starlette has received and
+spooled the whole body, and ``await file.read()`` then copies it into
+memory again. Here the request stream is pushed through python-multipart's
+incremental parser chunk by chunk and the file part is appended to a spool
+file, so memory use stays at one network chunk whatever the upload size.
+
+Public surface:
+    receive_upload(request, upload_dir, field) -> (Path, filename)
+    UPLOAD_OPENAPI                             -> openapi_extra for the route
+"""
+
+from __future__ import annotations
+
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import metrics
+
+# Documents the body that receive_upload() parses by hand.
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+
+async def receive_upload(request: Request, upload_dir: Path, field: str = "file") -> Tuple[Path, str]:
+    """Write the *field* file part of a multipart request to *upload_dir*.
+
+    Returns the spooled path and the client's filename. Other parts are
+    ignored. Raises 400 if the body is not multipart or has no such part.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    with metrics.timer("pipeline_stage_seconds", stage="upload_receive"):
+        return await _spool(request, upload_dir, field, boundary)
+
+
+async def _spool(request: Request, upload_dir: Path, field: str, boundary: bytes) -> Tuple[Path, str]:
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{uuid.uuid4().hex}.part"
+    state = {"header": b"", "value": b"", "in_file": False, "done": False}
+    filename: Optional[str] = None
+    pending: List[bytes] = []
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        state["header"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        state["value"] += data[start:end]
+
+    def on_header_end() -> None:
+        nonlocal filename
+        if state["header"].lower() == b"content-disposition":
+            _, options = parse_options_header(state["value"])
+            if options.get(b"name") == field.encode() and not state["done"]:
+                state["in_file"] = True
+                filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        state["header"] = state["value"] = b""
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if state["in_file"]:
+            pending.append(data[start:end])
+
+    def on_part_end() -> None:
+        if state["in_file"]:
+            state["in_file"], state["done"] = False, True
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    out = await run_in_threadpool(open, path, "wb")
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                await run_in_threadpool(out.write, data)
+                metrics.inc("upload_bytes_total", len(data))
+        parser.finalize()
+    except FormParserError as exc:
+        await run_in_threadpool(out.close)
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {exc}") from exc
+    except BaseException:
+        # Client disconnects land here too; don't leave partial spools behind.
+        await run_in_threadpool(out.close)
+        path.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(out.close)
+
+    if not state["done"]:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"Missing {field!r} file part")
+    final = path.with_suffix(Path(filename or "").suffix.lower())
+    path.replace(final)
+    return final, filename or ""
@@ -1,15 +1,41 @@
+import asyncio
+import os
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from api.auth import verify_internal_webhook_token
-from core.parser import process_single_sms
-from db.session import DataPersistence
+from api.context import AppContext, get_context
+from core.parser import process_single_sms, process_sms_batch
+from db.write_buffer import BufferFull
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
-db = DataPersistence()
+
+# Upper bound on messages per /webhooks/sms/batch request.
+MAX_BATCH_SIZE = int(os.getenv("WEBHOOK_MAX_BATCH", "1000"))
+
+_NO_TRANSACTION = "SMS received but no financial transaction was detected."
+_BAD_DATE = "Could not parse the message timestamp."
+_DUPLICATE = "Transaction already recorded."
+
+# Gateway retries carrying a message id seen within this window get the
+# original result back without being parsed again.
+RECEIPT_TTL_SECONDS = float(os.getenv("WEBHOOK_IDEMPOTENCY_TTL", str(24 * 3600)))
+WEBHOOK_USER = "default"
+
+
+def _transaction_json(row: pd.Series) -> Dict[str, Any]:
+    record = row.to_dict()
+    if isinstance(record.get("date"), pd.Timestamp):
+        record["date"] = record["date"].isoformat()
+    return record
+
+
+def _receipt_key(payload: Dict[str, Any]) -> Optional[str]:
+    message_id = payload["message_id"]
+    return str(message_id) if message_id not in (None, "") else None
 
 
 def _normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,7 +60,9 @@ def _normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
 @router.post("/sms")
 async def ingest_sms_webhook(
     request: Request,
+    response: Response,
     _: None = Depends(verify_internal_webhook_token),
+    ctx: AppContext = Depends(get_context),
 ):
     content_type = request.headers.get("content-type", "")
 
@@ -45,31 +73,168 @@ async def ingest_sms_webhook(
         raw_payload = dict(form_data)
 
     payload = _normalize_payload(raw_payload)
+    message_id = _receipt_key(payload)
+    if message_id is not None:
+        seen = await ctx.db.get_webhook_receipts(WEBHOOK_USER, [message_id], RECEIPT_TTL_SECONDS)
+        if message_id in seen:
+            response.headers["Idempotent-Replayed"] = "true"
+            replayed = seen[message_id]
+            if replayed.get("accepted"):
+                # The stored count is from the first delivery; report the current one.
+                replayed["total_in_db"] = await ctx.db.count_transactions(WEBHOOK_USER)
+            return replayed
     if not payload["body"]:
         raise HTTPException(status_code=400, detail="Missing SMS body")
 
-    processed = process_single_sms(
+    processed = await ctx.db.run(
+        process_single_sms,
         message=payload["body"],
         message_date=payload["received_at"],
         sender=payload["sender"],
     )
     if processed.empty:
-        return {
+        result = {
             "accepted": False,
             "saved": 0,
-            "message": "SMS received but no financial transaction was detected.",
+            "message": _NO_TRANSACTION,
             "message_id": payload["message_id"],
         }
+    elif processed["date"].isna().all():
+        raise HTTPException(status_code=400, detail=_BAD_DATE)
+    else:
+        try:
+            committed = await asyncio.wrap_future(ctx.write_buffer.submit(processed, timeout=0))
+        except BufferFull as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        result = {
+            "accepted": True,
+            "saved": int(len(committed.inserted)),
+            "total_in_db": int(committed.total),
+            "message_id": payload["message_id"],
+            "transaction": _transaction_json(processed.iloc[0]),
+        }
+        if committed.inserted.empty:
+            result["message"] = _DUPLICATE
+
+    if message_id is not None:
+        await ctx.db.save_webhook_receipts(WEBHOOK_USER, {message_id: result}, RECEIPT_TTL_SECONDS)
+    return result
+
 
-    saved_total = db.save_transactions(processed)
-    row = processed.iloc[0].to_dict()
-    if isinstance(row.get("date"), pd.Timestamp):
-        row["date"] = row["date"].isoformat()
+@router.post("/sms/batch")
+async def ingest_sms_batch(
+    request: Request,
+    _: None = Depends(verify_internal_webhook_token),
+    ctx: AppContext = Depends(get_context),
+):
+    """Ingest many SMS payloads at once.
 
+    The body is a JSON array of the payloads ``/webhooks/sms`` accepts (or an
+    object with a ``messages`` array). All messages are parsed in one pass and
+    committed together; ``results`` has one entry per input, in order.
+    Messages whose id was already processed are answered from their receipt
+    (``"replayed": true``) and repeats within the batch are parsed once.
+    """
+    raw = await request.json()
+    if isinstance(raw, dict):
+        raw = raw.get("messages")
+    if not isinstance(raw, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of SMS payloads")
+    if len(raw) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} messages per batch")
+
+    payloads = [_normalize_payload(item) if isinstance(item, dict) else None for item in raw]
+    results: List[Dict[str, Any]] = [
+        {"index": i, "message_id": p["message_id"] if p else None, "accepted": False, "saved": 0}
+        for i, p in enumerate(payloads)
+    ]
+    keys = {i: _receipt_key(p) for i, p in enumerate(payloads) if p is not None}
+    seen = await ctx.db.get_webhook_receipts(
+        WEBHOOK_USER, sorted({k for k in keys.values() if k is not None}), RECEIPT_TTL_SECONDS
+    )
+
+    parseable: List[int] = []
+    first_by_key: Dict[str, int] = {}
+    repeats: Dict[int, int] = {}
+    for i, p in enumerate(payloads):
+        key = keys.get(i)
+        if p is None:
+            results[i]["error"] = "Payload must be a JSON object"
+        elif key in seen:
+            stored = {k: v for k, v in seen[key].items() if k != "total_in_db"}
+            results[i] = {**stored, "index": i, "replayed": True}
+        elif key is not None and key in first_by_key:
+            repeats[i] = first_by_key[key]
+        elif not p["body"]:
+            results[i]["error"] = "Missing SMS body"
+        else:
+            parseable.append(i)
+            if key is not None:
+                first_by_key[key] = i
+
+    frame = pd.DataFrame(
+        [
+            {"body": payloads[i]["body"], "date": payloads[i]["received_at"], "address": payloads[i]["sender"]}
+            for i in parseable
+        ],
+        columns=["body", "date", "address"],
+        dtype=object,   # missing senders stay None rather than NaN
+    )
+    processed, positions = await ctx.db.run(process_sms_batch, frame, "body", "date", "address")
+
+    # Each timestamp is parsed on its own, but one may still be unreadable;
+    # such rows are rejected rather than silently dropped by the store.
+    dated = processed["date"].notna() if not processed.empty else pd.Series(dtype=bool)
+    saved_total = None
+    stored = processed.iloc[0:0]
+    if dated.any():
+        try:
+            committed = await asyncio.wrap_future(ctx.write_buffer.submit(processed[dated], timeout=0))
+        except BufferFull as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        saved_total, stored = committed.total, committed.inserted
+
+    matched = set()
+    for row_number, position in enumerate(positions):
+        result = results[parseable[position]]
+        matched.add(parseable[position])
+        if not dated.iloc[row_number]:
+            result["error"] = _BAD_DATE
+            continue
+        saved = int(processed.index[row_number] in stored.index)
+        result.update(accepted=True, saved=saved, transaction=_transaction_json(processed.iloc[row_number]))
+        if not saved:
+            result["message"] = _DUPLICATE
+    for i in parseable:
+        if i not in matched:
+            results[i]["message"] = _NO_TRANSACTION
+    for i, first in repeats.items():
+        results[i] = {**results[first], "index": i, "saved": 0, "duplicate_of": first}
+
+    receipts = {
+        keys[i]: {k: v for k, v in results[i].items() if k != "index"}
+        for i in parseable
+        if keys[i] is not None
+    }
+    if receipts:
+        await ctx.db.save_webhook_receipts(WEBHOOK_USER, receipts, RECEIPT_TTL_SECONDS)
+
+    if saved_total is None and any(r.get("replayed") for r in results):
+        # Same as a single replay: the current count, not the one stored with the receipt.
+        saved_total = await ctx.db.count_transactions(WEBHOOK_USER)
     return {
-        "accepted": True,
-        "saved": int(len(processed)),
-        "total_in_db": int(saved_total),
-        "message_id": payload["message_id"],
-        "transaction": row,
+        "received": len(raw),
+        "accepted": sum(1 for i in matched if results[i]["accepted"]),
+        "replayed": sum(1 for r in results if r.get("replayed")),
+        "total_in_db": int(saved_total) if saved_total is not None else None,
+        "results": results,
     }
+
+
+@router.get("/stats")
+async def webhook_write_stats(
+    _: None = Depends(verify_internal_webhook_token),
+    ctx: AppContext = Depends(get_context),
+):
+    """Group-commit flush counts, latencies and queue depth."""
+    return ctx.write_buffer.stats()
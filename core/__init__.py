@@ -1,3 +1,3 @@
-from core.parser import load_sms_xml, process_single_sms, process_sms_dataframe
+from core.parser import iter_sms_xml, load_sms_xml, process_single_sms, process_sms_dataframe
 
-__all__ = ["load_sms_xml", "process_single_sms", "process_sms_dataframe"]
+__all__ = ["iter_sms_xml", "load_sms_xml", "process_single_sms", "process_sms_dataframe"]
@@ -10,18 +10,21 @@ Public surface:
     extract_merchant(message)           -> str
     coerce_datetime(series)             -> pd.Series
     process_sms_dataframe(df, ...)      -> pd.DataFrame
+    process_sms_batch(df, ...)          -> (pd.DataFrame, source row positions)
     process_single_sms(message, ...)    -> pd.DataFrame
     load_sms_xml(file_like)             -> pd.DataFrame
+    iter_sms_xml(file_like, chunk_rows) -> Iterator[pd.DataFrame]
 """
 
 import re
 import xml.etree.ElementTree as ET
-from typing import Optional
+from typing import Iterator, Optional
 
 import pandas as pd
 
 from services.classifier import classify_transaction_type, classify_category
 from core.extractor import extract_transaction
+from services.metrics import metrics
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -144,9 +147,37 @@ def process_sms_dataframe(
     Rows that yield no transaction are silently skipped.  The extractor is
     tried first; the simpler regex-based path is used as a fallback.
     """
+    return process_sms_batch(df, message_col, date_col, sender_col)[0]
+
+
+def process_sms_batch(
+    df: pd.DataFrame,
+    message_col: str,
+    date_col: str,
+    sender_col: Optional[str] = None,
+) -> tuple[pd.DataFrame, list[int]]:
+    """
+    Like :func:`process_sms_dataframe`, but also return, for each output row,
+    the position of the input row it came from — so callers parsing several
+    messages at once can report a result per message.
+    """
+    with metrics.timer("pipeline_stage_seconds", stage="parse"):
+        result, positions = _process_rows(df, message_col, date_col, sender_col)
+    metrics.inc("pipeline_rows_total", len(df), stage="parse")
+    metrics.inc("pipeline_rows_total", len(result), stage="extract")
+    return result, positions
+
+
+def _process_rows(
+    df: pd.DataFrame,
+    message_col: str,
+    date_col: str,
+    sender_col: Optional[str],
+) -> tuple[pd.DataFrame, list[int]]:
     records: list[dict] = []
+    positions: list[int] = []
 
-    for _, row in df.iterrows():
+    for position, (_, row) in enumerate(df.iterrows()):
         message = str(row.get(message_col) or "").strip()
         sender = str(row.get(sender_col) or "").strip() if sender_col else ""
         raw_date = row.get(date_col)
@@ -157,11 +188,34 @@ def process_sms_dataframe(
 
         if record is not None:
             records.append(record)
+            positions.append(position)
 
     result = pd.DataFrame(records, columns=_OUTPUT_COLUMNS) if records else pd.DataFrame(columns=_OUTPUT_COLUMNS)
     if not result.empty:
-        result["date"] = coerce_datetime(result["date"])
-    return result
+        result["date"] = _coerce_record_dates(result["date"])
+    return result, positions
+
+
+def _coerce_record_dates(values: pd.Series) -> pd.Series:
+    """
+    :func:`coerce_datetime` for a column that may mix formats (a webhook
+    batch from several gateways, say). pandas infers one format for the
+    whole column, so values it could not parse that way are retried one at a
+    time, exactly as :func:`process_single_sms` would parse them. Values
+    that still fail stay ``NaT``.
+    """
+    parsed = coerce_datetime(values)
+    retry = parsed.isna() & values.notna()
+    if not retry.any():
+        return parsed
+    items = [
+        coerce_datetime(pd.Series([raw])).iloc[0] if again else value
+        for raw, value, again in zip(values, parsed, retry)
+    ]
+    # Offsets are dropped (the store keeps wall-clock time) so aware and
+    # naive values can share one column.
+    items = [t.tz_localize(None) if t is not pd.NaT and t.tzinfo is not None else t for t in items]
+    return pd.Series(pd.to_datetime(items), index=values.index)
 
 
 def process_single_sms(
@@ -238,31 +292,64 @@ def load_sms_xml(file_like) -> pd.DataFrame:
     (not yet transaction-processed — pass through process_sms_dataframe next).
     """
     root = ET.parse(file_like).getroot()
+    rows: list[dict] = [_sms_row(sms) for sms in root.findall("sms")]
+    rows.extend(_mms_row(mms) for mms in root.findall("mms"))
+    return pd.DataFrame(rows)
+
+
+def iter_sms_xml(file_like, chunk_rows: int = 2000) -> Iterator[pd.DataFrame]:
+    """
+    Incremental variant of :func:`load_sms_xml`: yield raw DataFrames of up to
+    *chunk_rows* messages while parsing, clearing each element once read, so
+    memory stays flat however large the backup is. Messages come out in
+    document order rather than all SMS before all MMS.
+    """
     rows: list[dict] = []
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(file_like, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        if elem.tag == "sms":
+            rows.append(_sms_row(elem))
+        elif elem.tag == "mms":
+            rows.append(_mms_row(elem))
+        root.clear()
+        if len(rows) >= chunk_rows:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def _sms_row(sms) -> dict:
+    return {
+        "date": sms.attrib.get("date"),
+        "readable_date": sms.attrib.get("readable_date"),
+        "address": sms.attrib.get("address"),
+        "contact_name": sms.attrib.get("contact_name"),
+        "body": sms.attrib.get("body"),
+        "type": sms.attrib.get("type"),
+        "kind": "sms",
+    }
 
-    for sms in root.findall("sms"):
-        rows.append({
-            "date": sms.attrib.get("date"),
-            "readable_date": sms.attrib.get("readable_date"),
-            "address": sms.attrib.get("address"),
-            "contact_name": sms.attrib.get("contact_name"),
-            "body": sms.attrib.get("body"),
-            "type": sms.attrib.get("type"),
-            "kind": "sms",
-        })
-
-    for mms in root.findall("mms"):
-        rows.append({
-            "date": mms.attrib.get("date"),
-            "readable_date": mms.attrib.get("readable_date"),
-            "address": _extract_mms_sender(mms),
-            "contact_name": mms.attrib.get("contact_name"),
-            "body": _extract_mms_text(mms),
-            "type": mms.attrib.get("msg_box") or mms.attrib.get("type"),
-            "kind": "mms",
-        })
 
-    return pd.DataFrame(rows)
+def _mms_row(mms) -> dict:
+    return {
+        "date": mms.attrib.get("date"),
+        "readable_date": mms.attrib.get("readable_date"),
+        "address": _extract_mms_sender(mms),
+        "contact_name": mms.attrib.get("contact_name"),
+        "body": _extract_mms_text(mms),
+        "type": mms.attrib.get("msg_box") or mms.attrib.get("type"),
+        "kind": "mms",
+    }
 
 
 # ---------------------------------------------------------------------------
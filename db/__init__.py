@@ -1,3 +1,4 @@
 from db.session import DataPersistence
+from db.sharding import ShardedPersistence, open_persistence
 
-__all__ = ["DataPersistence"]
+__all__ = ["DataPersistence", "ShardedPersistence", "open_persistence"]
@@ -0,0 +1,116 @@
+"""
+db/async_session.py
+-------------------
+Async facade over ``DataPersistence`` / ``ShardedPersistence`` for the API.
+
+The underlying store is synchronous (``sqlite3`` plus pandas), so every call
+is pushed onto a dedicated thread pool and awaited. Keeping the pool separate
+from the event loop's default executor means slow queries queue behind each
+other instead of behind — or in front of — Starlette's own threadpool work
+(form parsing, sync dependencies, streaming iterators). SQLite in WAL mode
+lets the pool's readers run concurrently; writers still serialise on the
+database lock, which the store's busy timeout absorbs.
+
+Public surface:
+    AsyncPersistence(db, max_workers)
+        .run(fn, *args, **kwargs)            -> awaitable result   (any blocking work)
+        .submit(fn, *args, **kwargs)         -> concurrent Future  (from any thread, no loop needed)
+        .<persistence method>(...)           -> awaitable result   (see _ASYNC_METHODS)
+        .iter_export(...)                    -> AsyncIterator[bytes]
+        .data_version(user_id) / .touch(user_id) -> int   (synchronous, one indexed read / write)
+        .close()                             -> None
+        .db                                  -> the wrapped synchronous store
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar, Union
+
+from db.session import DataPersistence
+from db.sharding import ShardedPersistence
+
+T = TypeVar("T")
+
+# Methods exposed as coroutines; anything else is reachable through .db or run().
+_ASYNC_METHODS = frozenset({
+    "save_transactions",
+    "save_transactions_many",
+    "save_budget",
+    "delete_user_data",
+    "get_transactions",
+    "get_transaction_page",
+    "search_transactions",
+    "matching_merchants",
+    "get_messages",
+    "get_daily_rollups",
+    "get_daily_series",
+    "get_budgets",
+    "get_spending_summary",
+    "get_category_totals",
+    "get_analytics_frame",
+    "user_counts",
+    "count_transactions",
+    "export_to_csv",
+    "get_webhook_receipts",
+    "save_webhook_receipts",
+})
+
+_DONE = object()
+
+
+class AsyncPersistence:
+    def __init__(
+        self,
+        db: Union[DataPersistence, ShardedPersistence],
+        max_workers: Optional[int] = None,
+    ) -> None:
+        self.db = db
+        workers = max_workers or int(os.getenv("BUDGET_DB_THREADS", "8"))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(*args, **kwargs)`` on the persistence pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """Queue ``fn(*args, **kwargs)`` on the persistence pool without awaiting it."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if name not in _ASYNC_METHODS:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+        method = getattr(self.db, name)
+
+        @functools.wraps(method)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self.run(method, *args, **kwargs)
+
+        return call
+
+    async def iter_export(self, *args: Any, **kwargs: Any) -> AsyncIterator[bytes]:
+        """Async version of ``iter_export``; each chunk is produced on the pool."""
+        chunks = self.db.iter_export(*args, **kwargs)
+        try:
+            while True:
+                chunk = await self.run(next, chunks, _DONE)
+                if chunk is _DONE:
+                    break
+                yield chunk
+        finally:
+            # Release the export's connection even if the client disconnects.
+            await self.run(chunks.close)
+
+    def data_version(self, user_id: str = "default") -> int:
+        """One primary-key read on a held connection; cheap enough to call on the event loop."""
+        return self.db.data_version(user_id)
+
+    def touch(self, user_id: str) -> int:
+        return self.db.touch(user_id)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,291 @@
+"""
+db/columnar.py
+--------------
+Optional Parquet mirror of ``transactions`` for analytics scans.
+
+SQLite stays the system of record; this module keeps a columnar copy laid
+out as ``<root>/user_id=<user>/month=YYYY-MM/part-<first id>-<last id>.parquet``
+so the OLAP-style reads in ``services/analytics.py`` and
+``services/budgeting.py`` scan only the columns and months they need. It is
+fed incrementally from ``DataPersistence`` write notifications and can always
+be rebuilt from SQLite.
+
+The mirror records which transaction ids it holds as a list of id ranges
+(``_mirrored.json``), not a single high-water mark. A batch that failed to
+reach it stays missing until ``DataPersistence.sync_columnar`` copies it,
+even when later batches succeeded. Appending ids it already holds is a
+no-op. Writes take a file lock on ``<root>/.lock`` as well as the in-process
+lock, so compaction and the range file are never rewritten by two processes
+at once; reads take the same lock, so they never see a month mid-compaction. The API process is still meant to be the only writer; upload
+workers open their store without the mirror.
+
+Writing needs ``pyarrow``; reads go through DuckDB when it is installed and
+fall back to ``pyarrow.dataset`` otherwise. Without pyarrow the mirror is
+simply unavailable and callers read SQLite as before.
+
+Public surface:
+    COLUMNAR_AVAILABLE                           -> bool
+    MIRROR_COLUMNS                               -> tuple of column names
+    ColumnarMirror(root)
+        .append(frame)                           -> int   (rows written)
+        .load(user_id, start_date, end_date, columns) -> pd.DataFrame
+        .drop_user(user_id)                      -> None
+        .reset()                                 -> None
+        .mirrored                                -> list of [first id, last id] ranges
+        .missing(ceiling)                        -> id ranges up to *ceiling* not yet mirrored
+        .mark(first, last)                       -> None  (record a range as mirrored)
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pc = ds = pq = None
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: in-process locking only
+    fcntl = None
+
+COLUMNAR_AVAILABLE = pa is not None
+
+MIRROR_COLUMNS = ("id", "date", "amount", "transaction_type", "category", "merchant")
+
+# Each write notification adds one small file per (user, month); once a month
+# directory holds this many, they are merged into one.
+_COMPACT_AFTER = 32
+
+
+class ColumnarMirror:
+    def __init__(self, root: str) -> None:
+        if not COLUMNAR_AVAILABLE:
+            raise RuntimeError("The columnar mirror needs pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._state_path = self.root / "_mirrored.json"
+        self._lock = threading.Lock()
+        legacy = self.root / "_watermark.json"
+        if legacy.exists():
+            # Mirrors written before id ranges kept one high-water mark.
+            with self._locked():
+                try:
+                    last_id = int(json.loads(legacy.read_text())["last_id"])
+                except (OSError, ValueError, KeyError):
+                    last_id = 0
+                if last_id and not self._state_path.exists():
+                    self._save_ranges([[1, last_id]])
+                legacy.unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    @property
+    def mirrored(self) -> List[List[int]]:
+        """Sorted, non-overlapping ``[first, last]`` id ranges held by the mirror."""
+        try:
+            state = json.loads(self._state_path.read_text())
+        except (OSError, ValueError):
+            return []
+        return [[int(lo), int(hi)] for lo, hi in state.get("ranges", [])]
+
+    def missing(self, ceiling: int) -> List[Tuple[int, int]]:
+        """Id ranges in ``[1, ceiling]`` that are not mirrored yet."""
+        gaps: List[Tuple[int, int]] = []
+        next_id = 1
+        for lo, hi in self.mirrored:
+            if lo > next_id:
+                gaps.append((next_id, min(lo - 1, ceiling)))
+            next_id = max(next_id, hi + 1)
+            if next_id > ceiling:
+                break
+        if next_id <= ceiling:
+            gaps.append((next_id, ceiling))
+        return [(lo, hi) for lo, hi in gaps if lo <= hi]
+
+    def mark(self, first: int, last: int) -> None:
+        """Record ``[first, last]`` as mirrored (e.g. ids a full sync found no rows for)."""
+        with self._locked():
+            self._save_ranges(self.mirrored + [[first, last]])
+
+    def append(self, frame: pd.DataFrame) -> int:
+        """Write rows carrying ``user_id`` plus :data:`MIRROR_COLUMNS`; returns rows written.
+
+        Rows whose id is already mirrored are skipped.
+        """
+        if frame.empty:
+            return 0
+        with self._locked():
+            ranges = self.mirrored
+            held = pd.Series(False, index=frame.index)
+            for lo, hi in ranges:
+                held |= frame["id"].between(lo, hi)
+            frame = frame[~held]
+            if frame.empty:
+                return 0
+            self._write(frame)
+            ids = frame["id"].astype("int64").sort_values().to_numpy()
+            # Consecutive ids collapse into one range.
+            breaks = [0] + [i for i in range(1, len(ids)) if ids[i] != ids[i - 1] + 1] + [len(ids)]
+            runs = [[int(ids[a]), int(ids[b - 1])] for a, b in zip(breaks, breaks[1:])]
+            self._save_ranges(ranges + runs)
+        return len(frame)
+
+    def _write(self, frame: pd.DataFrame) -> None:
+        frame = frame.reindex(columns=["user_id", *MIRROR_COLUMNS])
+        frame = frame.assign(
+            date=pd.to_datetime(frame["date"]),
+            category=frame["category"].astype(object),
+            merchant=frame["merchant"].astype(object),
+        )
+        months = frame["date"].dt.strftime("%Y-%m")
+        for (user_id, month), rows in frame.groupby([frame["user_id"], months], sort=False):
+            directory = self._user_dir(user_id) / f"month={month}"
+            directory.mkdir(parents=True, exist_ok=True)
+            rows = rows[list(MIRROR_COLUMNS)]
+            name = f"part-{int(rows['id'].min())}-{int(rows['id'].max())}.parquet"
+            pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), directory / name)
+            if sum(1 for _ in directory.glob("part-*.parquet")) > _COMPACT_AFTER:
+                self._compact(directory)
+
+    def drop_user(self, user_id: str) -> None:
+        with self._locked():
+            shutil.rmtree(self._user_dir(user_id), ignore_errors=True)
+
+    def reset(self) -> None:
+        """Remove every mirrored row and the id ranges."""
+        with self._locked():
+            for child in self.root.iterdir():
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                elif child.name != ".lock":
+                    child.unlink()
+
+    @contextmanager
+    def _locked(self) -> Generator[None, None, None]:
+        with self._lock, open(self.root / ".lock", "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _save_ranges(self, ranges: List[List[int]]) -> None:
+        merged: List[List[int]] = []
+        for lo, hi in sorted(ranges):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        tmp = self._state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"ranges": merged}))
+        tmp.replace(self._state_path)
+
+    @staticmethod
+    def _compact(directory: Path) -> None:
+        parts = sorted(directory.glob("part-*.parquet"))
+        table = pa.concat_tables([pq.read_table(p) for p in parts])
+        ids = table.column("id")
+        merged = directory / f"part-{pc.min(ids).as_py()}-{pc.max(ids).as_py()}.parquet"
+        tmp = merged.with_suffix(".tmp")
+        pq.write_table(table, tmp)
+        # Publish the merged file before removing anything, so a crash part-way
+        # leaves duplicate rows at worst, never missing ones.
+        tmp.replace(merged)
+        for part in parts:
+            if part != merged:
+                part.unlink()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def load(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Return *user_id*'s mirrored rows, newest first, like ``get_transactions``.
+
+        Month directories outside ``[start_date, end_date]`` are never opened.
+        Reads hold the write lock so compaction cannot swap files mid-scan.
+        """
+        with self._locked():
+            return self._load(user_id, start_date, end_date, list(columns or MIRROR_COLUMNS))
+
+    def _load(
+        self,
+        user_id: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        columns: List[str],
+    ) -> pd.DataFrame:
+        files = self._files(user_id, start_date, end_date)
+        if not files:
+            return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "date" else object) for c in columns})
+
+        start = pd.Timestamp(start_date) if start_date else None
+        end = pd.Timestamp(end_date) if end_date else None
+        if duckdb is not None:
+            conditions, params = ["TRUE"], []
+            if start is not None:
+                conditions.append("date >= ?")
+                params.append(start.to_pydatetime())
+            if end is not None:
+                conditions.append("date <= ?")
+                params.append(end.to_pydatetime())
+            sql = (
+                f"SELECT {', '.join(dict.fromkeys(columns + ['id']))} "
+                f"FROM read_parquet(?, union_by_name = true) "
+                f"WHERE {' AND '.join(conditions)} ORDER BY date DESC, id DESC"
+            )
+            with duckdb.connect() as conn:
+                df = conn.execute(sql, [[str(f) for f in files], *params]).df()
+        else:
+            dataset = ds.dataset([str(f) for f in files], format="parquet")
+            expr = None
+            if start is not None:
+                expr = ds.field("date") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns"))
+            if end is not None:
+                upper = ds.field("date") <= pa.scalar(end.to_pydatetime(), pa.timestamp("ns"))
+                expr = upper if expr is None else expr & upper
+            table = dataset.to_table(columns=list(dict.fromkeys(columns + ["id"])), filter=expr)
+            df = table.to_pandas().sort_values(["date", "id"], ascending=False)
+        return df[columns].reset_index(drop=True)
+
+    def _files(self, user_id: str, start_date: Optional[str], end_date: Optional[str]) -> List[Path]:
+        first = pd.Timestamp(start_date).strftime("%Y-%m") if start_date else None
+        last = pd.Timestamp(end_date).strftime("%Y-%m") if end_date else None
+        files: List[Path] = []
+        for directory in sorted(self._user_dir(user_id).glob("month=*")):
+            month = directory.name.split("=", 1)[1]
+            if (first and month < first) or (last and month > last):
+                continue
+            files.extend(sorted(directory.glob("part-*.parquet")))
+        return files
+
+    def _user_dir(self, user_id: str) -> Path:
+        return self.root / f"user_id={quote(str(user_id), safe='')}"
@@ -0,0 +1,99 @@
+"""
+db/compression.py
+-----------------
+Preset-dictionary zlib compression for SMS bodies.
+
+Bank alerts are heavily templated ("Your A/c XX1234 is debited by Rs ..."),
+so priming deflate with a dictionary of those templates shrinks each short
+message far more than compressing it on its own.
+
+Public surface:
+    DEFAULT_DICTIONARY                      -> bytes
+    compress_message(text, dictionary)      -> bytes | None
+    decompress_message(blob, dictionary)    -> str | None
+    train_dictionary(messages, size)        -> bytes
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+# Raw deflate: no zlib header/checksum, which matter little for data that
+# already lives inside SQLite pages.
+_WBITS = -15
+
+# zlib only looks back 32 KiB, so anything larger is dead weight.
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+# Seed templates. deflate prefers matches near the end of the dictionary, so
+# the most common phrases come last.
+_DEFAULT_PHRASES: tuple[str, ...] = (
+    "Download the app", "Call 1800", "if not done by you", "report to bank",
+    "SMS BLOCK", "to block your card", "Avl Lmt", "Available limit",
+    "Avl Bal Rs.", "Avl Bal INR", "Available Balance", "Ref No", "Ref no.",
+    "UPI Ref", "UPI/", "IMPS", "NEFT", "via UPI", "towards", "Info:",
+    "thru", "a/c no.", "your account", "credited to your account",
+    "debited from your account", "has been credited", "has been debited",
+    "Your A/c XX", "A/c no. XX", "Card XX", "credit card ending",
+    "debit card ending", "transaction of Rs.", "Txn of INR", "spent on",
+    "paid to", "received from", "is credited with", "is debited with",
+    "credited by Rs.", "debited by Rs.", "debited for Rs.", "credited with INR",
+    "debited with INR", "Rs.", "INR ", " on ", " at ", "Dear Customer, ",
+)
+DEFAULT_DICTIONARY: bytes = " ".join(_DEFAULT_PHRASES).encode("utf-8")
+
+_DIGIT_RUN_RE = re.compile(r"\d+")
+
+
+def compress_message(text: Optional[str], dictionary: bytes) -> Optional[bytes]:
+    """Deflate *text* primed with *dictionary*; ``None`` passes through."""
+    if text is None:
+        return None
+    compressor = zlib.compressobj(9, zlib.DEFLATED, _WBITS, zdict=dictionary)
+    return compressor.compress(str(text).encode("utf-8")) + compressor.flush()
+
+
+def decompress_message(blob: Optional[bytes], dictionary: bytes) -> Optional[str]:
+    """Inverse of :func:`compress_message`."""
+    if blob is None:
+        return None
+    decompressor = zlib.decompressobj(_WBITS, zdict=dictionary)
+    return (decompressor.decompress(blob) + decompressor.flush()).decode("utf-8")
+
+
+def train_dictionary(messages: Iterable[str], size: int = 16 * 1024) -> bytes:
+    """
+    Build a preset dictionary from sample *messages*.
+
+    Each message is split on digit runs — amounts, dates, account and
+    reference numbers — leaving the fixed template text between them. Those
+    fragments are scored by ``messages containing it × length`` and packed
+    up to *size* bytes, strongest last; any space left over is filled with
+    :data:`DEFAULT_DICTIONARY`.
+    """
+    size = min(size, MAX_DICTIONARY_SIZE)
+    counts: Counter = Counter()
+    for message in messages:
+        counts.update({f for f in _DIGIT_RUN_RE.split(message or "") if len(f) >= 3})
+
+    ranked = sorted(
+        (gram for gram, count in counts.items() if count > 1),
+        key=lambda gram: counts[gram] * len(gram),
+        reverse=True,
+    )
+
+    chosen: List[str] = []
+    used = 0
+    for gram in ranked:
+        encoded = len(gram.encode("utf-8"))
+        if used + encoded > size or any(gram in kept for kept in chosen):
+            continue
+        chosen.append(gram)
+        used += encoded
+
+    trained = "".join(reversed(chosen)).encode("utf-8")
+    room = size - len(trained)
+    return (DEFAULT_DICTIONARY[-room:] if room > 0 else b"") + trained
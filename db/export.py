@@ -0,0 +1,114 @@
+"""
+db/export.py
+------------
+Chunked CSV / NDJSON encoders used for streaming exports, and the JSON
+encoding used for API responses built from DataFrames.
+
+Encoders consume batches of row tuples (as yielded by ``cursor.fetchmany``)
+and yield UTF-8 byte chunks, so the full export never exists in memory.
+
+JSON goes through ``orjson`` when it is installed (several times faster than
+the standard library, and it emits bytes directly); ``json`` is the fallback.
+``frame_records`` converts a DataFrame column by column rather than row by
+row, which is where ``astype(object).where(...).to_dict("records")`` spends
+its time on large pages.
+
+Public surface:
+    EXPORT_FORMATS                              -> {format: media type}
+    encode_rows(batches, columns, fmt)          -> Iterator[bytes]
+    frame_batches(df, chunk_rows)               -> Iterator[list[tuple]]
+    dumps(obj)                                  -> bytes  (compact JSON)
+    frame_records(df)                           -> list[dict]  (JSON-ready values)
+    frame_to_ndjson(df)                         -> bytes
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_rows(
+    batches: Iterable[Sequence[Tuple[Any, ...]]],
+    columns: Sequence[str],
+    fmt: str = "csv",
+) -> Iterator[bytes]:
+    """Yield one encoded chunk per batch; CSV output starts with a header row."""
+    if fmt == "csv":
+        return _csv_chunks(batches, columns)
+    if fmt == "ndjson":
+        return _ndjson_chunks(batches, columns)
+    raise ValueError(f"Unsupported export format: {fmt!r}")
+
+
+def frame_batches(df: pd.DataFrame, chunk_rows: int = 5000) -> Iterator[List[Tuple[Any, ...]]]:
+    """Slice *df* into row-tuple batches for :func:`encode_rows`."""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object).where(lambda d: d.notna(), None)
+        yield list(chunk.itertuples(index=False, name=None))
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON; values JSON cannot represent are written with ``str``."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def frame_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """*df* as a list of row dicts holding only JSON-native values.
+
+    Datetimes become strings (as ``astype(str)`` renders them), missing values
+    become ``None`` and numpy scalars become Python ones. Each column is
+    converted in one vectorised step; only the final zip is per row.
+    """
+    columns = [str(c) for c in df.columns]
+    values = [_json_column(df.iloc[:, i]) for i in range(df.shape[1])]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def frame_to_ndjson(df: pd.DataFrame) -> bytes:
+    """*df* as newline-delimited JSON, one object per row."""
+    return b"".join(dumps(record) + b"\n" for record in frame_records(df))
+
+
+def _json_column(series: pd.Series) -> List[Any]:
+    missing = series.isna()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.astype(str)
+    if not missing.any():
+        return series.tolist()
+    return series.astype(object).where(~missing, None).tolist()
+
+
+def _csv_chunks(batches: Iterable[Sequence[Tuple[Any, ...]]], columns: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(batches: Iterable[Sequence[Tuple[Any, ...]]], columns: Sequence[str]) -> Iterator[bytes]:
+    for batch in batches:
+        if batch:
+            yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in batch)
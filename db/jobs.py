@@ -0,0 +1,166 @@
+"""
+db/jobs.py
+----------
+SQLite-backed status table for background upload jobs.
+
+The API process creates a row when an upload is accepted; the worker process
+that handles it updates the counters as it goes, so ``/jobs/{id}`` can be
+answered from any process without a broker or shared memory. The table lives
+in its own file (``data/jobs.db`` by default, ``BUDGET_JOBS_DB`` to override)
+so it works the same in single-file and sharded mode.
+
+Public surface:
+    JOB_STATUSES                                 -> ("queued", "running", "done", "failed")
+    JobStore(path)
+        .create(filename, user_id)               -> str   (job id)
+        .start(job_id)                           -> None
+        .progress(job_id, rows_read, rows_parsed, rows_saved) -> None
+        .finish(job_id, total_in_db, error)      -> None
+        .get(job_id)                             -> dict | None
+        .fail_unfinished(reason)                 -> int   (orphaned jobs marked failed)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Generator, Optional
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+_JOBS_DDL = """
+    CREATE TABLE IF NOT EXISTS upload_jobs (
+        id          TEXT    PRIMARY KEY,
+        user_id     TEXT    NOT NULL,
+        filename    TEXT,
+        status      TEXT    NOT NULL DEFAULT 'queued',
+        rows_read   INTEGER NOT NULL DEFAULT 0,   -- raw SMS rows consumed
+        rows_parsed INTEGER NOT NULL DEFAULT 0,   -- financial transactions found
+        rows_saved  INTEGER NOT NULL DEFAULT 0,   -- new rows in the store (duplicates skipped)
+        total_in_db INTEGER,
+        error       TEXT,
+        owner_pid   INTEGER,                      -- API process that queued the job
+        created_at  REAL    NOT NULL,             -- epoch seconds
+        started_at  REAL,
+        finished_at REAL
+    )
+"""
+
+
+class JobStore:
+    def __init__(self, path: str = "") -> None:
+        if not path:
+            path = os.getenv("BUDGET_JOBS_DB") or str(Path(__file__).resolve().parents[1] / "data" / "jobs.db")
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(_JOBS_DDL)
+
+    @contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection, None, None]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def create(self, filename: str, user_id: str = "default") -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO upload_jobs (id, user_id, filename, owner_pid, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, user_id, filename, os.getpid(), time.time()),
+            )
+        return job_id
+
+    def start(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE upload_jobs SET status = 'running', started_at = ? WHERE id = ?",
+                (time.time(), job_id),
+            )
+
+    def progress(self, job_id: str, rows_read: int, rows_parsed: int, rows_saved: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE upload_jobs SET rows_read = ?, rows_parsed = ?, rows_saved = ? WHERE id = ?",
+                (rows_read, rows_parsed, rows_saved, job_id),
+            )
+
+    def finish(self, job_id: str, total_in_db: Optional[int] = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE upload_jobs
+                SET status = ?, total_in_db = COALESCE(?, total_in_db), error = ?, finished_at = ?
+                WHERE id = ?
+                """,
+                ("failed" if error else "done", total_in_db, error, time.time(), job_id),
+            )
+
+    def fail_unfinished(self, reason: str) -> int:
+        """Mark queued/running jobs failed whose owning API process is gone.
+
+        Called at startup: a restart loses the worker pool and its queue.
+        Jobs owned by other live API processes on this host are left alone.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM upload_jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            orphaned = [row["id"] for row in rows if not _pid_alive(row["owner_pid"])]
+            conn.executemany(
+                "UPDATE upload_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                [(reason, time.time(), job_id) for job_id in orphaned],
+            )
+        return len(orphaned)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job row plus ``elapsed_seconds`` and ``rows_per_second``; ``None`` if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("owner_pid")
+        elapsed = None
+        if job["started_at"] is not None:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        job["elapsed_seconds"] = round(elapsed, 3) if elapsed is not None else None
+        job["rows_per_second"] = round(job["rows_read"] / elapsed, 1) if elapsed else None
+        for key in ("created_at", "started_at", "finished_at"):
+            if job[key] is not None:
+                job[key] = datetime.fromtimestamp(job[key]).isoformat(timespec="seconds")
+        return job
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        # Our own jobs can't be running yet if we are only starting up.
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
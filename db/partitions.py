@@ -0,0 +1,120 @@
+"""
+db/partitions.py
+----------------
+Catalog and planning helpers for month-partitioned archive files.
+
+Closed months are moved out of the main ``transactions`` table into one
+SQLite file per month (``archive/<db stem>_YYYY_MM.db`` next to the main DB).
+The main DB keeps a catalog of those files; everything older than the
+*archive horizon* (the end of the newest archived month) lives in a
+partition, everything newer stays in the main DB. Because partitions never
+overlap each other or the main table, "main first, then partitions newest
+first" is already ``date DESC`` order and range queries can stop early.
+
+Lookup tables, compression dictionaries, rollups and the search index stay
+in the main DB.
+
+Public surface:
+    CATALOG_DDL                                   -> tuple of CREATE statements
+    Partition(month, path, start_date, end_date)  -> NamedTuple
+    month_key(epoch)                              -> "YYYY-MM"
+    month_bounds(month)                           -> (start_epoch, end_epoch_exclusive)
+    partition_path(db_path, month)                -> Path
+    archive_horizon(conn)                         -> int | None
+    overlapping_partitions(conn, db_path, start, end) -> List[Partition]  (newest first)
+    attached(conn, path, alias)                   -> context manager
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+CATALOG_DDL: Tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        month       TEXT    PRIMARY KEY,        -- 'YYYY-MM'
+        path        TEXT    NOT NULL,           -- relative to the main DB's directory
+        start_date  INTEGER NOT NULL,           -- epoch seconds, inclusive
+        end_date    INTEGER NOT NULL,           -- epoch seconds, exclusive
+        archived_at TEXT    DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Lets COUNT(*)-style totals include archived rows without opening files.
+    """
+    CREATE TABLE IF NOT EXISTS archive_user_counts (
+        month     TEXT    NOT NULL,
+        user_id   TEXT    NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, user_id)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+class Partition(NamedTuple):
+    month: str
+    path: Path
+    start_date: int
+    end_date: int
+
+
+def month_key(epoch: int) -> str:
+    return pd.Timestamp(int(epoch), unit="s").strftime("%Y-%m")
+
+
+def month_bounds(month: str) -> Tuple[int, int]:
+    """Return ``[start, end)`` epoch seconds for a ``YYYY-MM`` month."""
+    start = pd.Period(month, freq="M").start_time
+    end = start + pd.offsets.MonthBegin(1)
+    return (
+        int((start - pd.Timestamp(0)) // pd.Timedelta(seconds=1)),
+        int((end - pd.Timestamp(0)) // pd.Timedelta(seconds=1)),
+    )
+
+
+def partition_path(db_path: str, month: str) -> Path:
+    main = Path(db_path)
+    return main.parent / "archive" / f"{main.stem}_{month.replace('-', '_')}.db"
+
+
+def archive_horizon(conn: sqlite3.Connection) -> Optional[int]:
+    """Epoch at which the main table takes over, or ``None`` if nothing is archived."""
+    return conn.execute("SELECT MAX(end_date) FROM archive_partitions").fetchone()[0]
+
+
+def overlapping_partitions(
+    conn: sqlite3.Connection,
+    db_path: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> List[Partition]:
+    """Partitions intersecting ``[start, end]`` (either bound optional), newest first."""
+    rows = conn.execute(
+        """
+        SELECT month, path, start_date, end_date FROM archive_partitions
+        WHERE (? IS NULL OR end_date > ?) AND (? IS NULL OR start_date <= ?)
+        ORDER BY start_date DESC
+        """,
+        (start, start, end, end),
+    ).fetchall()
+    base = Path(db_path).parent
+    return [Partition(r[0], base / r[1], r[2], r[3]) for r in rows]
+
+
+@contextmanager
+def attached(conn: sqlite3.Connection, path: Path, alias: str = "archive") -> Generator[str, None, None]:
+    """ATTACH *path* as *alias* for the duration of the block.
+
+    Must be entered outside a transaction, and every statement reading the
+    alias must be finished before the block exits.
+    """
+    conn.execute("ATTACH DATABASE ? AS " + alias, (str(path),))
+    try:
+        yield alias
+    finally:
+        conn.execute("DETACH DATABASE " + alias)
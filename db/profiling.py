@@ -0,0 +1,255 @@
+"""
+db/profiling.py
+---------------
+Opt-in SQL instrumentation: per-statement latency histograms and a slow-query
+log carrying each slow statement's ``EXPLAIN QUERY PLAN``.
+
+``DataPersistence`` opens its connections with :class:`ProfiledConnection`
+when a :class:`QueryProfiler` is attached (``profiler=`` or the
+``BUDGET_SLOW_QUERY_MS`` environment variable). Every ``execute`` /
+``executemany`` — including the ones pandas issues through ``cursor()`` — is
+timed. Statements are grouped by their normalised text, so the dynamically
+built ``get_transactions`` queries show up once per filter combination.
+
+Execution time is measured up to the first row; time spent fetching the
+rest is tracked separately as ``fetch_ms``.
+
+Public surface:
+    QueryProfiler(threshold_ms, explain_first_seen, max_slow)
+        .stats()          -> Dict[str, dict]   (count, rows, total/avg/max/fetch ms, histogram)
+        .slow_queries()   -> List[dict]        (most recent first, with plans)
+        .plans()          -> Dict[str, List[str]]
+        .reset()          -> None
+    ProfiledConnection    sqlite3.Connection factory
+    normalize_sql(sql)    -> str
+    profiler_from_env()   -> QueryProfiler | None
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended.
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and ``IN (?, ?, ...)`` lists so variants group together."""
+    return _PLACEHOLDER_LIST_RE.sub("(?, ...)", _WHITESPACE_RE.sub(" ", sql).strip())
+
+
+class QueryProfiler:
+    def __init__(self, threshold_ms: float = 100.0, explain_first_seen: bool = False, max_slow: int = 200) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain_first_seen = explain_first_seen
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._plans: Dict[str, List[str]] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=max_slow)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        params: Optional[Sequence[Any]],
+        elapsed_ms: float,
+        rows: int = 1,
+    ) -> None:
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            first_seen = entry is None
+            if first_seen:
+                entry = self._stats[key] = {
+                    "count": 0,
+                    "rows": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "fetch_ms": 0.0,
+                    "buckets": [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                }
+            entry["count"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["buckets"][_bucket(elapsed_ms)] += 1
+
+        slow = elapsed_ms >= self.threshold_ms
+        if not (slow or (first_seen and self.explain_first_seen)):
+            return
+        plan = self._explain(conn, sql, params)
+        with self._lock:
+            if plan:
+                self._plans.setdefault(key, plan)
+            if slow:
+                self._slow.appendleft({
+                    "sql": key,
+                    "elapsed_ms": round(elapsed_ms, 3),
+                    "at": time.time(),
+                    "plan": plan,
+                })
+        if slow:
+            logger.warning("Slow query (%.1f ms): %s\n  plan: %s", elapsed_ms, key, " | ".join(plan) or "n/a")
+
+    def record_fetch(self, sql: str, elapsed_ms: float) -> None:
+        with self._lock:
+            entry = self._stats.get(normalize_sql(sql))
+            if entry is not None:
+                entry["fetch_ms"] += elapsed_ms
+
+    @staticmethod
+    def _explain(conn: sqlite3.Connection, sql: str, params: Optional[Sequence[Any]]) -> List[str]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # A plain cursor, so the EXPLAIN itself is not profiled.
+            rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error as exc:
+            return [f"plan unavailable: {exc}"]
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-statement counters keyed by normalised SQL.
+
+        ``count`` is executions, ``rows`` the parameter sets bound (more than
+        ``count`` for ``executemany``), and ``histogram`` maps each bucket's
+        upper bound in ms to the number of executions that fell in it.
+        """
+        labels = [str(b) for b in HISTOGRAM_BUCKETS_MS] + ["+Inf"]
+        with self._lock:
+            return {
+                key: {
+                    "count": entry["count"],
+                    "rows": entry["rows"],
+                    "total_ms": round(entry["total_ms"], 3),
+                    "avg_ms": round(entry["total_ms"] / max(entry["count"], 1), 3),
+                    "max_ms": round(entry["max_ms"], 3),
+                    "fetch_ms": round(entry["fetch_ms"], 3),
+                    "histogram": dict(zip(labels, entry["buckets"])),
+                }
+                for key, entry in self._stats.items()
+            }
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._slow)
+
+    def plans(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return dict(self._plans)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+            self._slow.clear()
+
+
+def profiler_from_env() -> Optional[QueryProfiler]:
+    """A profiler when ``BUDGET_SLOW_QUERY_MS`` is set, else ``None``.
+
+    ``BUDGET_EXPLAIN_ALL=1`` also captures the plan of every distinct
+    statement the first time it runs, not only the slow ones.
+    """
+    threshold = os.getenv("BUDGET_SLOW_QUERY_MS")
+    if not threshold:
+        return None
+    return QueryProfiler(float(threshold), explain_first_seen=os.getenv("BUDGET_EXPLAIN_ALL") == "1")
+
+
+def _bucket(elapsed_ms: float) -> int:
+    for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            return i
+    return len(HISTOGRAM_BUCKETS_MS)
+
+
+# ---------------------------------------------------------------------------
+# Connection / cursor
+# ---------------------------------------------------------------------------
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    _sql: str = ""
+
+    def execute(self, sql: str, parameters: Sequence[Any] = (), /) -> "ProfiledCursor":
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql = sql
+            self.connection.profiler.record(
+                self.connection, sql, parameters, (time.perf_counter() - started) * 1000.0
+            )
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Sequence[Any]], /) -> "ProfiledCursor":
+        params = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, params)
+        finally:
+            self._sql = sql
+            self.connection.profiler.record(
+                self.connection, sql, params[0] if params else None,
+                (time.perf_counter() - started) * 1000.0, rows=max(len(params), 1),
+            )
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self.connection.profiler.record_fetch(self._sql, (time.perf_counter() - started) * 1000.0)
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(size)
+        finally:
+            self.connection.profiler.record_fetch(self._sql, (time.perf_counter() - started) * 1000.0)
+
+    def fetchall(self) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self.connection.profiler.record_fetch(self._sql, (time.perf_counter() - started) * 1000.0)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """``sqlite3.connect(factory=...)`` target; set ``.profiler`` before use."""
+
+    profiler: QueryProfiler
+
+    def cursor(self, factory: type = ProfiledCursor) -> sqlite3.Cursor:  # type: ignore[override]
+        return super().cursor(factory)
+
+    # The C shortcuts bypass cursor(), so route them through a profiled cursor.
+    def execute(self, sql: str, parameters: Sequence[Any] = (), /) -> sqlite3.Cursor:  # type: ignore[override]
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(  # type: ignore[override]
+        self, sql: str, seq_of_parameters: Iterable[Sequence[Any]], /
+    ) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -6,21 +6,256 @@ SQLite persistence layer for transactions, budgets, and custom categories.
 
 from __future__ import annotations
 
+import base64
+import hashlib
+import json
+import logging
+import os
 import sqlite3
 import shutil
-from contextlib import contextmanager
+import threading
+import time
+from contextlib import closing, contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Sequence, Tuple
 
 import pandas as pd
 
+from db.backup import DEFAULT_PAGES, DEFAULT_SLEEP, backup_database, snapshot_name, verify_database
+from db.columnar import COLUMNAR_AVAILABLE, ColumnarMirror
+from db.compression import DEFAULT_DICTIONARY, compress_message, decompress_message, train_dictionary
+from db.export import dumps, encode_rows
+from db.partitions import (
+    CATALOG_DDL,
+    Partition,
+    archive_horizon,
+    attached,
+    month_bounds,
+    month_key,
+    overlapping_partitions,
+    partition_path,
+)
+from db.profiling import ProfiledConnection, QueryProfiler, profiler_from_env
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the on-disk layout changes; see ``_migrate_schema``.
+#   1 — original layout, ``transactions.date`` as TEXT "%Y-%m-%d %H:%M:%S"
+#   2 — ``transactions.date`` as INTEGER epoch seconds
+#   3 — ``category`` / ``merchant`` dictionary-encoded via lookup tables
+#   4 — ``original_message`` compressed into ``message_bodies``; ``dedup_key``
+SCHEMA_VERSION = 4
+
+_TRANSACTIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        date             INTEGER NOT NULL,
+        amount           REAL    NOT NULL,
+        transaction_type TEXT    NOT NULL,
+        category_id      INTEGER NOT NULL REFERENCES categories (id),
+        merchant_id      INTEGER REFERENCES merchants (id),
+        dedup_key        TEXT,
+        created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
+        user_id          TEXT    DEFAULT 'default'
+    )
+"""
+
+# Message text lives apart from the hot row, deflated with a preset dictionary
+# from ``compression_dicts`` (see db/compression.py). Every transaction gets a
+# row here, with a NULL body when there is no message.
+_MESSAGE_DDL: Tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS compression_dicts (
+        id         INTEGER PRIMARY KEY,
+        dictionary BLOB    NOT NULL,
+        created_at TEXT    DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS message_bodies (
+        transaction_id INTEGER PRIMARY KEY,
+        dict_id        INTEGER NOT NULL REFERENCES compression_dicts (id),
+        body           BLOB
+    )
+    """,
+)
+
+# Append-only name tables; ids are never reused, so decoded names can be cached.
+_LOOKUP_TABLES: Tuple[str, ...] = ("categories", "merchants")
+
+_LOOKUP_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id   INTEGER PRIMARY KEY,
+        name TEXT    NOT NULL UNIQUE
+    )
+"""
+
+_TRANSACTION_INDEXES: Tuple[str, ...] = (
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+    ON transactions (user_id, date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_category
+    ON transactions (user_id, category_id)
+    """,
+    # Covering index for the summary / category-total aggregates.
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_type_category
+    ON transactions (user_id, transaction_type, category_id, amount, date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_dedup
+    ON transactions (user_id, dedup_key)
+    """,
+)
+
+# Contentless trigram index: substring / prefix search over message bodies and
+# merchant names without storing a second copy of the text.
+_SEARCH_DDL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        original_message, merchant, content = '', tokenize = 'trigram'
+    )
+"""
+
+SEARCH_FIELDS: Tuple[str, ...] = ("original_message", "merchant")
+
+# The index is fed from ``message_bodies`` (the merchant is looked up through
+# the owning transaction), so bodies must be written after, and deleted before,
+# their transaction row. ``inflate_message`` is registered on every connection
+# by ``DataPersistence._connect``. Contentless FTS5 deletes need the original
+# column values, which is why the delete branch re-supplies them.
+_SEARCH_TRIGGERS: Tuple[str, ...] = (
+    """
+    CREATE TRIGGER IF NOT EXISTS message_bodies_fts_insert AFTER INSERT ON message_bodies BEGIN
+        INSERT INTO transactions_fts (rowid, original_message, merchant)
+        VALUES (new.transaction_id, inflate_message(new.dict_id, new.body),
+                (SELECT m.name FROM transactions t JOIN merchants m ON m.id = t.merchant_id
+                 WHERE t.id = new.transaction_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS message_bodies_fts_delete AFTER DELETE ON message_bodies BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, original_message, merchant)
+        VALUES ('delete', old.transaction_id, inflate_message(old.dict_id, old.body),
+                (SELECT m.name FROM transactions t JOIN merchants m ON m.id = t.merchant_id
+                 WHERE t.id = old.transaction_id));
+    END
+    """,
+)
+
+# Columns callers may project in ``get_transactions``; anything else is
+# rejected before it reaches the SQL string.
+TRANSACTION_COLUMNS: Tuple[str, ...] = (
+    "id", "date", "amount", "transaction_type", "category",
+    "merchant", "original_message", "created_at", "user_id",
+)
+
+_MESSAGE_SELECT = "SELECT inflate_message(b.dict_id, b.body) FROM {schema}.message_bodies b"
+
+# ``original_message`` is only decompressed when a caller asks for it.
+DEFAULT_COLUMNS: Tuple[str, ...] = tuple(c for c in TRANSACTION_COLUMNS if c != "original_message")
+
+# Logical column -> (id column on ``transactions``, lookup table).
+_ENCODED_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "category": ("category_id", "categories"),
+    "merchant": ("merchant_id", "merchants"),
+}
+
+
+def to_epoch_seconds(dates: pd.Series) -> pd.Series:
+    """Vectorised datetime -> int64 epoch seconds (wall-clock, tz dropped)."""
+    dates = pd.to_datetime(dates, errors="coerce")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return (dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+def from_epoch_seconds(values: pd.Series) -> pd.Series:
+    """Inverse of :func:`to_epoch_seconds`."""
+    return pd.to_datetime(values, unit="s", errors="coerce")
+
+
+def _epoch_param(value: Any) -> int:
+    """Convert a ``start_date`` / ``end_date`` style argument to epoch seconds."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int((pd.Timestamp(value).tz_localize(None) - pd.Timestamp(0)) // pd.Timedelta(seconds=1))
+
+
+def encode_cursor(date: Any, row_id: int) -> str:
+    """Return an opaque keyset cursor for the ``(date, id)`` of a row."""
+    raw = f"{_epoch_param(date)}|{int(row_id)}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Inverse of :func:`encode_cursor`. Raises ``ValueError`` on bad input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").rsplit("|", 1)
+        return int(date), int(row_id)
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+def dedup_key(message: Any, date: int, amount: Any) -> Optional[str]:
+    """Hash of (message, epoch date, amount); ``None`` for rows without a message."""
+    if message is None or (isinstance(message, float) and pd.isna(message)):
+        return None
+    raw = f"{message}|{int(date)}|{float(amount)!r}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+
+# Called after each committed write with (user_id, new rows); see add_write_listener.
+WriteListener = Callable[[str, pd.DataFrame], None]
+
+# Database files this process has already brought up to date, by path -> inode.
+# Inherited across fork, so workers forked from a warmed-up parent skip the
+# schema checks; a replaced or deleted file gets a new inode and is re-checked.
+_READY_SCHEMAS: Dict[str, int] = {}
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return None
+
 
 class DataPersistence:
-    def __init__(self, db_path: str = "") -> None:
+    def __init__(
+        self,
+        db_path: str = "",
+        columnar_dir: Optional[str] = None,
+        profiler: Optional[QueryProfiler] = None,
+        use_columnar: bool = True,
+    ) -> None:
         self.db_path = self._resolve_db_path(db_path)
-        self._init_database()
-        self._migrate_budgets_table()
+        # Opt-in statement timing; see db/profiling.py.
+        self.profiler = profiler or profiler_from_env()
+        self._lookup_cache: Dict[str, Dict[int, str]] = {t: {} for t in _LOOKUP_TABLES}
+        self._dictionaries: Dict[int, bytes] = {}
+        self._write_listeners: List[WriteListener] = []
+        # Held open for data_version() reads; see _version_reader().
+        self._version_lock = threading.Lock()
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_pid = 0
+        inode = _inode(self.db_path)
+        if inode is None or _READY_SCHEMAS.get(self.db_path) != inode:
+            self._prepare_schema()
+
+        self.columnar: Optional[ColumnarMirror] = None
+        # Only one process writes the mirror; upload workers pass use_columnar=False.
+        columnar_dir = (columnar_dir or os.getenv("BUDGET_COLUMNAR_DIR")) if use_columnar else None
+        if columnar_dir and not COLUMNAR_AVAILABLE:
+            logger.warning("Columnar mirror requested at %s but pyarrow is not installed", columnar_dir)
+        elif columnar_dir:
+            self.columnar = ColumnarMirror(columnar_dir)
+            self.sync_columnar()
+            self.add_write_listener(lambda _user_id, rows: self.columnar.append(rows))
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -36,21 +271,28 @@ class DataPersistence:
         preferred = data_dir / "budget_data.db"
         legacy = base_dir / "budget_data.db"
         if not preferred.exists() and legacy.exists():
+            # The backup API copies a consistent image even if another
+            # process is still writing to the legacy file.
             try:
-                shutil.copy2(legacy, preferred)
-            except OSError:
+                backup_database(str(legacy), str(preferred))
+            except (OSError, sqlite3.DatabaseError):
                 return str(legacy)
         return str(preferred)
 
     @contextmanager
-    def _connect(self) -> Generator[sqlite3.Connection, None, None]:
+    def _connect(self, check_same_thread: bool = True) -> Generator[sqlite3.Connection, None, None]:
         conn = sqlite3.connect(
             self.db_path,
             detect_types=sqlite3.PARSE_DECLTYPES,
             timeout=5.0,
+            check_same_thread=check_same_thread,
+            factory=ProfiledConnection if self.profiler else sqlite3.Connection,
         )
+        if self.profiler:
+            conn.profiler = self.profiler
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA busy_timeout = 5000")
+        conn.create_function("inflate_message", 2, self._inflate_message, deterministic=True)
         try:
             yield conn
             conn.commit()
@@ -60,22 +302,85 @@ class DataPersistence:
         finally:
             conn.close()
 
+    @contextmanager
+    def _open_partition(self, path: Path) -> Generator[sqlite3.Connection, None, None]:
+        """Connect straight to an archive file, creating its tables on first use.
+
+        Archives hold ``transactions`` and ``message_bodies`` in the main
+        layout; ids are allocated by the main DB so they never collide.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            str(path), timeout=5.0, factory=ProfiledConnection if self.profiler else sqlite3.Connection
+        )
+        if self.profiler:
+            conn.profiler = self.profiler
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        try:
+            conn.execute(_TRANSACTIONS_DDL.format(table="transactions"))
+            conn.execute(_MESSAGE_DDL[1])
+            for ddl in _TRANSACTION_INDEXES:
+                conn.execute(ddl)
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _scan(
+        self,
+        conn: sqlite3.Connection,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[str]:
+        """Yield the schema to read for each source overlapping ``[start, end]``, newest first.
+
+        ``main`` always comes first; archive partitions are attached one at a
+        time, only while the caller is reading them, so a query whose range
+        (or LIMIT) is satisfied by recent data never opens an archive.
+        """
+        partitions = overlapping_partitions(conn, self.db_path, start, end)
+        yield "main"
+        for partition in partitions:
+            with attached(conn, partition.path) as alias:
+                yield alias
+
+    def list_partitions(self) -> List[Partition]:
+        """Archived months, newest first."""
+        with self._connect() as conn:
+            return overlapping_partitions(conn, self.db_path)
+
+    def _prepare_schema(self) -> None:
+        """Create missing tables and bring an older file up to the current schema."""
+        self._init_database()
+        self._migrate_schema()
+        self._migrate_budgets_table()
+        self._migrate_daily_rollups()
+        self._migrate_search_index()
+        _READY_SCHEMAS[self.db_path] = _inode(self.db_path)
+
     def _init_database(self) -> None:
         """Create tables and indexes. Safe to call on existing DBs."""
         with self._connect() as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id               INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date             TEXT    NOT NULL,
-                    amount           REAL    NOT NULL,
-                    transaction_type TEXT    NOT NULL,
-                    category         TEXT    NOT NULL,
-                    merchant         TEXT,
-                    original_message TEXT,
-                    created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
-                    user_id          TEXT    DEFAULT 'default'
-                )
-            """)
+            # WAL lets long-running readers (streaming exports) coexist with writers.
+            conn.execute("PRAGMA journal_mode = WAL")
+            fresh = not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+            ).fetchone()
+            for table in _LOOKUP_TABLES:
+                conn.execute(_LOOKUP_DDL.format(table=table))
+            conn.execute(_TRANSACTIONS_DDL.format(table="transactions"))
+            for ddl in _MESSAGE_DDL + CATALOG_DDL:
+                conn.execute(ddl)
+            conn.execute(
+                "INSERT OR IGNORE INTO compression_dicts (id, dictionary) VALUES (1, ?)",
+                (DEFAULT_DICTIONARY,),
+            )
+            if fresh:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS budgets (
                     id           INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -96,14 +401,163 @@ class DataPersistence:
                     created_at    TEXT DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # Idempotency index for webhook deliveries; see get_webhook_receipt.
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_transactions_user_date
-                ON transactions (user_id, date)
+                CREATE TABLE IF NOT EXISTS webhook_receipts (
+                    user_id     TEXT    NOT NULL,
+                    message_id  TEXT    NOT NULL,
+                    response    TEXT    NOT NULL,   -- JSON result returned the first time
+                    received_at REAL    NOT NULL,   -- epoch seconds
+                    PRIMARY KEY (user_id, message_id)
+                ) WITHOUT ROWID
             """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_webhook_receipts_received ON webhook_receipts (received_at)"
+            )
+            # Per-user change counters shared by every process; see data_version().
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_transactions_category
-                ON transactions (user_id, category)
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    user_id TEXT    PRIMARY KEY,   -- '*' is a floor for every user (restore)
+                    version INTEGER NOT NULL
+                ) WITHOUT ROWID
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_data_versions_version ON data_versions (version)")
+            # Counting from the creation time (in microseconds) keeps a
+            # recreated database from reissuing versions clients already hold.
+            conn.execute(
+                "INSERT OR IGNORE INTO data_versions (user_id, version) VALUES ('*', ?)",
+                (time.time_ns() // 1000,),
+            )
+
+    def _migrate_schema(self) -> None:
+        """Step the DB forward from its ``PRAGMA user_version`` to ``SCHEMA_VERSION``.
+
+        Each step rebuilds tables with its own frozen DDL; indexes are created
+        once afterwards against the final layout.
+        """
+        steps = {
+            2: self._migrate_v2_epoch_dates,
+            3: self._migrate_v3_lookup_tables,
+            4: self._migrate_v4_message_bodies,
+        }
+        with self._connect() as conn:
+            version = max(1, conn.execute("PRAGMA user_version").fetchone()[0])
+            if version < SCHEMA_VERSION:
+                conn.execute("BEGIN")
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    steps[target](conn)
+                    conn.execute(f"PRAGMA user_version = {target}")
+            for ddl in _TRANSACTION_INDEXES:
+                conn.execute(ddl)
+
+    @staticmethod
+    def _migrate_v2_epoch_dates(conn: sqlite3.Connection) -> None:
+        """Rebuild ``transactions`` with ``date`` as INTEGER epoch seconds.
+
+        Unparseable legacy dates are kept at epoch 0 rather than dropped.
+        """
+        conn.execute("""
+            CREATE TABLE transactions_v2 (
+                id               INTEGER PRIMARY KEY AUTOINCREMENT,
+                date             INTEGER NOT NULL,
+                amount           REAL    NOT NULL,
+                transaction_type TEXT    NOT NULL,
+                category         TEXT    NOT NULL,
+                merchant         TEXT,
+                original_message TEXT,
+                created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
+                user_id          TEXT    DEFAULT 'default'
+            )
+        """)
+        conn.execute("""
+            INSERT INTO transactions_v2
+                (id, date, amount, transaction_type, category, merchant,
+                 original_message, created_at, user_id)
+            SELECT id, COALESCE(CAST(strftime('%s', date) AS INTEGER), 0), amount,
+                   transaction_type, category, merchant, original_message, created_at, user_id
+            FROM transactions
+        """)
+        conn.execute("DROP TABLE transactions")
+        conn.execute("ALTER TABLE transactions_v2 RENAME TO transactions")
+
+    @staticmethod
+    def _migrate_v3_lookup_tables(conn: sqlite3.Connection) -> None:
+        """Move ``category`` / ``merchant`` text into lookup tables referenced by id."""
+        conn.execute("""
+            INSERT OR IGNORE INTO categories (name)
+            SELECT DISTINCT category FROM transactions WHERE category IS NOT NULL
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO merchants (name)
+            SELECT DISTINCT merchant FROM transactions WHERE merchant IS NOT NULL
+        """)
+        conn.execute("""
+            CREATE TABLE transactions_v3 (
+                id               INTEGER PRIMARY KEY AUTOINCREMENT,
+                date             INTEGER NOT NULL,
+                amount           REAL    NOT NULL,
+                transaction_type TEXT    NOT NULL,
+                category_id      INTEGER NOT NULL REFERENCES categories (id),
+                merchant_id      INTEGER REFERENCES merchants (id),
+                original_message TEXT,
+                created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
+                user_id          TEXT    DEFAULT 'default'
+            )
+        """)
+        conn.execute("""
+            INSERT INTO transactions_v3
+                (id, date, amount, transaction_type, category_id, merchant_id,
+                 original_message, created_at, user_id)
+            SELECT t.id, t.date, t.amount, t.transaction_type, c.id, m.id,
+                   t.original_message, t.created_at, t.user_id
+            FROM transactions t
+            JOIN categories c ON c.name = t.category
+            LEFT JOIN merchants m ON m.name = t.merchant
+        """)
+        conn.execute("DROP TABLE transactions")
+        conn.execute("ALTER TABLE transactions_v3 RENAME TO transactions")
+
+    @staticmethod
+    def _migrate_v4_message_bodies(conn: sqlite3.Connection) -> None:
+        """Move ``original_message`` into compressed ``message_bodies`` rows.
+
+        Bodies are deflated with the seed dictionary (id 1) and each row gains
+        the ``dedup_key`` that ``save_transactions`` checks instead of
+        re-reading every message.
+        """
+        for trigger in ("transactions_fts_insert", "transactions_fts_delete", "transactions_fts_update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("""
+            CREATE TABLE transactions_v4 (
+                id               INTEGER PRIMARY KEY AUTOINCREMENT,
+                date             INTEGER NOT NULL,
+                amount           REAL    NOT NULL,
+                transaction_type TEXT    NOT NULL,
+                category_id      INTEGER NOT NULL REFERENCES categories (id),
+                merchant_id      INTEGER REFERENCES merchants (id),
+                dedup_key        TEXT,
+                created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
+                user_id          TEXT    DEFAULT 'default'
+            )
+        """)
+        conn.execute("""
+            INSERT INTO transactions_v4
+                (id, date, amount, transaction_type, category_id, merchant_id, created_at, user_id)
+            SELECT id, date, amount, transaction_type, category_id, merchant_id, created_at, user_id
+            FROM transactions
+        """)
+        cursor = conn.execute("SELECT id, date, amount, original_message FROM transactions")
+        for rows in iter(lambda: cursor.fetchmany(1000), []):
+            conn.executemany(
+                "UPDATE transactions_v4 SET dedup_key = ? WHERE id = ?",
+                [(dedup_key(r["original_message"], r["date"], r["amount"]), r["id"]) for r in rows],
+            )
+            conn.executemany(
+                "INSERT INTO message_bodies (transaction_id, dict_id, body) VALUES (?, 1, ?)",
+                [(r["id"], compress_message(r["original_message"], DEFAULT_DICTIONARY)) for r in rows],
+            )
+        conn.execute("DROP TABLE transactions")
+        conn.execute("ALTER TABLE transactions_v4 RENAME TO transactions")
 
     def _migrate_budgets_table(self) -> None:
         """Ensure budgets can be upserted on ``(user_id, period)`` safely."""
@@ -126,6 +580,45 @@ class DataPersistence:
                 ON budgets (user_id, period)
             """)
 
+    def _migrate_daily_rollups(self) -> None:
+        """Create ``daily_rollups`` and backfill it once for pre-existing DBs."""
+        with self._connect() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollups'"
+            ).fetchone()
+            if exists:
+                return
+            conn.execute("""
+                CREATE TABLE daily_rollups (
+                    user_id          TEXT    NOT NULL,
+                    day              TEXT    NOT NULL,
+                    transaction_type TEXT    NOT NULL,
+                    category         TEXT    NOT NULL,
+                    amount_sum       REAL    NOT NULL DEFAULT 0,
+                    txn_count        INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, day, transaction_type, category)
+                ) WITHOUT ROWID
+            """)
+            self._rebuild_rollups(conn, None)
+
+    def _migrate_search_index(self) -> None:
+        """Create the FTS5 table, backfill it once, and (re)install its triggers."""
+        with self._connect() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            ).fetchone()
+            conn.execute(_SEARCH_DDL)
+            if not exists:
+                conn.execute("""
+                    INSERT INTO transactions_fts (rowid, original_message, merchant)
+                    SELECT t.id, inflate_message(b.dict_id, b.body), m.name
+                    FROM transactions t
+                    JOIN message_bodies b ON b.transaction_id = t.id
+                    LEFT JOIN merchants m ON m.id = t.merchant_id
+                """)
+            for ddl in _SEARCH_TRIGGERS:
+                conn.execute(ddl)
+
     # ------------------------------------------------------------------
     # Transactions
     # ------------------------------------------------------------------
@@ -135,9 +628,147 @@ class DataPersistence:
 
         Returns the total row count for *user_id* after the insert.
         """
+        return self.insert_transactions(df, user_id)[0]
+
+    def insert_transactions(self, df: pd.DataFrame, user_id: str = "default") -> Tuple[int, pd.DataFrame]:
+        """:meth:`save_transactions` that also returns the rows actually inserted.
+
+        The second item holds the new rows with their ids, indexed like *df*,
+        so callers can tell which inputs were stored and which were skipped
+        (duplicates, unparseable dates).
+        """
         if df.empty:
-            return self._count_transactions(user_id)
+            return self.count_transactions(user_id), df.iloc[0:0]
+
+        insert_df = self._prepare_rows(df, user_id)
+        with self._connect() as conn:
+            # Take the write lock up front so the duplicate check and the
+            # explicit ids in ``_insert_rows`` cannot race another writer.
+            conn.execute("BEGIN IMMEDIATE")
+            with metrics.timer("pipeline_stage_seconds", stage="insert"):
+                inserted = self._insert_rows(conn, insert_df, user_id)
+            if not inserted.empty:
+                self._bump_version(conn, user_id)
+            count = self._count_rows(conn, user_id)
+        self._notify_writes([(user_id, inserted)])
+        return count, inserted
+
+    def save_transactions_many(self, batches: Sequence[Tuple[pd.DataFrame, str]]) -> Dict[str, int]:
+        """Persist several ``(df, user_id)`` batches in a single write transaction.
+
+        Same duplicate rules as :meth:`save_transactions`, also applied within
+        the combined batches. Returns ``{user_id: total row count}``.
+        """
+        return self.insert_transactions_many(batches)[0]
+
+    def insert_transactions_many(
+        self, batches: Sequence[Tuple[pd.DataFrame, str]]
+    ) -> Tuple[Dict[str, int], List[pd.DataFrame]]:
+        """:meth:`save_transactions_many` that also returns each batch's inserted rows.
+
+        The list has one frame per batch, in order, indexed like that batch's
+        ``df``; a row repeated across batches counts for the first one only.
+        """
+        per_user: Dict[str, List[Tuple[int, pd.DataFrame]]] = {}
+        for number, (df, user_id) in enumerate(batches):
+            frames = per_user.setdefault(user_id, [])
+            if not df.empty:
+                frames.append((number, df))
+
+        totals: Dict[str, int] = {}
+        written: List[Tuple[str, pd.DataFrame]] = []
+        inserted: List[pd.DataFrame] = [df.iloc[0:0] for df, _ in batches]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for user_id, frames in per_user.items():
+                if frames:
+                    # Preparing one merged frame is far cheaper than one per
+                    # batch; the batch number leads the index to split it again.
+                    merged = self._prepare_rows(
+                        pd.concat([df for _, df in frames], keys=[n for n, _ in frames]), user_id
+                    )
+                    keyed = merged["dedup_key"].notna()
+                    rows = merged[~(keyed & merged["dedup_key"].duplicated())]
+                    with metrics.timer("pipeline_stage_seconds", stage="insert"):
+                        new_rows = self._insert_rows(conn, rows, user_id)
+                    if not new_rows.empty:
+                        self._bump_version(conn, user_id)
+                        for number, batch_rows in new_rows.groupby(level=0):
+                            inserted[number] = batch_rows.droplevel(0)
+                    written.append((user_id, new_rows.reset_index(drop=True)))
+                totals[user_id] = self._count_rows(conn, user_id)
+        self._notify_writes(written)
+        return totals, inserted
+
+    def data_version(self, user_id: str = "default") -> int:
+        """Counter that changes whenever *user_id*'s data changes.
 
+        Stored in the ``data_versions`` table and bumped inside the write
+        transaction by ``save_transactions*`` (when rows are inserted),
+        ``save_budget``, ``delete_user_data`` and ``restore``, so every
+        process (API workers, upload workers) sees the same value and it
+        survives restarts. Reading it is one primary-key lookup on a
+        connection held open for the purpose.
+        """
+        with self._version_lock:
+            row = self._version_reader().execute(
+                "SELECT MAX(version) FROM data_versions WHERE user_id IN (?, '*')", (user_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def touch(self, user_id: str) -> int:
+        """Bump and return *user_id*'s data version (for changes made outside this class)."""
+        with self._connect() as conn:
+            return self._bump_version(conn, user_id)
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection, user_id: str) -> int:
+        """Give *user_id* a version above every stored one, in *conn*'s transaction."""
+        conn.execute(
+            """
+            INSERT INTO data_versions (user_id, version)
+            VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM data_versions))
+            ON CONFLICT (user_id) DO UPDATE SET version = excluded.version
+            """,
+            (user_id,),
+        )
+        return conn.execute("SELECT version FROM data_versions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def _version_reader(self) -> sqlite3.Connection:
+        """The connection data_version() reads through; reopened after a fork."""
+        if self._version_conn is None or self._version_pid != os.getpid():
+            self._version_conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            self._version_pid = os.getpid()
+        return self._version_conn
+
+    def add_write_listener(self, listener: WriteListener) -> None:
+        """Call *listener(user_id, rows)* after every committed insert.
+
+        *rows* holds the new transactions with their ids and decoded
+        ``date``; listener errors are logged and never fail the write.
+        """
+        self._write_listeners.append(listener)
+
+    def _notify_writes(self, written: Sequence[Tuple[str, pd.DataFrame]]) -> None:
+        if not self._write_listeners:
+            return
+        for user_id, rows in written:
+            if rows.empty:
+                continue
+            rows = rows.assign(date=from_epoch_seconds(rows["date"]))
+            for listener in self._write_listeners:
+                try:
+                    listener(user_id, rows)
+                except Exception:
+                    logger.exception("Write listener %r failed for user %s", listener, user_id)
+
+    @staticmethod
+    def _prepare_rows(df: pd.DataFrame, user_id: str) -> pd.DataFrame:
+        """Project *df* onto the stored columns with epoch dates and ``dedup_key``.
+
+        A ``dedup_key`` column already on *df* (e.g. rows copied by
+        ``rebalance``) is kept where set; other rows get the message hash.
+        """
         required = ["date", "amount", "transaction_type", "category", "merchant", "original_message"]
         available = [c for c in required if c in df.columns]
 
@@ -146,54 +777,149 @@ class DataPersistence:
         insert_df["created_at"] = datetime.now().isoformat()
 
         if "date" in insert_df.columns:
-            insert_df["date"] = (
-                pd.to_datetime(insert_df["date"], errors="coerce")
-                .dt.strftime("%Y-%m-%d %H:%M:%S")
-            )
+            # ``date`` is NOT NULL; rows whose date cannot be parsed are skipped.
+            epochs = to_epoch_seconds(insert_df["date"])
+            insert_df = insert_df[epochs.notna()]
+            insert_df["date"] = epochs[epochs.notna()].astype("int64")
 
-        with self._connect() as conn:
-            existing = pd.read_sql_query(
-                "SELECT original_message, date, amount FROM transactions WHERE user_id = ? AND original_message IS NOT NULL",
-                conn,
-                params=(user_id,),
-            )
+        if "original_message" in insert_df.columns:
+            insert_df["dedup_key"] = [
+                dedup_key(m, d, a)
+                for m, d, a in zip(insert_df["original_message"], insert_df["date"], insert_df["amount"])
+            ]
+        else:
+            insert_df["dedup_key"] = None
+        if "dedup_key" in df.columns:
+            given = df.loc[insert_df.index, "dedup_key"]
+            insert_df["dedup_key"] = given.where(given.notna(), insert_df["dedup_key"])
+        return insert_df
 
-        if not existing.empty and "original_message" in insert_df.columns:
-            existing["_key"] = (
-                existing["original_message"].astype(str)
-                + "|" + existing["date"].astype(str)
-                + "|" + existing["amount"].astype(str)
-            )
-            existing_keys = set(existing["_key"])
-            mask = ~(
-                insert_df["original_message"].astype(str)
-                + "|" + insert_df["date"].astype(str)
-                + "|" + insert_df["amount"].astype(str)
-            ).isin(existing_keys)
-            insert_df = insert_df[mask]
+    def _insert_rows(self, conn: sqlite3.Connection, insert_df: pd.DataFrame, user_id: str) -> pd.DataFrame:
+        """Insert prepared rows not already stored for *user_id*; returns the new ones with ids.
+
+        Must run inside a ``BEGIN IMMEDIATE`` transaction on *conn*. Rows
+        dated before the archive horizon go to their month's partition file,
+        which is committed on its own just before *conn*; a crash in between
+        leaves rows that the duplicate check skips on retry, and
+        :meth:`rebuild_daily_rollups` recovers their totals.
+        """
+        if insert_df.empty:
+            return insert_df
+        horizon = archive_horizon(conn)
+        archived = (
+            insert_df["date"] < horizon if horizon is not None
+            else pd.Series(False, index=insert_df.index)
+        )
+        months = insert_df.loc[archived, "date"].map(month_key)
 
+        keep = ~insert_df["dedup_key"].isin(self._existing_keys(conn, insert_df.loc[~archived], user_id))
+        for month, rows in insert_df[archived].groupby(months):
+            with self._open_partition(self._register_partition(conn, month)) as part:
+                keep &= ~insert_df["dedup_key"].isin(self._existing_keys(part, rows, user_id))
+        insert_df, archived, months = insert_df[keep], archived[keep], months[keep[archived]]
         if insert_df.empty:
-            return self._count_transactions(user_id)
+            return insert_df
 
-        records = insert_df.to_dict("records")
-        col_names = list(records[0].keys())
+        # Ids are assigned here so the message bodies can reference them, and
+        # from the main DB's sequence so archived rows never collide.
+        next_id = conn.execute(
+            "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'transactions'), 0), "
+            "COALESCE((SELECT MAX(id) FROM transactions), 0)) + 1"
+        ).fetchone()[0]
+        insert_df = insert_df.assign(id=range(next_id, next_id + len(insert_df)))
+        messages = insert_df.pop("original_message") if "original_message" in insert_df.columns else None
+
+        encoded = insert_df.copy()
+        for column, (id_column, table) in _ENCODED_COLUMNS.items():
+            if column in encoded.columns:
+                ids = self._intern_names(conn, table, encoded[column])
+                encoded[id_column] = encoded.pop(column).map(ids)
+        encoded = encoded.astype(object).where(encoded.notna(), None)
+        if messages is not None:
+            encoded["original_message"] = messages.astype(object).where(messages.notna(), None)
+
+        dictionary = self._latest_dictionary(conn)
+        for month, rows in encoded[archived].groupby(months):
+            with self._open_partition(self._register_partition(conn, month)) as part:
+                self._write_rows(part, rows, dictionary)
+            conn.execute(
+                """
+                INSERT INTO archive_user_counts (month, user_id, row_count) VALUES (?, ?, ?)
+                ON CONFLICT (month, user_id) DO UPDATE SET row_count = row_count + excluded.row_count
+                """,
+                (month, user_id, len(rows)),
+            )
+        self._write_rows(conn, encoded[~archived], dictionary)
+        if archived.any():
+            conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'",
+                (int(insert_df["id"].max()),),
+            )
+        self._apply_rollup_delta(conn, insert_df, user_id)
+        return insert_df.drop(columns=["dedup_key", "created_at"])
+
+    @staticmethod
+    def _existing_keys(conn: sqlite3.Connection, rows: pd.DataFrame, user_id: str) -> set:
+        """The ``dedup_key`` values of *rows* already stored in *conn*'s ``transactions``."""
+        keys = [k for k in rows["dedup_key"].dropna().unique()]
+        seen: set = set()
+        with metrics.timer("pipeline_stage_seconds", stage="dedup"):
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                found = conn.execute(
+                    f"SELECT dedup_key FROM transactions WHERE user_id = ? "
+                    f"AND dedup_key IN ({', '.join('?' * len(chunk))})",
+                    [user_id, *chunk],
+                ).fetchall()
+                seen.update(row[0] for row in found)
+        return seen
+
+    @staticmethod
+    def _write_rows(conn: sqlite3.Connection, encoded: pd.DataFrame, dictionary: Tuple[int, bytes]) -> None:
+        """Insert encoded rows and their compressed bodies into *conn*'s tables."""
+        if encoded.empty:
+            return
+        dict_id, zdict = dictionary
+        rows = encoded.drop(columns=["original_message"], errors="ignore")
+        col_names = list(rows.columns)
         placeholders = ", ".join("?" * len(col_names))
-        col_list = ", ".join(col_names)
-        sql = f"INSERT INTO transactions ({col_list}) VALUES ({placeholders})"
+        sql = f"INSERT INTO transactions ({', '.join(col_names)}) VALUES ({placeholders})"
+        conn.executemany(sql, rows.itertuples(index=False, name=None))
 
-        with self._connect() as conn:
-            conn.executemany(sql, [tuple(r[c] for c in col_names) for r in records])
-            count = conn.execute(
-                "SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,)
-            ).fetchone()[0]
+        bodies = encoded["original_message"] if "original_message" in encoded.columns else [None] * len(encoded)
+        conn.executemany(
+            "INSERT INTO message_bodies (transaction_id, dict_id, body) VALUES (?, ?, ?)",
+            [
+                (int(row_id), dict_id, compress_message(body, zdict))
+                for row_id, body in zip(encoded["id"], bodies)
+            ],
+        )
 
-        return count
+    def _register_partition(self, conn: sqlite3.Connection, month: str) -> Path:
+        """Record *month* in the archive catalog (idempotent) and return its file path."""
+        path = partition_path(self.db_path, month)
+        start, end = month_bounds(month)
+        conn.execute(
+            "INSERT OR IGNORE INTO archive_partitions (month, path, start_date, end_date) VALUES (?, ?, ?, ?)",
+            (month, str(path.relative_to(Path(self.db_path).parent)), start, end),
+        )
+        return path
 
-    def _count_transactions(self, user_id: str) -> int:
+    def count_transactions(self, user_id: str = "default") -> int:
+        """Rows stored for *user_id*, archived months included."""
         with self._connect() as conn:
-            return conn.execute(
-                "SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,)
-            ).fetchone()[0]
+            return self._count_rows(conn, user_id)
+
+    @staticmethod
+    def _count_rows(conn: sqlite3.Connection, user_id: str) -> int:
+        """Rows for *user_id* in the main table plus every archive partition."""
+        return conn.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM transactions WHERE user_id = ?)
+                 + (SELECT COALESCE(SUM(row_count), 0) FROM archive_user_counts WHERE user_id = ?)
+            """,
+            (user_id, user_id),
+        ).fetchone()[0]
 
     def get_transactions(
         self,
@@ -202,37 +928,507 @@ class DataPersistence:
         end_date: Optional[str] = None,
         category: Optional[str] = None,
         transaction_type: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+        search_field: Optional[str] = None,
     ) -> pd.DataFrame:
-        """Return transactions for *user_id* as a DataFrame, newest first."""
+        """Return transactions for *user_id* as a DataFrame, newest first.
+
+        *columns* restricts the SELECT list (``original_message`` is only
+        decompressed when listed explicitly), *limit* is applied in SQL, and
+        *cursor* (from :func:`encode_cursor`) resumes after the last row of a
+        previous page using the ``(date, id)`` keyset. *search* restricts rows
+        to full-text matches (see :meth:`search_transactions`).
+
+        Archive partitions are read only when the date range reaches past the
+        archive horizon and *limit* has not been filled from newer data.
+        """
+        select_cols = self._projection(columns)
+        where, params = self._range_filter(user_id, start_date, end_date)
+        conditions: List[str] = [where]
+
+        if category:
+            conditions.append("category_id = (SELECT id FROM categories WHERE name = ?)")
+            params.append(category)
+        if transaction_type:
+            conditions.append("transaction_type = ?")
+            params.append(transaction_type)
+        scan_end = _epoch_param(end_date) if end_date else None
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            scan_end = cursor_date if scan_end is None else min(scan_end, cursor_date)
+            conditions.append("(date, id) < (?, ?)")
+            params.extend([cursor_date, cursor_id])
+        search_params: Dict[str, List[Any]] = {}
+        if search:
+            match = self._match_expression(search, search_field)
+            needle = search.strip()
+            fields = [search_field] if search_field else list(SEARCH_FIELDS)
+            search_params = {"main": [match], "archive": [needle] * len(fields)}
+
+        def search_sql(schema: str) -> str:
+            if not search:
+                return ""
+            if schema == "main":
+                return " AND id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)"
+            # Partitions carry no search index; their rows are matched by a
+            # case-insensitive substring scan instead.
+            tests = [
+                "merchant_id IN (SELECT id FROM main.merchants WHERE instr(lower(name), lower(?)) > 0)"
+                if field == "merchant"
+                else f"id IN (SELECT b.transaction_id FROM {schema}.message_bodies b "
+                     f"WHERE instr(lower(inflate_message(b.dict_id, b.body)), lower(?)) > 0)"
+                for field in fields
+            ]
+            return f" AND ({' OR '.join(tests)})"
+
+        def source_sql(schema: str) -> str:
+            sql_cols = [
+                f"{_ENCODED_COLUMNS[c][0]} AS {c}" if c in _ENCODED_COLUMNS
+                else f"({_MESSAGE_SELECT.format(schema=schema)} WHERE b.transaction_id = transactions.id) AS {c}"
+                if c == "original_message"
+                else c
+                for c in select_cols
+            ]
+            sql = (
+                f"SELECT {', '.join(sql_cols)} FROM {schema}.transactions "
+                f"WHERE {' AND '.join(conditions)}{search_sql(schema)} "
+                f"ORDER BY date DESC, id DESC"
+            )
+            return sql + " LIMIT ?" if limit is not None else sql
+
+        frames: List[pd.DataFrame] = []
+        remaining = limit
+        with self._connect() as conn:
+            start = _epoch_param(start_date) if start_date else None
+            with closing(self._scan(conn, start, scan_end)) as sources:
+                for schema in sources:
+                    source_params = params + search_params.get("main" if schema == "main" else "archive", [])
+                    if limit is not None:
+                        source_params = source_params + [int(remaining)]
+                    frames.append(pd.read_sql_query(source_sql(schema), conn, params=source_params))
+                    if limit is not None:
+                        remaining -= len(frames[-1])
+                        if remaining <= 0:
+                            break
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            for column, (_, table) in _ENCODED_COLUMNS.items():
+                if column in df.columns:
+                    df[column] = self._decode_ids(conn, table, df[column])
+
+        if "date" in df.columns:
+            df["date"] = from_epoch_seconds(df["date"])
+
+        return df
+
+    def get_transaction_page(
+        self,
+        user_id: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        **filters: Any,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """Return one page of transactions and the cursor for the next page.
+
+        ``next_cursor`` is ``None`` once the last page has been returned.
+        """
+        wanted = self._projection(columns)
+        fetch_cols = wanted + [c for c in ("date", "id") if c not in wanted]
+        df = self.get_transactions(
+            user_id,
+            columns=fetch_cols,
+            limit=limit + 1,
+            cursor=cursor,
+            **filters,
+        )
+        next_cursor: Optional[str] = None
+        if len(df) > limit:
+            df = df.head(limit)
+            last = df.iloc[-1]
+            next_cursor = encode_cursor(last["date"], last["id"])
+        return df[wanted].reset_index(drop=True), next_cursor
+
+    def search_transactions(
+        self,
+        query: str,
+        user_id: str = "default",
+        field: Optional[str] = None,
+        limit: Optional[int] = 100,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Return transactions whose message or merchant contains *query*, newest first.
+
+        Matching is case-insensitive substring search backed by the trigram
+        index, so *query* must be at least three characters long. *field*
+        restricts the match to ``original_message`` or ``merchant``. Archived
+        months are not indexed; once the main table cannot fill *limit*, they
+        are scanned newest first, which is slower.
+        """
+        return self.get_transactions(
+            user_id,
+            columns=columns,
+            limit=limit,
+            cursor=cursor,
+            search=query,
+            search_field=field,
+        )
+
+    def matching_merchants(self, query: str, user_id: str = "default") -> List[str]:
+        """Return the distinct merchant names of *user_id* containing *query*.
+
+        The search index only covers the main table, so archived months are
+        checked with a substring match on the (small) merchant lookup table
+        followed by a scan of each partition for those merchant ids.
+        """
+        with self._connect() as conn, closing(self._scan(conn)) as sources:
+            names = {
+                row["name"] for row in conn.execute(
+                    """
+                    SELECT DISTINCT m.name
+                    FROM transactions t
+                    JOIN merchants m ON m.id = t.merchant_id
+                    WHERE t.user_id = ?
+                      AND t.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)
+                    """,
+                    (user_id, self._match_expression(query, "merchant")),
+                )
+            }
+            next(sources)       # main, answered above
+            candidates: Optional[Dict[int, str]] = None
+            for schema in sources:
+                if candidates is None:
+                    candidates = {
+                        row["id"]: row["name"] for row in conn.execute(
+                            "SELECT id, name FROM merchants WHERE instr(lower(name), lower(?)) > 0",
+                            (query.strip(),),
+                        )
+                        if row["name"] not in names
+                    }
+                for start in range(0, len(candidates), 500):
+                    chunk = list(candidates)[start:start + 500]
+                    found = conn.execute(
+                        f"SELECT DISTINCT merchant_id FROM {schema}.transactions WHERE user_id = ? "
+                        f"AND merchant_id IN ({', '.join('?' * len(chunk))})",
+                        [user_id, *chunk],
+                    ).fetchall()
+                    names.update(candidates[row[0]] for row in found)
+                candidates = {i: n for i, n in candidates.items() if n not in names}
+                if not candidates:
+                    break
+        return sorted(names)
+
+    @staticmethod
+    def _match_expression(query: str, field: Optional[str]) -> str:
+        """Quote *query* as a single FTS5 phrase, optionally scoped to one column."""
+        query = (query or "").strip()
+        if len(query) < 3:
+            raise ValueError("Search query must be at least 3 characters long")
+        if field is not None and field not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field {field!r}; expected one of {list(SEARCH_FIELDS)}")
+        phrase = '"' + query.replace('"', '""') + '"'
+        return f"{field} : {phrase}" if field else phrase
+
+    def get_messages(self, ids: Sequence[int]) -> Dict[int, Optional[str]]:
+        """Return ``{transaction id: original_message}`` for *ids*, decompressed."""
+        messages: Dict[int, Optional[str]] = {}
+        wanted = [int(i) for i in ids]
+        with self._connect() as conn, closing(self._scan(conn)) as sources:
+            for schema in sources:
+                for start in range(0, len(wanted), 500):
+                    chunk = wanted[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT b.transaction_id, b.dict_id, b.body FROM {schema}.message_bodies b "
+                        f"WHERE b.transaction_id IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    messages.update(
+                        {row["transaction_id"]: self._inflate_message(row["dict_id"], row["body"]) for row in rows}
+                    )
+                wanted = [i for i in wanted if i not in messages]
+                if not wanted:
+                    break
+        return messages
+
+    def train_message_dictionary(self, sample_size: int = 5000, size: int = 16 * 1024) -> int:
+        """Train a compression dictionary on recent messages and make it current.
+
+        Only bodies written afterwards use it; existing rows keep the
+        dictionary they were written with. Returns the new dictionary id.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT dict_id, body FROM message_bodies WHERE body IS NOT NULL "
+                "ORDER BY transaction_id DESC LIMIT ?",
+                (int(sample_size),),
+            ).fetchall()
+            dictionary = train_dictionary(
+                (self._inflate_message(row["dict_id"], row["body"]) for row in rows), size
+            )
+            dict_id = conn.execute(
+                "INSERT INTO compression_dicts (dictionary) VALUES (?)", (dictionary,)
+            ).lastrowid
+        self._dictionaries[dict_id] = dictionary
+        return dict_id
+
+    def _latest_dictionary(self, conn: sqlite3.Connection) -> Tuple[int, bytes]:
+        row = conn.execute(
+            "SELECT id, dictionary FROM compression_dicts ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        self._dictionaries[row["id"]] = row["dictionary"]
+        return row["id"], row["dictionary"]
+
+    def _inflate_message(self, dict_id: Optional[int], body: Optional[bytes]) -> Optional[str]:
+        """Decompress one body; registered in SQL as ``inflate_message(dict_id, body)``."""
+        if body is None:
+            return None
+        dictionary = self._dictionaries.get(dict_id)
+        if dictionary is None:
+            # Dictionaries are immutable once written, so caching them forever is safe.
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute(
+                    "SELECT dictionary FROM compression_dicts WHERE id = ?", (dict_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                raise ValueError(f"Unknown compression dictionary {dict_id}")
+            dictionary = self._dictionaries[dict_id] = row[0]
+        return decompress_message(body, dictionary)
+
+    def _intern_names(self, conn: sqlite3.Connection, table: str, names: pd.Series) -> Dict[str, int]:
+        """Return ``{name: id}`` for *names*, inserting unseen ones into *table*."""
+        unique = [str(n) for n in names.dropna().unique()]
+        if not unique:
+            return {}
+        conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in unique])
+        ids: Dict[str, int] = {}
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, name FROM {table} WHERE name IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            ids.update({row["name"]: row["id"] for row in rows})
+        self._lookup_cache[table].update({v: k for k, v in ids.items()})
+        return ids
+
+    def _decode_ids(self, conn: sqlite3.Connection, table: str, ids: pd.Series) -> pd.Categorical:
+        """Turn an id column into a ``Categorical`` of the names *ids* reference.
+
+        Only names that occur are kept as categories, so ``groupby(observed=False)``
+        does not grow a row for every merchant or category in the table.
+        """
+        cache = self._lookup_cache[table]
+        wanted = set(ids.dropna().astype("int64").unique()) - cache.keys()
+        if wanted:
+            rows = conn.execute(
+                f"SELECT id, name FROM {table} WHERE id >= ?", (int(min(wanted)),)
+            ).fetchall()
+            cache.update({row["id"]: row["name"] for row in rows})
+        lookup = pd.Index(list(cache.keys()))
+        return pd.Categorical.from_codes(
+            lookup.get_indexer(ids),
+            categories=pd.Index(list(cache.values()), dtype=object),
+        ).remove_unused_categories()
+
+    @staticmethod
+    def _projection(columns: Optional[Sequence[str]]) -> List[str]:
+        if not columns:
+            return list(DEFAULT_COLUMNS)
+        unknown = [c for c in columns if c not in TRANSACTION_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown transaction columns: {unknown}")
+        return list(dict.fromkeys(columns))
+
+    # ------------------------------------------------------------------
+    # Daily rollups
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _apply_rollup_delta(conn: sqlite3.Connection, inserted: pd.DataFrame, user_id: str) -> None:
+        """Fold freshly inserted rows into ``daily_rollups`` on *conn*'s transaction."""
+        if inserted.empty or not {"date", "transaction_type", "category", "amount"} <= set(inserted.columns):
+            return
+        delta = (
+            inserted.assign(day=inserted["date"] // 86400)
+            .groupby(["day", "transaction_type", "category"], as_index=False)
+            .agg(amount_sum=("amount", "sum"), txn_count=("amount", "size"))
+        )
+        delta["day"] = from_epoch_seconds(delta["day"] * 86400).dt.strftime("%Y-%m-%d")
+        conn.executemany(
+            """
+            INSERT INTO daily_rollups (user_id, day, transaction_type, category, amount_sum, txn_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, day, transaction_type, category)
+            DO UPDATE SET amount_sum = amount_sum + excluded.amount_sum,
+                          txn_count  = txn_count  + excluded.txn_count
+            """,
+            [
+                (user_id, r.day, r.transaction_type, r.category, float(r.amount_sum), int(r.txn_count))
+                for r in delta.itertuples(index=False)
+            ],
+        )
+
+    @staticmethod
+    def _rebuild_rollups(conn: sqlite3.Connection, user_id: Optional[str]) -> None:
+        params = (user_id,) if user_id else ()
+        conn.execute(f"DELETE FROM daily_rollups {'WHERE user_id = ?' if user_id else ''}", params)
+        conn.execute(
+            f"""
+            INSERT INTO daily_rollups (user_id, day, transaction_type, category, amount_sum, txn_count)
+            SELECT t.user_id, date(t.date, 'unixepoch') AS day, t.transaction_type, c.name,
+                   SUM(t.amount), COUNT(*)
+            FROM transactions t
+            JOIN categories c ON c.id = t.category_id
+            {'WHERE t.user_id = ?' if user_id else ''}
+            GROUP BY t.user_id, day, t.transaction_type, c.name
+            """,
+            params,
+        )
+
+    def rebuild_daily_rollups(self, user_id: Optional[str] = None) -> None:
+        """Recompute ``daily_rollups`` from raw rows (all users when *user_id* is None).
+
+        Archived months are included, read from each partition file in turn.
+        """
+        with self._connect() as conn:
+            self._rebuild_rollups(conn, user_id)
+            params = (user_id,) if user_id else ()
+            for partition in overlapping_partitions(conn, self.db_path):
+                with self._open_partition(partition.path) as part:
+                    rows = part.execute(
+                        f"""
+                        SELECT user_id, date(date, 'unixepoch') AS day, transaction_type,
+                               SUM(amount), COUNT(*), category_id
+                        FROM transactions
+                        {'WHERE user_id = ?' if user_id else ''}
+                        GROUP BY user_id, day, transaction_type, category_id
+                        """,
+                        params,
+                    ).fetchall()
+                conn.executemany(
+                    """
+                    INSERT INTO daily_rollups (user_id, day, transaction_type, category, amount_sum, txn_count)
+                    SELECT ?, ?, ?, name, ?, ? FROM categories WHERE id = ?
+                    ON CONFLICT (user_id, day, transaction_type, category)
+                    DO UPDATE SET amount_sum = amount_sum + excluded.amount_sum,
+                                  txn_count  = txn_count  + excluded.txn_count
+                    """,
+                    [tuple(row) for row in rows],
+                )
+
+    def get_daily_rollups(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Return rollup rows [date, transaction_type, category, amount, txn_count], oldest first."""
         conditions: List[str] = ["user_id = ?"]
         params: List[Any] = [user_id]
-
         if start_date:
-            conditions.append("date >= ?")
-            params.append(start_date)
+            conditions.append("day >= ?")
+            params.append(pd.Timestamp(start_date).strftime("%Y-%m-%d"))
         if end_date:
-            conditions.append("date <= ?")
-            params.append(end_date)
-        if category:
-            conditions.append("category = ?")
-            params.append(category)
+            conditions.append("day <= ?")
+            params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
         if transaction_type:
             conditions.append("transaction_type = ?")
             params.append(transaction_type)
 
         sql = (
-            f"SELECT * FROM transactions "
-            f"WHERE {' AND '.join(conditions)} "
-            f"ORDER BY date DESC"
+            "SELECT day AS date, transaction_type, category, amount_sum AS amount, txn_count "
+            f"FROM daily_rollups WHERE {' AND '.join(conditions)} ORDER BY day"
         )
-
         with self._connect() as conn:
             df = pd.read_sql_query(sql, conn, params=params)
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        return df
 
-        if not df.empty and "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    def get_daily_series(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        transaction_type: str = "Expense",
+    ) -> pd.DataFrame:
+        """Return [date, amount] — one row per day with activity — read from the rollup.
 
-        return df
+        The frame has the same shape as ``services.budgeting.daily_totals`` and
+        can be passed to the ``*_from_daily`` service functions directly.
+        """
+        rollups = self.get_daily_rollups(user_id, start_date, end_date, transaction_type)
+        if rollups.empty:
+            return pd.DataFrame(columns=["date", "amount"])
+        return (
+            rollups.groupby("date", as_index=False)["amount"]
+            .sum()
+            .sort_values("date")
+            .reset_index(drop=True)
+        )
+
+    # ------------------------------------------------------------------
+    # Webhook receipts
+    # ------------------------------------------------------------------
+
+    def get_webhook_receipts(
+        self, user_id: str, message_ids: Sequence[str], ttl_seconds: float
+    ) -> Dict[str, Dict[str, Any]]:
+        """``{message_id: stored result}`` for deliveries seen within *ttl_seconds*."""
+        if not message_ids:
+            return {}
+        cutoff = time.time() - ttl_seconds
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._connect() as conn:
+            for start in range(0, len(message_ids), 500):
+                chunk = list(message_ids[start:start + 500])
+                rows = conn.execute(
+                    f"SELECT message_id, response FROM webhook_receipts WHERE user_id = ? "
+                    f"AND message_id IN ({', '.join('?' * len(chunk))}) AND received_at >= ?",
+                    [user_id, *chunk, cutoff],
+                ).fetchall()
+                found.update((row["message_id"], json.loads(row["response"])) for row in rows)
+        return found
+
+    def save_webhook_receipts(
+        self, user_id: str, results: Dict[str, Dict[str, Any]], ttl_seconds: float
+    ) -> None:
+        """Remember *results* by message id; expired receipts are pruned on the way."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO webhook_receipts (user_id, message_id, response, received_at) "
+                "VALUES (?, ?, ?, ?)",
+                # Results may carry NaT or numpy values; dumps() writes those as strings.
+                [(user_id, message_id, dumps(result).decode("utf-8"), now)
+                 for message_id, result in results.items()],
+            )
+            conn.execute("DELETE FROM webhook_receipts WHERE received_at < ?", (now - ttl_seconds,))
+
+    def dump_webhook_receipts(self, user_id: str) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Every stored ``(message_id, result, received_at)`` for *user_id*."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT message_id, response, received_at FROM webhook_receipts WHERE user_id = ?",
+                (user_id,),
+            ).fetchall()
+        return [(row["message_id"], json.loads(row["response"]), row["received_at"]) for row in rows]
+
+    def load_webhook_receipts(self, user_id: str, receipts: Sequence[Tuple[str, Dict[str, Any], float]]) -> None:
+        """Store receipts from :meth:`dump_webhook_receipts`, keeping their receive times."""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO webhook_receipts (user_id, message_id, response, received_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(user_id, message_id, dumps(result).decode("utf-8"), received_at)
+                 for message_id, result, received_at in receipts],
+            )
 
     # ------------------------------------------------------------------
     # Budgets
@@ -249,6 +1445,7 @@ class DataPersistence:
         """
         with self._connect() as conn:
             conn.execute(sql, (user_id, period, limit_amount, datetime.now().isoformat()))
+            self._bump_version(conn, user_id)
 
     def get_budgets(self, user_id: str = "default") -> Dict[str, float]:
         """Return {period: limit_amount} for *user_id*."""
@@ -269,8 +1466,8 @@ class DataPersistence:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
     ) -> Dict[str, Any]:
-        df = self.get_transactions(user_id, start_date, end_date)
-        if df.empty:
+        groups = self._type_category_groups(user_id, start_date, end_date)
+        if not groups:
             return {
                 "total_transactions": 0,
                 "total_expenses": 0.0,
@@ -279,25 +1476,420 @@ class DataPersistence:
                 "categories": [],
                 "date_range": None,
             }
+        total_count = sum(g["n"] for g in groups)
+        total_amount = sum(g["total"] or 0.0 for g in groups)
         return {
-            "total_transactions": len(df),
-            "total_expenses": float(df[df["transaction_type"] == "Expense"]["amount"].sum()),
-            "total_income": float(df[df["transaction_type"] == "Income"]["amount"].sum()),
-            "avg_transaction": float(df["amount"].mean()),
-            "categories": sorted(df["category"].dropna().unique().tolist()),
+            "total_transactions": int(total_count),
+            "total_expenses": float(sum(g["total"] or 0.0 for g in groups if g["transaction_type"] == "Expense")),
+            "total_income": float(sum(g["total"] or 0.0 for g in groups if g["transaction_type"] == "Income")),
+            "avg_transaction": float(total_amount / total_count),
+            "categories": sorted({g["category"] for g in groups if g["category"] is not None}),
             "date_range": {
-                "start": df["date"].min().strftime("%Y-%m-%d"),
-                "end": df["date"].max().strftime("%Y-%m-%d"),
+                "start": pd.Timestamp(min(g["first_date"] for g in groups), unit="s").strftime("%Y-%m-%d"),
+                "end": pd.Timestamp(max(g["last_date"] for g in groups), unit="s").strftime("%Y-%m-%d"),
             },
         }
 
+    def get_category_totals(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+    ) -> Dict[str, float]:
+        """Return ``{category: SUM(amount)}`` computed in SQL."""
+        totals: Dict[str, float] = {}
+        for group in self._type_category_groups(user_id, start_date, end_date, transaction_type):
+            totals[group["category"]] = totals.get(group["category"], 0.0) + float(group["total"] or 0.0)
+        return dict(sorted(totals.items()))
+
+    def user_counts(self) -> Dict[str, int]:
+        """Return ``{user_id: row count}`` for every user with transactions or budgets.
+
+        Archived rows are included in the counts.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT user_id, SUM(n) AS n FROM (
+                    SELECT user_id, COUNT(*) AS n FROM transactions GROUP BY user_id
+                    UNION ALL
+                    SELECT user_id, SUM(row_count) FROM archive_user_counts GROUP BY user_id
+                    UNION ALL
+                    SELECT user_id, 0 FROM budgets GROUP BY user_id
+                )
+                GROUP BY user_id
+                ORDER BY user_id
+                """
+            ).fetchall()
+        return {row["user_id"]: int(row["n"]) for row in rows}
+
+    def _type_category_groups(
+        self,
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """One row per (transaction_type, category) with count, sum and date bounds.
+
+        Grouping in index order lets SQLite answer straight from
+        ``idx_transactions_user_type_category`` without touching the table.
+        Partial groups from archive partitions in range are merged in Python.
+        """
+        where, params = self._range_filter(user_id, start_date, end_date)
+        if transaction_type:
+            where += " AND transaction_type = ?"
+            params.append(transaction_type)
+        groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        with self._connect() as conn:
+            start = _epoch_param(start_date) if start_date else None
+            end = _epoch_param(end_date) if end_date else None
+            with closing(self._scan(conn, start, end)) as sources:
+                for schema in sources:
+                    rows = conn.execute(
+                        f"""
+                        SELECT g.transaction_type, c.name AS category,
+                               g.n, g.total, g.first_date, g.last_date
+                        FROM (
+                            SELECT transaction_type, category_id,
+                                   COUNT(*)    AS n,
+                                   SUM(amount) AS total,
+                                   MIN(date)   AS first_date,
+                                   MAX(date)   AS last_date
+                            FROM {schema}.transactions
+                            WHERE {where}
+                            GROUP BY transaction_type, category_id
+                        ) g
+                        JOIN main.categories c ON c.id = g.category_id
+                        """,
+                        params,
+                    ).fetchall()
+                    for row in rows:
+                        group = groups.get((row["transaction_type"], row["category"]))
+                        if group is None:
+                            groups[(row["transaction_type"], row["category"])] = dict(row)
+                            continue
+                        group["n"] += row["n"]
+                        group["total"] = (group["total"] or 0.0) + (row["total"] or 0.0)
+                        group["first_date"] = min(group["first_date"], row["first_date"])
+                        group["last_date"] = max(group["last_date"], row["last_date"])
+        return list(groups.values())
+
+    @staticmethod
+    def _range_filter(
+        user_id: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        alias: str = "",
+    ) -> Tuple[str, List[Any]]:
+        conditions: List[str] = [f"{alias}user_id = ?"]
+        params: List[Any] = [user_id]
+        if start_date:
+            conditions.append(f"{alias}date >= ?")
+            params.append(_epoch_param(start_date))
+        if end_date:
+            conditions.append(f"{alias}date <= ?")
+            params.append(_epoch_param(end_date))
+        return " AND ".join(conditions), params
+
     def export_to_csv(
         self,
         user_id: str = "default",
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
     ) -> str:
-        return self.get_transactions(user_id, start_date, end_date).to_csv(index=False)
+        return b"".join(self.iter_export(user_id, start_date, end_date)).decode("utf-8")
+
+    def iter_export(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        fmt: str = "csv",
+        chunk_rows: int = 2000,
+    ) -> Iterator[bytes]:
+        """Yield the user's transactions as encoded CSV / NDJSON chunks, newest first.
+
+        Rows are pulled from the cursor with ``fetchmany(chunk_rows)`` so memory
+        stays flat regardless of history size. The connection may be consumed
+        from a different thread than the one that created the generator.
+        """
+        where, params = self._range_filter(user_id, start_date, end_date, alias="t.")
+        columns = list(TRANSACTION_COLUMNS)
+        rendered = {
+            "date": "strftime('%Y-%m-%d %H:%M:%S', t.date, 'unixepoch') AS date",
+            "category": "c.name AS category",
+            "merchant": "m.name AS merchant",
+            "original_message": "inflate_message(b.dict_id, b.body) AS original_message",
+        }
+        select = [rendered.get(c, f"t.{c}") for c in columns]
+        sql = (
+            f"SELECT {', '.join(select)} FROM {{schema}}.transactions t "
+            f"JOIN main.categories c ON c.id = t.category_id "
+            f"LEFT JOIN main.merchants m ON m.id = t.merchant_id "
+            f"LEFT JOIN {{schema}}.message_bodies b ON b.transaction_id = t.id "
+            f"WHERE {where} "
+            f"ORDER BY t.date DESC, t.id DESC"
+        )
+
+        def batches() -> Iterator[List[sqlite3.Row]]:
+            start = _epoch_param(start_date) if start_date else None
+            end = _epoch_param(end_date) if end_date else None
+            with closing(self._scan(conn, start, end)) as sources:
+                for schema in sources:
+                    cursor = conn.execute(sql.format(schema=schema), params)
+                    yield from iter(lambda: cursor.fetchmany(chunk_rows), [])
+                    cursor.close()
+
+        with self._connect(check_same_thread=False) as conn:
+            # Partitions never overlap, so streaming them in turn keeps the order.
+            yield from encode_rows(batches(), columns, fmt)
+
+    # ------------------------------------------------------------------
+    # Columnar mirror
+    # ------------------------------------------------------------------
+
+    def get_analytics_frame(
+        self,
+        user_id: str = "default",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Return [date, amount, transaction_type, category, merchant] for the analytics services.
+
+        Reads the Parquet mirror when one is configured, SQLite otherwise;
+        either way the frame is ordered newest first.
+        """
+        columns = ["date", "amount", "transaction_type", "category", "merchant"]
+        if self.columnar is not None:
+            return self.columnar.load(user_id, start_date, end_date, columns)
+        return self.get_transactions(user_id, start_date, end_date, columns=columns)
+
+    def sync_columnar(self, rebuild: bool = False) -> int:
+        """Copy rows the mirror does not hold yet into it; returns rows copied.
+
+        Write listeners keep the mirror current, so this catches up after a
+        crash, a failed listener batch, or rows written by upload workers.
+        Only the id ranges missing from the mirror are read, in every
+        partition. *rebuild* starts from scratch.
+        """
+        if self.columnar is None:
+            return 0
+        if rebuild:
+            self.columnar.reset()
+        copied = 0
+        with self._connect() as conn, closing(self._scan(conn)) as sources:
+            ceiling = conn.execute(
+                "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name='transactions'),0), "
+                "COALESCE((SELECT MAX(id) FROM transactions),0))"
+            ).fetchone()[0]
+            gaps = self.columnar.missing(ceiling)
+            for schema in sources:
+                for first, last in gaps:
+                    chunks = pd.read_sql_query(
+                        f"SELECT id, date, amount, transaction_type, category_id AS category, "
+                        f"merchant_id AS merchant, user_id FROM {schema}.transactions "
+                        f"WHERE id BETWEEN ? AND ? ORDER BY id",
+                        conn,
+                        params=(first, last),
+                        chunksize=50_000,
+                    )
+                    for chunk in chunks:
+                        for column, (_, table) in _ENCODED_COLUMNS.items():
+                            chunk[column] = self._decode_ids(conn, table, chunk[column])
+                        copied += self.columnar.append(chunk.assign(date=from_epoch_seconds(chunk["date"])))
+        # Ids below the ceiling that no partition holds were deleted (or never
+        # committed); mark them so later syncs skip them.
+        if ceiling:
+            self.columnar.mark(1, ceiling)
+        return copied
+
+    # ------------------------------------------------------------------
+    # Archive partitions
+    # ------------------------------------------------------------------
+
+    def archive_closed_months(self, keep_months: int = 3, before: Optional[str] = None) -> List[str]:
+        """Move closed months out of the main table into per-month archive files.
+
+        Every month older than the current one minus *keep_months* (or older
+        than the month of *before*, when given) is archived, oldest first.
+        Rollups stay in the main DB. Returns the months that were moved.
+        """
+        cutoff = pd.Period(before or datetime.now(), freq="M")
+        if before is None:
+            cutoff -= keep_months
+        cutoff_epoch = month_bounds(str(cutoff))[0]
+        with self._connect() as conn:
+            months = [
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT strftime('%Y-%m', date, 'unixepoch') AS month "
+                    "FROM transactions WHERE date < ? ORDER BY month",
+                    (cutoff_epoch,),
+                )
+            ]
+        for month in months:
+            self._archive_month(month)
+        return months
+
+    def _archive_month(self, month: str) -> None:
+        """Copy one month into its partition, then drop it from the main DB.
+
+        The partition is committed first and rows are copied with INSERT OR
+        IGNORE, so a crash between the two commits only leaves rows that the
+        next run copies over harmlessly; the catalog entry that makes the
+        partition visible commits together with the delete.
+        """
+        start, end = month_bounds(month)
+        in_month = "date >= ? AND date < ?"
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            path = self._register_partition(conn, month)
+            rows = conn.execute(f"SELECT * FROM transactions WHERE {in_month}", (start, end))
+            columns = [d[0] for d in rows.description]
+            bodies = conn.execute(
+                f"SELECT * FROM message_bodies WHERE transaction_id IN "
+                f"(SELECT id FROM transactions WHERE {in_month})",
+                (start, end),
+            )
+            with self._open_partition(path) as part:
+                for batch in iter(lambda: rows.fetchmany(1000), []):
+                    part.executemany(
+                        f"INSERT OR IGNORE INTO transactions ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        [tuple(r) for r in batch],
+                    )
+                for batch in iter(lambda: bodies.fetchmany(1000), []):
+                    part.executemany(
+                        "INSERT OR IGNORE INTO message_bodies (transaction_id, dict_id, body) VALUES (?, ?, ?)",
+                        [(r["transaction_id"], r["dict_id"], r["body"]) for r in batch],
+                    )
+            conn.execute(
+                f"""
+                INSERT INTO archive_user_counts (month, user_id, row_count)
+                SELECT ?, user_id, COUNT(*) FROM transactions WHERE {in_month} GROUP BY user_id
+                ON CONFLICT (month, user_id) DO UPDATE SET row_count = row_count + excluded.row_count
+                """,
+                (month, start, end),
+            )
+            conn.execute(
+                f"DELETE FROM message_bodies WHERE transaction_id IN "
+                f"(SELECT id FROM transactions WHERE {in_month})",
+                (start, end),
+            )
+            conn.execute(f"DELETE FROM transactions WHERE {in_month}", (start, end))
+
+    # ------------------------------------------------------------------
+    # Backup & restore
+    # ------------------------------------------------------------------
+
+    def backup(self, backup_dir: str, pages: int = DEFAULT_PAGES, sleep: float = DEFAULT_SLEEP) -> Path:
+        """Take an online snapshot of the main DB and its archive partitions.
+
+        The snapshot is a directory mirroring the live layout (main file plus
+        ``archive/``); it only appears under *backup_dir* once every file has
+        been copied and verified. Returns its path.
+        """
+        final = Path(backup_dir) / snapshot_name(self.db_path)
+        staging = final.with_name(final.name + ".partial")
+        shutil.rmtree(staging, ignore_errors=True)
+        main_copy = backup_database(self.db_path, str(staging / Path(self.db_path).name), pages, sleep)
+        conn = sqlite3.connect(str(main_copy))
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+        finally:
+            conn.close()
+        last_id = row[0] if row else 0
+        # Partitions come from the snapshot's own catalog, and rows that
+        # reached them after the main copy (ids past its sequence) are trimmed
+        # so every file reflects the same moment.
+        for _, relative in self._catalog(str(main_copy)):
+            live = Path(self.db_path).parent / relative
+            if not live.exists():
+                continue
+            part_copy = backup_database(str(live), str(staging / relative), pages, sleep)
+            conn = sqlite3.connect(str(part_copy))
+            try:
+                conn.execute("DELETE FROM message_bodies WHERE transaction_id > ?", (last_id,))
+                conn.execute("DELETE FROM transactions WHERE id > ?", (last_id,))
+                conn.commit()
+            finally:
+                conn.close()
+        staging.replace(final)
+        return final
+
+    def verify_snapshot(self, snapshot: str) -> List[str]:
+        """Integrity problems in *snapshot* (main file and partitions); empty when usable."""
+        main_copy = Path(snapshot) / Path(self.db_path).name
+        problems = verify_database(str(main_copy))
+        if problems:
+            return problems
+        for month, relative in self._catalog(str(main_copy)):
+            problems += [f"{month}: {p}" for p in verify_database(str(Path(snapshot) / relative))]
+        return problems
+
+    def restore(self, snapshot: str, pages: int = DEFAULT_PAGES, sleep: float = DEFAULT_SLEEP) -> None:
+        """Replace the live data with *snapshot*, in place, through the backup API.
+
+        Raises ``ValueError`` without touching anything if the snapshot fails
+        verification. Archive files that the snapshot does not know about are
+        removed so a later archive run cannot merge stale rows into them.
+        """
+        problems = self.verify_snapshot(snapshot)
+        if problems:
+            raise ValueError(f"Snapshot {snapshot} is not restorable: {'; '.join(problems)}")
+        with self._connect() as conn:
+            last_version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM data_versions").fetchone()[0]
+        main_copy = Path(snapshot) / Path(self.db_path).name
+        base = Path(self.db_path).parent
+        live_partitions = {relative for _, relative in self._catalog(self.db_path)}
+        snapshot_partitions = {relative for _, relative in self._catalog(str(main_copy))}
+
+        self._copy_into(str(main_copy), self.db_path, pages, sleep)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+        for relative in snapshot_partitions:
+            self._copy_into(str(Path(snapshot) / relative), str(base / relative), pages, sleep)
+        for relative in live_partitions - snapshot_partitions:
+            (base / relative).unlink(missing_ok=True)
+
+        # Ids in the lookup and dictionary caches may mean something else now.
+        self._lookup_cache = {t: {} for t in _LOOKUP_TABLES}
+        self._dictionaries = {}
+        # The snapshot may predate later migrations; run all of them.
+        self._prepare_schema()
+        if self.columnar is not None:
+            self.sync_columnar(rebuild=True)
+        with self._connect() as conn:
+            # Every user's data may have changed, and the snapshot's own
+            # counters may be older than ones clients already hold.
+            restored = conn.execute("SELECT COALESCE(MAX(version), 0) FROM data_versions").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO data_versions (user_id, version) VALUES ('*', ?)",
+                (max(last_version, restored) + 1,),
+            )
+
+    @staticmethod
+    def _copy_into(source: str, destination: str, pages: int, sleep: float) -> None:
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(destination, timeout=5.0)
+        try:
+            src.backup(dst, pages=pages, sleep=sleep)
+        finally:
+            dst.close()
+            src.close()
+
+    @staticmethod
+    def _catalog(db_path: str) -> List[Tuple[str, str]]:
+        """``(month, relative path)`` of each partition recorded in *db_path*."""
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return [tuple(row) for row in conn.execute("SELECT month, path FROM archive_partitions")]
+        except sqlite3.OperationalError:
+            return []
+        finally:
+            conn.close()
 
     # ------------------------------------------------------------------
     # Deletion
@@ -306,6 +1898,27 @@ class DataPersistence:
     def delete_user_data(self, user_id: str) -> None:
         """Permanently remove all data for *user_id* across all tables."""
         with self._connect() as conn:
+            # Bodies first: their FTS trigger reads the merchant through the transaction.
+            conn.execute(
+                "DELETE FROM message_bodies WHERE transaction_id IN "
+                "(SELECT id FROM transactions WHERE user_id = ?)",
+                (user_id,),
+            )
             conn.execute("DELETE FROM transactions      WHERE user_id = ?", (user_id,))
+            for partition in overlapping_partitions(conn, self.db_path):
+                with self._open_partition(partition.path) as part:
+                    part.execute(
+                        "DELETE FROM message_bodies WHERE transaction_id IN "
+                        "(SELECT id FROM transactions WHERE user_id = ?)",
+                        (user_id,),
+                    )
+                    part.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM archive_user_counts WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM daily_rollups     WHERE user_id = ?", (user_id,))
             conn.execute("DELETE FROM budgets           WHERE user_id = ?", (user_id,))
             conn.execute("DELETE FROM custom_categories WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM webhook_receipts  WHERE user_id = ?", (user_id,))
+            self._bump_version(conn, user_id)
+        # Only once the delete has committed: a failed delete keeps the mirror intact.
+        if self.columnar is not None:
+            self.columnar.drop_user(user_id)
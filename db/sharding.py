@@ -0,0 +1,319 @@
+"""
+db/sharding.py
+--------------
+Route each user to one of N SQLite files so users stop sharing a write lock.
+
+A user always lands on ``shard_<i>.db`` where ``i`` is a stable hash of the
+user id modulo the shard count, so every per-user query touches exactly one
+file. Admin and aggregate views fan out across all shards in parallel.
+
+Public surface:
+    shard_index(user_id, shard_count)              -> int
+    ShardedPersistence(shard_dir, shard_count, columnar_dir, profiler, use_columnar)
+        .for_user(user_id)                         -> DataPersistence
+        .fan_out(fn)                               -> List[result per shard]
+        .user_counts() / .shard_stats()            -> admin views
+        .sync_columnar(rebuild)                    -> int   (rows copied, all shards)
+        .archive_closed_months(...)                -> List[str]   (months archived on any shard)
+        .backup(backup_dir) / .restore(snapshots)  -> one snapshot per shard, under backup_dir/shard_<i>
+        .get_messages(ids, user_id)                -> Dict[int, message]   (ids are per shard)
+        .global_category_totals(...)               -> Dict[str, float]
+        (plus the per-user DataPersistence methods, routed to the owning shard)
+    rebalance(sources, target, delete_source)      -> Dict[str, int]
+    open_persistence(use_columnar)                 -> DataPersistence | ShardedPersistence
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+
+import pandas as pd
+
+from db.backup import DEFAULT_PAGES, DEFAULT_SLEEP
+from db.profiling import QueryProfiler, profiler_from_env
+from db.session import TRANSACTION_COLUMNS, DataPersistence, WriteListener
+
+T = TypeVar("T")
+
+
+def shard_index(user_id: str, shard_count: int) -> int:
+    """Stable shard number for *user_id* (unlike ``hash()``, identical across processes)."""
+    digest = hashlib.blake2b(str(user_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+class ShardedPersistence:
+    def __init__(
+        self,
+        shard_dir: str,
+        shard_count: int,
+        columnar_dir: Optional[str] = None,
+        profiler: Optional[QueryProfiler] = None,
+        use_columnar: bool = True,
+    ) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+        self.shard_dir = Path(shard_dir)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        # One profiler for every shard, so histograms cover the whole store.
+        self.profiler = profiler or profiler_from_env()
+        self.shards: List[DataPersistence] = [
+            DataPersistence(
+                str(self.shard_dir / f"shard_{i}.db"),
+                columnar_dir=str(Path(columnar_dir) / f"shard_{i}") if columnar_dir else None,
+                profiler=self.profiler,
+                # Without a directory each shard would fall back to the shared env root.
+                use_columnar=use_columnar and bool(columnar_dir),
+            )
+            for i in range(shard_count)
+        ]
+
+    def for_user(self, user_id: str) -> DataPersistence:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    # ------------------------------------------------------------------
+    # Fan-out
+    # ------------------------------------------------------------------
+
+    def fan_out(self, fn: Callable[[DataPersistence], T]) -> List[T]:
+        """Run *fn* against every shard concurrently; results come back in shard order."""
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as pool:
+            return list(pool.map(fn, self.shards))
+
+    def user_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for shard_counts in self.fan_out(lambda shard: shard.user_counts()):
+            counts.update(shard_counts)
+        return dict(sorted(counts.items()))
+
+    def shard_stats(self) -> List[Dict[str, Any]]:
+        """One row per shard: path, user count and transaction count."""
+        return [
+            {"shard": i, "path": shard.db_path, "users": len(counts), "transactions": sum(counts.values())}
+            for i, (shard, counts) in enumerate(zip(self.shards, self.fan_out(lambda s: s.user_counts())))
+        ]
+
+    def global_category_totals(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+    ) -> Dict[str, float]:
+        """``{category: SUM(amount)}`` across every user on every shard."""
+        def shard_totals(shard: DataPersistence) -> Dict[str, float]:
+            totals: Dict[str, float] = {}
+            for user_id in shard.user_counts():
+                for category, amount in shard.get_category_totals(
+                    user_id, start_date, end_date, transaction_type
+                ).items():
+                    totals[category] = totals.get(category, 0.0) + amount
+            return totals
+
+        merged: Dict[str, float] = {}
+        for totals in self.fan_out(shard_totals):
+            for category, amount in totals.items():
+                merged[category] = merged.get(category, 0.0) + amount
+        return dict(sorted(merged.items()))
+
+    def sync_columnar(self, rebuild: bool = False) -> int:
+        return sum(self.fan_out(lambda shard: shard.sync_columnar(rebuild)))
+
+    def archive_closed_months(self, keep_months: int = 3, before: Optional[str] = None) -> List[str]:
+        months = self.fan_out(lambda shard: shard.archive_closed_months(keep_months, before))
+        return sorted(set().union(*months))
+
+    def backup(self, backup_dir: str, pages: int = DEFAULT_PAGES, sleep: float = DEFAULT_SLEEP) -> List[Path]:
+        """Snapshot every shard into ``backup_dir/shard_<i>``; returns the paths in shard order."""
+        return self.fan_out(
+            lambda shard: shard.backup(str(Path(backup_dir) / Path(shard.db_path).stem), pages, sleep)
+        )
+
+    def restore(self, snapshots: Sequence[str], pages: int = DEFAULT_PAGES, sleep: float = DEFAULT_SLEEP) -> None:
+        """Restore each shard from its snapshot (*snapshots* in shard order, as :meth:`backup` returns).
+
+        Every snapshot is verified before any shard is touched.
+        """
+        if len(snapshots) != len(self.shards):
+            raise ValueError(f"Expected {len(self.shards)} snapshots (one per shard), got {len(snapshots)}")
+        problems = [
+            f"{snapshot}: {problem}"
+            for shard, snapshot in zip(self.shards, snapshots)
+            for problem in shard.verify_snapshot(str(snapshot))
+        ]
+        if problems:
+            raise ValueError(f"Snapshots are not restorable: {'; '.join(problems)}")
+        for shard, snapshot in zip(self.shards, snapshots):
+            shard.restore(str(snapshot), pages, sleep)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def save_transactions(self, df: pd.DataFrame, user_id: str = "default") -> int:
+        return self.for_user(user_id).save_transactions(df, user_id)
+
+    def insert_transactions(self, df: pd.DataFrame, user_id: str = "default") -> Tuple[int, pd.DataFrame]:
+        return self.for_user(user_id).insert_transactions(df, user_id)
+
+    def save_transactions_many(self, batches: Sequence[Tuple[pd.DataFrame, str]]) -> Dict[str, int]:
+        return self.insert_transactions_many(batches)[0]
+
+    def insert_transactions_many(
+        self, batches: Sequence[Tuple[pd.DataFrame, str]]
+    ) -> Tuple[Dict[str, int], List[pd.DataFrame]]:
+        """Group *batches* by shard and commit each shard's share in parallel."""
+        per_shard: Dict[int, List[int]] = {}
+        for number, (_, user_id) in enumerate(batches):
+            per_shard.setdefault(shard_index(user_id, len(self.shards)), []).append(number)
+        totals: Dict[str, int] = {}
+        inserted: List[pd.DataFrame] = [df.iloc[0:0] for df, _ in batches]
+        with ThreadPoolExecutor(max_workers=max(1, len(per_shard))) as pool:
+            results = pool.map(
+                lambda item: self.shards[item[0]].insert_transactions_many([batches[n] for n in item[1]]),
+                per_shard.items(),
+            )
+            for numbers, (shard_totals, shard_inserted) in zip(per_shard.values(), results):
+                totals.update(shard_totals)
+                for number, rows in zip(numbers, shard_inserted):
+                    inserted[number] = rows
+        return totals, inserted
+
+    def data_version(self, user_id: str = "default") -> int:
+        return self.for_user(user_id).data_version(user_id)
+
+    def touch(self, user_id: str) -> int:
+        return self.for_user(user_id).touch(user_id)
+
+    def add_write_listener(self, listener: WriteListener) -> None:
+        for shard in self.shards:
+            shard.add_write_listener(listener)
+
+    def get_webhook_receipts(self, user_id: str, *args: Any, **kwargs: Any) -> Dict[str, Dict[str, Any]]:
+        return self.for_user(user_id).get_webhook_receipts(user_id, *args, **kwargs)
+
+    def save_webhook_receipts(self, user_id: str, *args: Any, **kwargs: Any) -> None:
+        self.for_user(user_id).save_webhook_receipts(user_id, *args, **kwargs)
+
+    def save_budget(self, user_id: str, period: str, limit_amount: float) -> None:
+        self.for_user(user_id).save_budget(user_id, period, limit_amount)
+
+    def delete_user_data(self, user_id: str) -> None:
+        self.for_user(user_id).delete_user_data(user_id)
+
+    # ------------------------------------------------------------------
+    # Per-user reads
+    # ------------------------------------------------------------------
+
+    def get_transactions(self, user_id: str = "default", *args: Any, **kwargs: Any) -> pd.DataFrame:
+        return self.for_user(user_id).get_transactions(user_id, *args, **kwargs)
+
+    def get_transaction_page(self, user_id: str = "default", *args: Any, **kwargs: Any):
+        return self.for_user(user_id).get_transaction_page(user_id, *args, **kwargs)
+
+    def search_transactions(self, query: str, user_id: str = "default", *args: Any, **kwargs: Any) -> pd.DataFrame:
+        return self.for_user(user_id).search_transactions(query, user_id, *args, **kwargs)
+
+    def matching_merchants(self, query: str, user_id: str = "default") -> List[str]:
+        return self.for_user(user_id).matching_merchants(query, user_id)
+
+    def get_analytics_frame(self, user_id: str = "default", *args: Any, **kwargs: Any) -> pd.DataFrame:
+        return self.for_user(user_id).get_analytics_frame(user_id, *args, **kwargs)
+
+    def get_daily_rollups(self, user_id: str = "default", *args: Any, **kwargs: Any) -> pd.DataFrame:
+        return self.for_user(user_id).get_daily_rollups(user_id, *args, **kwargs)
+
+    def get_daily_series(self, user_id: str = "default", *args: Any, **kwargs: Any) -> pd.DataFrame:
+        return self.for_user(user_id).get_daily_series(user_id, *args, **kwargs)
+
+    def get_messages(self, ids: Sequence[int], user_id: str = "default") -> Dict[int, Optional[str]]:
+        # Each shard numbers its own rows, so ids only mean something on the owner's shard.
+        return self.for_user(user_id).get_messages(ids)
+
+    def count_transactions(self, user_id: str = "default") -> int:
+        return self.for_user(user_id).count_transactions(user_id)
+
+    def get_budgets(self, user_id: str = "default") -> Dict[str, float]:
+        return self.for_user(user_id).get_budgets(user_id)
+
+    def get_spending_summary(self, user_id: str = "default", *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return self.for_user(user_id).get_spending_summary(user_id, *args, **kwargs)
+
+    def get_category_totals(self, user_id: str = "default", *args: Any, **kwargs: Any) -> Dict[str, float]:
+        return self.for_user(user_id).get_category_totals(user_id, *args, **kwargs)
+
+    def export_to_csv(self, user_id: str = "default", *args: Any, **kwargs: Any) -> str:
+        return self.for_user(user_id).export_to_csv(user_id, *args, **kwargs)
+
+    def iter_export(self, user_id: str = "default", *args: Any, **kwargs: Any) -> Iterator[bytes]:
+        return self.for_user(user_id).iter_export(user_id, *args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Rebalancing
+# ---------------------------------------------------------------------------
+
+
+def rebalance(
+    sources: Iterable[DataPersistence],
+    target: ShardedPersistence,
+    delete_source: bool = False,
+    page_rows: int = 5000,
+) -> Dict[str, int]:
+    """Copy every user in *sources* onto the shard *target* assigns them.
+
+    Works both for splitting a single-file DB and for changing the shard
+    count. Rows go through ``save_transactions``, so re-running after an
+    interruption skips what was already copied: rows with a message dedup
+    on its hash as usual, rows without one on a key built from the source
+    file and row id. ``created_at`` is reset to the copy time. Budgets and
+    webhook receipts move with the rows. Users already on their target file
+    are left alone. Returns ``{user_id: rows now on the target shard}``.
+    """
+    moved: Dict[str, int] = {}
+    for source in sources:
+        for user_id in source.user_counts():
+            destination = target.for_user(user_id)
+            if Path(destination.db_path).resolve() == Path(source.db_path).resolve():
+                continue
+            cursor: Optional[str] = None
+            while True:
+                page, cursor = source.get_transaction_page(
+                    user_id, limit=page_rows, cursor=cursor, columns=list(TRANSACTION_COLUMNS)
+                )
+                if not page.empty:
+                    unkeyed = page["original_message"].isna()
+                    page["dedup_key"] = None
+                    page.loc[unkeyed, "dedup_key"] = [
+                        f"moved:{Path(source.db_path).name}:{row_id}" for row_id in page.loc[unkeyed, "id"]
+                    ]
+                    destination.save_transactions(page, user_id)
+                if cursor is None:
+                    break
+            for period, limit_amount in source.get_budgets(user_id).items():
+                destination.save_budget(user_id, period, limit_amount)
+            destination.load_webhook_receipts(user_id, source.dump_webhook_receipts(user_id))
+            moved[user_id] = destination.user_counts().get(user_id, 0)
+            if delete_source:
+                source.delete_user_data(user_id)
+    return moved
+
+
+def open_persistence(use_columnar: bool = True) -> Union[DataPersistence, ShardedPersistence]:
+    """Build the store the app is configured for.
+
+    ``BUDGET_SHARDS`` > 1 selects sharding mode, with shard files under
+    ``BUDGET_SHARD_DIR`` (default ``data/shards``); otherwise the single-file
+    store is used as before. Processes other than the API (upload workers)
+    pass ``use_columnar=False`` so the columnar mirror keeps a single writer.
+    """
+    shard_count = int(os.getenv("BUDGET_SHARDS", "1"))
+    if shard_count <= 1:
+        return DataPersistence(use_columnar=use_columnar)
+    shard_dir = os.getenv("BUDGET_SHARD_DIR") or str(Path(__file__).resolve().parents[1] / "data" / "shards")
+    return ShardedPersistence(
+        shard_dir, shard_count, columnar_dir=os.getenv("BUDGET_COLUMNAR_DIR"), use_columnar=use_columnar
+    )
@@ -0,0 +1,198 @@
+"""
+db/write_buffer.py
+------------------
+Write-behind buffer that group-commits small transaction batches.
+
+Webhook deliveries arrive one SMS at a time; committing each on its own
+serialises every request on SQLite's write lock. The buffer collects them
+on a bounded queue and a background thread writes whatever has gathered in
+one ``insert_transactions_many`` call, either every ``flush_interval_ms`` or as
+soon as ``max_batch_rows`` rows are waiting.
+
+Public surface:
+    WriteBuffer(db, flush_interval_ms, max_batch_rows, max_queue)
+        .start()                    -> None
+        .submit(df, user_id)        -> Future[Committed]   (once committed)
+        .close(timeout)             -> None          (flushes what is queued; submit() then raises RuntimeError)
+        .stats()                    -> dict
+    Committed(total, inserted)      -> user's row count and the rows of *df* actually stored
+    BufferFull                      raised by submit() when the queue stays full
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from db.session import DataPersistence
+
+logger = logging.getLogger(__name__)
+
+# Pushed by close() to wake the flusher immediately.
+_STOP = object()
+
+
+class Committed(NamedTuple):
+    total:    int               # the user's row count after the flush
+    inserted: pd.DataFrame      # rows of the submitted df that were stored, same index
+
+
+class BufferFull(RuntimeError):
+    """The write queue stayed at capacity for the whole submit timeout."""
+
+
+class WriteBuffer:
+    def __init__(
+        self,
+        db: DataPersistence,
+        flush_interval_ms: int = 50,
+        max_batch_rows: int = 500,
+        max_queue: int = 10_000,
+    ) -> None:
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "flushes": 0,
+            "rows_flushed": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the flusher thread; calling it again is a no-op."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteBuffer is closed")
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far and stop the flusher thread for good."""
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        # A submit() that raced close() may have queued behind the stop marker.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[2].set_exception(RuntimeError("WriteBuffer closed before the batch was written"))
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def submit(self, df: pd.DataFrame, user_id: str = "default", timeout: float = 1.0) -> "Future[Committed]":
+        """Queue *df* for the next flush.
+
+        The returned future resolves to a :class:`Committed` once the batch
+        is committed, or raises whatever the write raised. Raises
+        :class:`BufferFull` if no queue slot frees up within *timeout* seconds,
+        and ``RuntimeError`` once the buffer has been closed.
+        """
+        if self._closed:
+            raise RuntimeError("WriteBuffer is closed")
+        if self._thread is None:
+            self.start()
+        future: "Future[Committed]" = Future()
+        try:
+            self._queue.put((df, user_id, future), timeout=timeout)
+        except queue.Full as exc:
+            raise BufferFull(f"Write queue is full ({self._queue.maxsize} batches)") from exc
+        return future
+
+    def stats(self) -> Dict[str, float]:
+        """Flush counters and latencies plus the current queue depth."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        flushes = snapshot["flushes"]
+        snapshot["avg_flush_ms"] = snapshot["total_flush_ms"] / flushes if flushes else 0.0
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["queue_capacity"] = self._queue.maxsize
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Flusher
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            pending: List[Tuple[pd.DataFrame, str, Future]] = []
+            rows = 0
+            deadline: Optional[float] = None
+            while rows < self.max_batch_rows:
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                pending.append(item)
+                rows += len(item[0])
+                if deadline is None:
+                    # The clock starts with the first row, so an idle buffer
+                    # never delays a lone delivery by more than one interval.
+                    deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                # Drain whatever was queued ahead of the stop marker.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        pending.append(item)
+            if pending:
+                self._flush(pending)
+
+    def _flush(self, pending: List[Tuple[pd.DataFrame, str, Future]]) -> None:
+        started = time.perf_counter()
+        try:
+            totals, inserted = self.db.insert_transactions_many([(df, user_id) for df, user_id, _ in pending])
+        except Exception as exc:
+            logger.exception("Write buffer flush of %d batches failed", len(pending))
+            with self._lock:
+                self._stats["failed_flushes"] += 1
+            for _, _, future in pending:
+                future.set_exception(exc)
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["rows_flushed"] += sum(len(df) for df, _, _ in pending)
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+            self._stats["total_flush_ms"] += elapsed_ms
+        for (_, user_id, future), rows in zip(pending, inserted):
+            future.set_result(Committed(totals[user_id], rows))
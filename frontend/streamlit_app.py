@@ -4,6 +4,7 @@ frontend/streamlit_app.py
 Main Streamlit application for the SMS Budget Tracker.
 """
 
+import io
 from pathlib import Path
 import sys
 
@@ -20,6 +21,7 @@ from datetime import datetime
 
 from core.parser import process_sms_dataframe, load_sms_xml
 from services.budgeting import daily_totals, weekly_totals, monthly_totals, current_period_status
+from db.export import encode_rows, frame_batches
 from db.session import DataPersistence
 from frontend.mobile_utils import add_pwa_meta, mobile_friendly_layout
 from services.analytics import (
@@ -64,8 +66,6 @@ _COLUMN_CANDIDATES = {
 # Bootstrap
 # ---------------------------------------------------------------------------
 
-db = DataPersistence()
-
 st.set_page_config(
     page_title="Rupee Radar",
     page_icon="◈",
@@ -73,6 +73,16 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+
+@st.cache_resource(show_spinner=False)
+def _persistence() -> DataPersistence:
+    # Streamlit re-executes this script on every interaction; one store per
+    # server process keeps the schema checks from re-running each time.
+    return DataPersistence()
+
+
+db = _persistence()
+
 add_pwa_meta()
 mobile_friendly_layout()
 
@@ -300,6 +310,25 @@ def _anomaly_card(row: pd.Series) -> str:
 </div>"""
 
 
+def _csv_buffer(df: pd.DataFrame) -> io.BytesIO:
+    """Encode *df* chunk-by-chunk into one bytes buffer (no intermediate CSV string)."""
+    buffer = io.BytesIO()
+    for chunk in encode_rows(frame_batches(df), list(df.columns), "csv"):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+def _merchant_filter(merchants: pd.Series, query: str) -> pd.Series:
+    """Boolean mask of *merchants* containing *query*, case-insensitively.
+
+    Matches against the frame on screen (not the DB, which may hold other
+    data); the substring test runs once per distinct name, not once per row.
+    """
+    names = pd.Series(merchants.dropna().unique(), dtype=object).astype(str)
+    return merchants.isin(names[names.str.contains(query, case=False, regex=False)])
+
+
 def _default_budget_limits() -> dict:
     saved = db.get_budgets()
     return {
@@ -683,7 +712,7 @@ with tab_txn:
     if type_filter != "All":
         view = view[view["transaction_type"] == type_filter]
     if merchant_q:
-        view = view[view["merchant"].str.contains(merchant_q, case=False, na=False)]
+        view = view[_merchant_filter(view["merchant"], merchant_q)]
     view = view.sort_values(sort_by, ascending=False)
 
     f_exp = view[view["transaction_type"] == "Expense"]["amount"].sum()
@@ -939,7 +968,7 @@ with tab_export:
         st.caption("All parsed transactions including message text, category, and merchant.")
         st.download_button(
             "↓  Download transactions.csv",
-            data=processed.to_csv(index=False).encode("utf-8"),
+            data=_csv_buffer(processed),
             file_name=f"transactions_{today_str}.csv", mime="text/csv", width="stretch",
         )
     with ex2:
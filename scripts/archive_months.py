@@ -0,0 +1,33 @@
+"""
+scripts/archive_months.py
+-------------------------
+Move closed months out of the main transactions table into per-month archive files.
+
+Usage:
+    python -m scripts.archive_months [--db PATH] [--keep-months N] [--before YYYY-MM]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from db.session import DataPersistence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--keep-months", type=int, default=3, help="Closed months to keep in the main table")
+    parser.add_argument("--before", default=None, help="Archive every month before this one instead")
+    args = parser.parse_args()
+
+    db = DataPersistence(db_path=args.db)
+    months = db.archive_closed_months(keep_months=args.keep_months, before=args.before)
+    if months:
+        print(f"Archived {len(months)} month(s) from {db.db_path}: {', '.join(months)}")
+    else:
+        print(f"Nothing to archive in {db.db_path}")
+
+
+if __name__ == "__main__":
+    main()
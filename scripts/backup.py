@@ -0,0 +1,110 @@
+"""
+scripts/backup.py
+-----------------
+Take, verify, restore and schedule online snapshots of the budget database.
+
+Usage:
+    python -m scripts.backup create   [--db PATH] [--dir DIR] [--keep N]
+    python -m scripts.backup verify   SNAPSHOT... [--db PATH]
+    python -m scripts.backup restore  SNAPSHOT... [--db PATH]
+    python -m scripts.backup list     [--dir DIR]
+    python -m scripts.backup schedule [--db PATH] [--dir DIR] [--keep N] [--every MINUTES]
+
+Without ``--db`` the store is opened as the app opens it: with
+``BUDGET_SHARDS`` > 1 every shard is snapshotted into its own subdirectory of
+``--dir``, and verify / restore take one snapshot per shard, in shard order.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import List, Union
+
+from db.backup import DEFAULT_PAGES, DEFAULT_SLEEP, list_snapshots, prune_snapshots
+from db.session import DataPersistence
+from db.sharding import ShardedPersistence, open_persistence
+
+DEFAULT_DIR = str(Path(__file__).resolve().parents[1] / "data" / "backups")
+
+
+Store = Union[DataPersistence, ShardedPersistence]
+
+
+def _stores(db: Store) -> List[DataPersistence]:
+    return list(db.shards) if isinstance(db, ShardedPersistence) else [db]
+
+
+def _snapshot_dirs(db: Store, backup_dir: str) -> List[str]:
+    """Where each store's snapshots live; matches ``ShardedPersistence.backup``."""
+    if isinstance(db, ShardedPersistence):
+        return [str(Path(backup_dir) / Path(shard.db_path).stem) for shard in db.shards]
+    return [backup_dir]
+
+
+def _create(db: Store, args: argparse.Namespace) -> None:
+    started = time.monotonic()
+    snapshots = db.backup(args.dir, pages=args.pages, sleep=args.sleep)
+    for snapshot in snapshots if isinstance(snapshots, list) else [snapshots]:
+        print(f"Snapshot {snapshot} written")
+    print(f"Backup took {time.monotonic() - started:.1f}s")
+    for directory in _snapshot_dirs(db, args.dir):
+        for removed in prune_snapshots(directory, args.keep):
+            print(f"Pruned {removed}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("command", choices=["create", "verify", "restore", "list", "schedule"])
+    parser.add_argument(
+        "snapshot", nargs="*", help="Snapshot directory (verify / restore); one per shard when sharded"
+    )
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Directory holding snapshots")
+    parser.add_argument("--keep", type=int, default=7, help="Snapshots to keep after each backup")
+    parser.add_argument("--every", type=float, default=60.0, help="Minutes between scheduled backups")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="Pages copied per backup step")
+    parser.add_argument("--sleep", type=float, default=DEFAULT_SLEEP, help="Seconds to yield between steps")
+    args = parser.parse_args()
+
+    db: Store = DataPersistence(db_path=args.db) if args.db else open_persistence()
+    stores = _stores(db)
+    if args.command == "list":
+        for directory in _snapshot_dirs(db, args.dir):
+            for snapshot in list_snapshots(directory):
+                print(snapshot)
+        return
+    if args.command in ("verify", "restore") and len(args.snapshot) != len(stores):
+        parser.error(f"{args.command} needs {len(stores)} SNAPSHOT argument(s), one per shard in shard order")
+
+    if args.command == "create":
+        _create(db, args)
+    elif args.command == "verify":
+        problems = [
+            f"{snapshot}: {problem}"
+            for store, snapshot in zip(stores, args.snapshot)
+            for problem in store.verify_snapshot(snapshot)
+        ]
+        for problem in problems:
+            print(problem)
+        print("Snapshot is restorable" if not problems else "Snapshot is NOT restorable")
+        raise SystemExit(1 if problems else 0)
+    elif args.command == "restore":
+        if isinstance(db, ShardedPersistence):
+            db.restore(args.snapshot, pages=args.pages, sleep=args.sleep)
+        else:
+            db.restore(args.snapshot[0], pages=args.pages, sleep=args.sleep)
+        for store, snapshot in zip(stores, args.snapshot):
+            print(f"Restored {store.db_path} from {snapshot}")
+    else:
+        while True:
+            try:
+                _create(db, args)
+            except Exception as exc:  # keep the schedule alive; the next run retries
+                print(f"Backup failed: {exc}")
+            time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+scripts/profile_queries.py
+--------------------------
+Run the common read paths for one user and print each statement's timing and query plan.
+
+Usage:
+    python -m scripts.profile_queries [--db PATH] [--user USER_ID] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+        [--category NAME] [--type Expense|Income] [--threshold-ms MS]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from db.profiling import QueryProfiler
+from db.session import DataPersistence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--user", default="default", help="User whose data is queried")
+    parser.add_argument("--start", default=None, help="Start date filter")
+    parser.add_argument("--end", default=None, help="End date filter")
+    parser.add_argument("--category", default=None, help="Category filter")
+    parser.add_argument("--type", dest="transaction_type", default=None, help="Transaction type filter")
+    parser.add_argument("--threshold-ms", type=float, default=50.0, help="Log statements slower than this")
+    args = parser.parse_args()
+
+    profiler = QueryProfiler(threshold_ms=args.threshold_ms, explain_first_seen=True)
+    db = DataPersistence(db_path=args.db, profiler=profiler)
+    # Only the read paths below should show up in the report.
+    profiler.reset()
+
+    filters = {
+        "start_date": args.start,
+        "end_date": args.end,
+        "category": args.category,
+        "transaction_type": args.transaction_type,
+    }
+    db.get_transactions(args.user, **filters)
+    db.get_transaction_page(args.user, limit=100, **filters)
+    db.get_spending_summary(args.user, args.start, args.end)
+    db.get_category_totals(args.user, args.start, args.end, args.transaction_type)
+    db.get_daily_series(args.user, args.start, args.end)
+
+    plans = profiler.plans()
+    for sql, entry in sorted(profiler.stats().items(), key=lambda item: -item[1]["total_ms"]):
+        print(
+            f"{entry['total_ms']:9.2f} ms  x{entry['count']:<3} "
+            f"(fetch {entry['fetch_ms']:.2f} ms, max {entry['max_ms']:.2f} ms)"
+        )
+        print(f"    {sql}")
+        for step in plans.get(sql, []):
+            print(f"      -> {step}")
+
+
+if __name__ == "__main__":
+    main()
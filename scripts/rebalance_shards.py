@@ -0,0 +1,48 @@
+"""
+scripts/rebalance_shards.py
+---------------------------
+Move users from existing database files onto their hash-assigned shards.
+
+Use it to split the single-file DB when turning sharding on, or to change
+the shard count (pass the old shard files as sources).
+
+Usage:
+    python -m scripts.rebalance_shards --shards N [--shard-dir DIR] [--source PATH ...] [--delete-source]
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from db.session import DataPersistence
+from db.sharding import ShardedPersistence, rebalance
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--shards", type=int, required=True, help="Target shard count")
+    parser.add_argument(
+        "--shard-dir",
+        default=str(Path(__file__).resolve().parents[1] / "data" / "shards"),
+        help="Directory holding shard_<i>.db files",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        default=[],
+        help="Database file to move users out of (repeatable; defaults to data/budget_data.db)",
+    )
+    parser.add_argument("--delete-source", action="store_true", help="Remove users from the source once copied")
+    args = parser.parse_args()
+
+    target = ShardedPersistence(args.shard_dir, args.shards)
+    sources = [DataPersistence(db_path=path) for path in (args.source or [""])]
+    moved = rebalance(sources, target, delete_source=args.delete_source)
+    for user_id, rows in moved.items():
+        print(f"{user_id}: {rows} rows on {target.for_user(user_id).db_path}")
+    print(f"Moved {len(moved)} user(s) onto {args.shards} shard(s) in {args.shard_dir}")
+
+
+if __name__ == "__main__":
+    main()
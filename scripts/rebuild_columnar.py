@@ -0,0 +1,32 @@
+"""
+scripts/rebuild_columnar.py
+---------------------------
+Rebuild (or catch up) the Parquet analytics mirror from SQLite.
+
+Usage:
+    python -m scripts.rebuild_columnar --dir PATH [--db PATH] [--incremental]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from db.session import DataPersistence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--dir", required=True, help="Root directory of the Parquet mirror")
+    parser.add_argument("--incremental", action="store_true", help="Only copy rows newer than the mirror")
+    args = parser.parse_args()
+
+    db = DataPersistence(db_path=args.db, columnar_dir=args.dir)
+    if db.columnar is None:
+        raise SystemExit("pyarrow is not installed; the columnar mirror is unavailable")
+    copied = db.sync_columnar(rebuild=not args.incremental)
+    print(f"Copied {copied} rows from {db.db_path} into {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+scripts/rebuild_rollups.py
+--------------------------
+Recompute the ``daily_rollups`` table from raw transaction rows.
+
+Usage:
+    python -m scripts.rebuild_rollups [--db PATH] [--user USER_ID]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from db.session import DataPersistence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--user", default=None, help="Only rebuild rows for this user_id")
+    args = parser.parse_args()
+
+    db = DataPersistence(db_path=args.db)
+    db.rebuild_daily_rollups(args.user)
+    scope = f"user {args.user!r}" if args.user else "all users"
+    print(f"Rebuilt daily_rollups for {scope} in {db.db_path}")
+
+
+if __name__ == "__main__":
+    main()
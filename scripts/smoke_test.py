@@ -39,7 +39,7 @@ def main() -> None:
         db.save_budget("default", "monthly", 15000.0)
         db.save_transactions(processed)
 
-        reloaded = db.get_transactions()
+        reloaded = db.get_analytics_frame()
         budgets = db.get_budgets()
 
     status = current_period_status(
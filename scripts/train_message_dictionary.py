@@ -0,0 +1,33 @@
+"""
+scripts/train_message_dictionary.py
+-----------------------------------
+Train a new compression dictionary from stored SMS bodies.
+
+New messages are compressed with the newest dictionary; existing rows keep
+the one they were written with.
+
+Usage:
+    python -m scripts.train_message_dictionary [--db PATH] [--sample N] [--size BYTES]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from db.session import DataPersistence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    parser.add_argument("--db", default="", help="SQLite file (defaults to data/budget_data.db)")
+    parser.add_argument("--sample", type=int, default=5000, help="Most recent messages to train on")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="Dictionary size in bytes")
+    args = parser.parse_args()
+
+    db = DataPersistence(db_path=args.db)
+    dict_id = db.train_message_dictionary(sample_size=args.sample, size=args.size)
+    print(f"Stored compression dictionary {dict_id} in {db.db_path}")
+
+
+if __name__ == "__main__":
+    main()
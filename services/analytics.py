@@ -6,7 +6,9 @@ Analytics, forecasting, anomaly detection, and financial health scoring.
 Public surface:
     daily_spending_series(df)                       -> pd.DataFrame
     predict_next_7_days_spend(df)                   -> pd.DataFrame
+    predict_next_7_days_spend_from_daily(daily)     -> pd.DataFrame
     average_daily_spend(df, window)                 -> float
+    average_daily_spend_from_daily(daily, window)   -> float
     detect_anomalies(df)                            -> pd.DataFrame
     calculate_financial_health_score(df, ...)       -> dict
     budget_overrun_forecast(...)                    -> dict
@@ -111,7 +113,14 @@ def predict_next_7_days_spend(df: pd.DataFrame, window: int = 14) -> pd.DataFram
     Falls back to a simple weighted average when fewer than 3 data points
     exist, and returns an empty DataFrame when there is no history at all.
     """
-    daily = daily_spending_series(df)
+    return predict_next_7_days_spend_from_daily(daily_spending_series(df), window)
+
+
+def predict_next_7_days_spend_from_daily(daily: pd.DataFrame, window: int = 14) -> pd.DataFrame:
+    """
+    :func:`predict_next_7_days_spend` for a precomputed [date, amount] day
+    series, such as ``DataPersistence.get_daily_series``.
+    """
     if daily.empty:
         return pd.DataFrame(columns=["date", "predicted_amount"])
 
@@ -152,7 +161,11 @@ def predict_next_7_days_spend(df: pd.DataFrame, window: int = 14) -> pd.DataFram
 
 def average_daily_spend(df: pd.DataFrame, window: int = 14) -> float:
     """Return weighted average daily spend over the last *window* days."""
-    daily = daily_spending_series(df)
+    return average_daily_spend_from_daily(daily_spending_series(df), window)
+
+
+def average_daily_spend_from_daily(daily: pd.DataFrame, window: int = 14) -> float:
+    """:func:`average_daily_spend` for a precomputed [date, amount] day series."""
     if daily.empty:
         return 0.0
 
@@ -198,7 +211,7 @@ def detect_anomalies(df: pd.DataFrame) -> pd.DataFrame:
 
     # Stage 1 — per-category IQR
     if "category" in expenses.columns:
-        for cat, group in expenses.groupby("category"):
+        for cat, group in expenses.groupby("category", observed=True):
             if len(group) < 4:
                 # Too few samples for a reliable IQR fence — skip category filter,
                 # let the global z-score handle these.
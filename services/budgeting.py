@@ -9,6 +9,10 @@ Public surface:
     weekly_totals(df)                                   -> pd.DataFrame
     monthly_totals(df)                                  -> pd.DataFrame
     current_period_status(df, daily, weekly, monthly)   -> dict
+    current_period_status_from_daily(daily_df, ...)     -> dict
+
+The ``*_from_daily`` variants take a [date, amount] day series — e.g. from
+``DataPersistence.get_daily_series`` — instead of raw transaction rows.
 """
 
 from __future__ import annotations
@@ -107,15 +111,31 @@ def current_period_status(
     All ``*_remaining`` values are ``None`` when the corresponding limit is 0
     (i.e. unset), so callers can distinguish "no limit" from "₹0 left".
     """
-    exp = _expenses(df)
+    return current_period_status_from_daily(
+        daily_totals(df), daily_limit, weekly_limit, monthly_limit
+    )
+
+
+def current_period_status_from_daily(
+    daily: pd.DataFrame,
+    daily_limit: float,
+    weekly_limit: float,
+    monthly_limit: float,
+) -> dict:
+    """
+    Same result as :func:`current_period_status`, computed from a [date, amount]
+    expense day series. Only the current month needs to be present in *daily*.
+    """
+    days    = pd.to_datetime(daily["date"], errors="coerce").dt.date
+    amounts = pd.to_numeric(daily["amount"], errors="coerce")
 
     today       = pd.Timestamp.today().normalize()
     week_start  = (today - pd.Timedelta(days=today.weekday())).date()
     month_start = today.replace(day=1).date()
 
-    day_total   = float(exp[exp["date"].dt.date == today.date()]["amount"].sum())
-    week_total  = float(exp[exp["date"].dt.date >= week_start]["amount"].sum())
-    month_total = float(exp[exp["date"].dt.date >= month_start]["amount"].sum())
+    day_total   = float(amounts[days == today.date()].sum())
+    week_total  = float(amounts[days >= week_start].sum())
+    month_total = float(amounts[days >= month_start].sum())
 
     def _remaining(limit: float, total: float) -> Optional[float]:
         return (limit - total) if limit > 0 else None
@@ -127,4 +147,4 @@ def current_period_status(
         "day_remaining":   _remaining(daily_limit,   day_total),
         "week_remaining":  _remaining(weekly_limit,  week_total),
         "month_remaining": _remaining(monthly_limit, month_total),
-    }
\ No newline at end of file
+    }
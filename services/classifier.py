@@ -9,6 +9,7 @@ Public surface:
     classify_transaction_type(message)  -> "Income" | "Expense"
     classify_category(message)          -> str
     classify_category_by_keywords(message) -> str
+    load_category_model()               -> bool  (eager load, e.g. at app startup)
 """
 
 from __future__ import annotations
@@ -19,6 +20,8 @@ from typing import Optional
 
 import joblib
 
+from services.metrics import metrics
+
 # ---------------------------------------------------------------------------
 # Transaction-type keywords
 # NOTE: institutional/fee/student terms deliberately excluded here —
@@ -195,8 +198,18 @@ def classify_transaction_type(message: str) -> str:
 
 def classify_category(message: str) -> str:
     """Return the spending category for *message*, using ML then keyword fallback."""
-    prediction = _predict_category_with_model(message)
-    return prediction if prediction else classify_category_by_keywords(message)
+    with metrics.timer("pipeline_stage_seconds", stage="classify"):
+        prediction = _predict_category_with_model(message)
+        return prediction if prediction else classify_category_by_keywords(message)
+
+
+def load_category_model() -> bool:
+    """Load the optional ML category model now rather than on the first message.
+
+    Returns whether a model is available.
+    """
+    _load_category_model()
+    return _CATEGORY_PIPELINE is not None or (_CATEGORY_MODEL is not None and _CATEGORY_VECTORIZER is not None)
 
 
 def classify_category_by_keywords(message: str) -> str:
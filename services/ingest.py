@@ -0,0 +1,151 @@
+"""
+services/ingest.py
+------------------
+Parse an uploaded SMS export and persist its transactions in chunks.
+
+Runs inside the upload worker processes started by ``api/jobs.py``, so it
+imports nothing from ``api``. Progress is written to the job's row in
+``db.jobs.JobStore`` after every chunk.
+
+Public surface:
+    detect_columns(columns)                          -> (message_col, date_col, sender_col)
+    iter_raw_chunks(path, filename, chunk_rows)      -> Iterator[pd.DataFrame]
+    ingest_file(path, filename, db, user_id, on_progress, chunk_rows) -> int   (user's row count)
+    run_upload_job(job_id, jobs_db, path, filename, user_id)          -> dict  (worker entry point; metrics snapshot)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import ParseError
+
+import pandas as pd
+
+from core.parser import iter_sms_xml, process_sms_dataframe
+from db.jobs import JobStore
+from db.session import DataPersistence
+from db.sharding import ShardedPersistence, open_persistence
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Raw SMS rows extracted and committed per step; each step is one progress update.
+DEFAULT_CHUNK_ROWS = 2000
+
+_MESSAGE_CANDIDATES = ["body", "content", "message", "sms", "text"]
+_DATE_CANDIDATES    = ["date", "readable_date", "datetime", "timestamp", "time"]
+_SENDER_CANDIDATES  = ["address", "sender", "from", "contact_name"]
+
+# (rows_read, rows_parsed, rows_saved)
+ProgressCallback = Callable[[int, int, int], None]
+
+# One store per worker process, opened on its first job.
+_worker_db: Optional[Union[DataPersistence, ShardedPersistence]] = None
+
+
+def _first_match(columns: List[str], candidates: List[str]) -> Optional[str]:
+    lowered = {c.lower(): c for c in columns}
+    for key in candidates:
+        if key in lowered:
+            return lowered[key]
+    return None
+
+
+def detect_columns(columns: List[str]) -> Tuple[str, str, Optional[str]]:
+    """Pick the message, date and (optional) sender columns; ``ValueError`` if unusable."""
+    message_col = _first_match(columns, _MESSAGE_CANDIDATES)
+    date_col    = _first_match(columns, _DATE_CANDIDATES)
+    sender_col  = _first_match(columns, _SENDER_CANDIDATES)
+    if not message_col or not date_col:
+        raise ValueError("Could not detect required columns (message body / date).")
+    return message_col, date_col, sender_col
+
+
+def iter_raw_chunks(path: str, filename: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Raw SMS rows from a CSV or XML export, *chunk_rows* at a time."""
+    if filename.lower().endswith(".xml"):
+        with open(path, "rb") as handle:
+            yield from iter_sms_xml(handle, chunk_rows)
+    else:
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+
+
+def ingest_file(
+    path: str,
+    filename: str,
+    db: Union[DataPersistence, ShardedPersistence],
+    user_id: str = "default",
+    on_progress: Optional[ProgressCallback] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """Extract transactions from the CSV/XML export at *path* and save them.
+
+    The file is read incrementally, *chunk_rows* raw messages at a time, so
+    memory use does not grow with the file. Each chunk is committed on its
+    own: a failure part-way keeps what was already saved and a retry skips
+    it through the store's dedup. Returns the user's total row count afterwards.
+    """
+    total = db.count_transactions(user_id)
+    rows_read = rows_parsed = rows_saved = 0
+    columns: Optional[Tuple[str, str, Optional[str]]] = None
+    chunks = iter_raw_chunks(path, filename, chunk_rows)
+    while True:
+        with metrics.timer("pipeline_stage_seconds", stage="read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        metrics.inc("pipeline_rows_total", len(chunk), stage="read")
+        if columns is None:
+            columns = detect_columns(list(chunk.columns))
+        message_col, date_col, sender_col = columns
+        processed = process_sms_dataframe(chunk, message_col, date_col, sender_col)
+        if not processed.empty:
+            # Count this upload's own inserts; the total also moves with other writers.
+            total, inserted = db.insert_transactions(processed, user_id)
+            rows_saved += len(inserted)
+        rows_read += len(chunk)
+        rows_parsed += len(processed)
+        if on_progress is not None:
+            on_progress(rows_read, rows_parsed, rows_saved)
+    return total
+
+
+def run_upload_job(job_id: str, jobs_db: str, path: str, filename: str, user_id: str = "default") -> Dict[str, Any]:
+    """Process one queued upload; outcome and counters land in the job row.
+
+    The spooled upload at *path* is removed afterwards either way. Returns
+    the stage metrics this job recorded in the worker, for the parent to merge.
+    """
+    global _worker_db
+    jobs = JobStore(jobs_db)
+    jobs.start(job_id)
+    try:
+        if _worker_db is None:
+            # The API process owns the columnar mirror and syncs it when the job finishes.
+            _worker_db = open_persistence(use_columnar=False)
+        total = ingest_file(
+            path,
+            filename,
+            _worker_db,
+            user_id,
+            on_progress=lambda read, parsed, saved: jobs.progress(job_id, read, parsed, saved),
+        )
+        jobs.finish(job_id, total_in_db=total)
+    except (ValueError, ParseError) as exc:
+        # Unusable file (missing columns, bad CSV); nothing for the operator to fix.
+        logger.warning("Upload job %s rejected: %s", job_id, exc)
+        jobs.finish(job_id, error=f"{type(exc).__name__}: {exc}")
+    except Exception as exc:
+        logger.exception("Upload job %s failed", job_id)
+        jobs.finish(job_id, error=f"{type(exc).__name__}: {exc}")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    snapshot = metrics.snapshot()
+    metrics.reset()
+    return snapshot
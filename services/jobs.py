@@ -0,0 +1,93 @@
+"""
+services/jobs.py
+----------------
+Background upload processing on a local process pool.
+
+``/upload-sms`` streams the file to ``data/uploads/`` (see ``api/uploads.py``)
+and hands it to a worker process, then returns a job id straight away; ``GET /jobs/{id}``
+reports progress from the job table the worker keeps updated. Workers are
+spawned (not forked) so they never inherit the API's threads, and the pool is
+only started on the first upload.
+
+Public surface:
+    JobQueue(store, max_workers)
+        .submit(path, filename, user_id)   -> job id
+        .stats()                           -> dict   (in-flight jobs, pool size)
+        .shutdown()                        -> None
+        .on_finished                       -> Optional[Callable[[user_id], None]]
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from db.jobs import JobStore
+from services.ingest import run_upload_job
+from services.metrics import metrics
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, max_workers: int = 2) -> None:
+        self.store = store
+        self.max_workers = max_workers
+        self.upload_dir = Path(store.path).parent / "uploads"
+        # Called with the user id once a job ends, so this process can
+        # invalidate whatever it derived from that user's data.
+        self.on_finished: Optional[Callable[[str], None]] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def submit(self, path: Path, filename: str, user_id: str = "default") -> str:
+        """Queue the upload spooled at *path*; returns the job id.
+
+        The worker deletes *path* when it is done with it.
+        """
+        job_id = self.store.create(filename, user_id)
+        args = (job_id, self.store.path, str(path), filename, user_id)
+        try:
+            future = self._executor().submit(run_upload_job, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge file); start a fresh pool.
+            self._pool = None
+            future = self._executor().submit(run_upload_job, *args)
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(lambda f: self._on_done(job_id, user_id, path, f))
+        return job_id
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _on_done(self, job_id: str, user_id: str, path: Path, future: Future) -> None:
+        # run_upload_job records its own errors; this only fires if the worker died.
+        with self._lock:
+            self._in_flight -= 1
+        exc = future.exception()
+        if exc is not None:
+            self.store.finish(job_id, error=f"Worker failed: {exc!r}")
+            path.unlink(missing_ok=True)
+        else:
+            # Stage timings recorded inside the worker process.
+            metrics.merge(future.result())
+        if self.on_finished is not None:
+            self.on_finished(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Jobs submitted but not yet finished (queued or running), and pool size."""
+        with self._lock:
+            return {"in_flight": self._in_flight, "workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,228 @@
+"""
+services/metrics.py
+-------------------
+Process-wide counters and latency histograms, rendered in the Prometheus
+text exposition format.
+
+Pipeline code times its stages with ``metrics.timer("pipeline_stage_seconds",
+stage=...)``: upload_receive, read, parse (includes classify), insert
+(includes dedup) and analytics. The API adds per-route request timings.
+Components that already keep their own numbers (response cache, write
+buffer, job queue) register a *collector* that is only called when
+``/metrics`` is scraped.
+
+Set ``BUDGET_METRICS=0`` to disable recording: ``timer`` then hands out a
+shared no-op context manager and ``inc`` / ``observe`` return immediately,
+so instrumented code pays one attribute check. Collectors still report.
+
+Upload workers run in other processes; they ship their registry back with
+each job result (``snapshot`` / ``merge``) so their stages show up here too.
+
+Public surface:
+    metrics                                  -> MetricsRegistry (process default)
+    MetricsRegistry(enabled)
+        .inc(name, value, **labels)          -> None
+        .observe(name, seconds, **labels)    -> None
+        .timer(name, **labels)               -> context manager
+        .describe(name, help)                -> None
+        .add_collector(fn)                   -> None   (fn() -> Iterable[MetricFamily])
+        .remove_collector(fn)                -> None
+        .snapshot() / .merge(snapshot) / .reset()
+        .render()                            -> str    (Prometheus text format)
+    MetricFamily(name, type, help, samples)  -> NamedTuple for collectors
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds; +Inf is implicit.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_NOOP = nullcontext()
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str                                   # "counter" | "gauge"
+    help: str
+    samples: List[Tuple[Dict[str, Any], float]]
+
+
+class _Timer:
+    __slots__ = ("_registry", "_name", "_labels", "_started")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, Any]) -> None:
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._registry.observe(self._name, time.perf_counter() - self._started, **self._labels)
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [bucket counts..., +Inf count, sum]
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(LATENCY_BUCKETS)] += 1
+            state[-1] += seconds
+
+    def timer(self, name: str, **labels: Any):
+        """``with metrics.timer(name, stage="insert"):`` records the block's duration."""
+        return _Timer(self, name, labels) if self.enabled else _NOOP
+
+    def describe(self, name: str, help: str) -> None:
+        self._help[name] = help
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    # ------------------------------------------------------------------
+    # Cross-process transfer
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Picklable copy of the recorded counters and histograms."""
+        with self._lock:
+            return {
+                "counters": {n: dict(s) for n, s in self._counters.items()},
+                "histograms": {n: {k: list(v) for k, v in s.items()} for n, s in self._histograms.items()},
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Add another registry's :meth:`snapshot` into this one."""
+        if not self.enabled or not snapshot:
+            return
+        with self._lock:
+            for name, series in snapshot.get("counters", {}).items():
+                mine = self._counters.setdefault(name, {})
+                for key, value in series.items():
+                    mine[key] = mine.get(key, 0.0) + value
+            for name, series in snapshot.get("histograms", {}).items():
+                mine_h = self._histograms.setdefault(name, {})
+                for key, state in series.items():
+                    current = mine_h.setdefault(key, [0.0] * len(state))
+                    for i, value in enumerate(state):
+                        current[i] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {n: {k: list(v) for k, v in s.items()} for n, s in self._histograms.items()}
+
+        for name in sorted(counters):
+            lines.extend(self._header(name, "counter"))
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name in sorted(histograms):
+            lines.extend(self._header(name, "histogram"))
+            for key, state in sorted(histograms[name].items()):
+                cumulative = 0.0
+                for bound, count in zip(LATENCY_BUCKETS, state):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', repr(bound)),))} {_format_value(cumulative)}")
+                cumulative += state[len(LATENCY_BUCKETS)]
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(key)} {state[-1]!r}")
+                lines.append(f"{name}_count{_format_labels(key)} {_format_value(cumulative)}")
+
+        for family in self._collect():
+            lines.extend(self._header(family.name, family.type, family.help))
+            for labels, value in family.samples:
+                lines.append(f"{family.name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _collect(self) -> Iterator[MetricFamily]:
+        for collector in list(self._collectors):
+            try:
+                yield from collector()
+            except Exception:
+                logger.exception("Metrics collector %r failed", collector)
+
+    def _header(self, name: str, kind: str, help: Optional[str] = None) -> List[str]:
+        text = help or self._help.get(name)
+        return ([f"# HELP {name} {text}"] if text else []) + [f"# TYPE {name} {kind}"]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in key) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = MetricsRegistry(enabled=os.getenv("BUDGET_METRICS", "1") != "0")
+metrics.describe("pipeline_stage_seconds", "Time spent per ingest/analytics pipeline stage")
+metrics.describe("pipeline_rows_total", "Rows processed per pipeline stage")
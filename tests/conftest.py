@@ -0,0 +1,33 @@
+"""
+tests/conftest.py
+-----------------
+Shared fixtures: a throwaway store and an API client bound to it.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.context
+from db.session import DataPersistence
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> DataPersistence:
+    return DataPersistence(str(tmp_path / "budget.db"))
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    db_path = str(tmp_path / "budget.db")
+    monkeypatch.setenv("BUDGET_JOBS_DB", str(tmp_path / "jobs.db"))
+    monkeypatch.delenv("WEBHOOK_TOKEN", raising=False)
+    monkeypatch.setattr(api.context, "open_persistence", lambda: DataPersistence(db_path))
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,121 @@
+"""
+tests/test_migrations.py
+------------------------
+Opening a version-1 database (text dates, inline category / merchant /
+message columns) steps it to the current schema without losing rows.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import db.session
+from db.session import SCHEMA_VERSION, DataPersistence
+
+# The original layout, before epoch dates, lookup tables and message_bodies.
+_V1_DDL = """
+    CREATE TABLE transactions (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        date             TEXT    NOT NULL,
+        amount           REAL    NOT NULL,
+        transaction_type TEXT    NOT NULL,
+        category         TEXT    NOT NULL,
+        merchant         TEXT,
+        original_message TEXT,
+        created_at       TEXT    DEFAULT CURRENT_TIMESTAMP,
+        user_id          TEXT    DEFAULT 'default'
+    );
+    CREATE TABLE budgets (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id      TEXT DEFAULT 'default',
+        period       TEXT NOT NULL,
+        limit_amount REAL NOT NULL,
+        created_at   TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at   TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, period)
+    );
+    CREATE TABLE custom_categories (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id       TEXT DEFAULT 'default',
+        category_name TEXT NOT NULL,
+        keywords      TEXT,
+        created_at    TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+_V1_ROWS = [
+    ("2024-01-05 09:30:00", 250.0, "Expense", "Food", "Swiggy", "Rs.250 paid to Swiggy order A1", "default"),
+    ("2024-01-06 18:00:00", 1200.0, "Expense", "Shopping", None, "Rs.1200 spent on card XX12", "default"),
+    ("2024-02-01 10:00:00", 50000.0, "Income", "Salary", "Acme", "Salary of Rs.50000 credited", "default"),
+    ("2024-01-07 12:00:00", 80.0, "Expense", "Food", "Swiggy", None, "other"),
+]
+
+
+@pytest.fixture
+def v1_db(tmp_path: Path) -> str:
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(_V1_DDL)
+    conn.executemany(
+        "INSERT INTO transactions (date, amount, transaction_type, category, merchant, original_message, user_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        _V1_ROWS,
+    )
+    conn.execute("INSERT INTO budgets (user_id, period, limit_amount) VALUES ('default', 'monthly', 20000)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_v1_database_is_migrated_to_current_schema(v1_db):
+    store = DataPersistence(v1_db)
+
+    conn = sqlite3.connect(v1_db)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        assert {"category_id", "merchant_id", "dedup_key"} <= columns
+        assert not {"category", "merchant", "original_message"} & columns
+        assert conn.execute("SELECT COUNT(*) FROM message_bodies").fetchone()[0] == len(_V1_ROWS)
+    finally:
+        conn.close()
+
+    df = store.get_transactions(
+        "default", columns=["id", "date", "amount", "category", "merchant", "original_message"]
+    ).sort_values("id")
+    assert df["date"].tolist() == pd.to_datetime([r[0] for r in _V1_ROWS[:3]]).tolist()
+    assert df["amount"].tolist() == [r[1] for r in _V1_ROWS[:3]]
+    assert df["category"].astype(str).tolist() == ["Food", "Shopping", "Salary"]
+    assert df["merchant"].astype(object).where(df["merchant"].notna(), None).tolist() == ["Swiggy", None, "Acme"]
+    assert df["original_message"].tolist() == [r[5] for r in _V1_ROWS[:3]]
+    assert store.count_transactions("other") == 1
+    assert store.get_budgets("default")["monthly"] == 20000
+
+
+def test_migrated_rows_are_searchable_rolled_up_and_deduplicated(v1_db):
+    store = DataPersistence(v1_db)
+
+    assert len(store.search_transactions("order A1", "default")) == 1
+    daily = store.get_daily_series("default", start_date="2024-01-01")
+    assert daily["amount"].sum() == pytest.approx(1450.0)
+
+    first = _V1_ROWS[0]
+    again = pd.DataFrame([{
+        "date": first[0], "amount": first[1], "transaction_type": first[2],
+        "category": first[3], "merchant": first[4], "original_message": first[5],
+    }])
+    assert store.save_transactions(again, "default") == 3
+
+
+def test_reopening_a_migrated_database_changes_nothing(v1_db, monkeypatch):
+    before = DataPersistence(v1_db).get_transactions("default", columns=["id", "date", "amount", "original_message"])
+
+    # Forget that this file was prepared, so opening it runs every step again.
+    monkeypatch.setattr(db.session, "_READY_SCHEMAS", {})
+    after = DataPersistence(v1_db).get_transactions("default", columns=["id", "date", "amount", "original_message"])
+
+    pd.testing.assert_frame_equal(before, after)
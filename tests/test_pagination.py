@@ -0,0 +1,92 @@
+"""
+tests/test_pagination.py
+------------------------
+Keyset paging over ``(date, id)``: pages through ties, new rows and
+archived months without gaps or repeats, and through GET /transactions.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+import pandas as pd
+import pytest
+
+
+def _rows(dates: List[str], start: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": dates,
+        "amount": [float(start + i + 1) for i in range(len(dates))],
+        "transaction_type": "Expense",
+        "category": "Food",
+        "merchant": "Shop",
+        "original_message": [f"Paid Rs.{start + i + 1} ref {start + i}" for i in range(len(dates))],
+    })
+
+
+def _all_pages(store, limit: int, user_id: str = "u") -> List[pd.DataFrame]:
+    pages, cursor = [], None
+    while True:
+        page, cursor = store.get_transaction_page(user_id, limit=limit, cursor=cursor, columns=["id", "date"])
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_split_ties_on_date_by_id(store):
+    # Ten rows share one timestamp, so only the id orders them.
+    store.save_transactions(_rows(["2024-05-01 09:00:00"] * 10 + ["2024-05-02 09:00:00"] * 3), "u")
+
+    pages = _all_pages(store, limit=4)
+
+    assert [len(p) for p in pages] == [4, 4, 4, 1]
+    seen = pd.concat(pages, ignore_index=True)
+    assert seen["id"].is_unique and len(seen) == 13
+    keys = list(zip(seen["date"], seen["id"]))
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_last_full_page_has_no_next_cursor(store):
+    store.save_transactions(_rows(["2024-05-01"] * 6), "u")
+
+    assert [len(p) for p in _all_pages(store, limit=3)] == [3, 3]
+
+
+def test_rows_inserted_mid_walk_do_not_shift_later_pages(store):
+    store.save_transactions(_rows([f"2024-05-{d:02d}" for d in range(1, 9)]), "u")
+    first, cursor = store.get_transaction_page("u", limit=3, columns=["id"])
+
+    store.save_transactions(_rows(["2024-06-01", "2024-06-02"], start=100), "u")
+    rest, cursor = store.get_transaction_page("u", limit=10, cursor=cursor, columns=["id"])
+
+    assert cursor is None
+    assert set(first["id"]).isdisjoint(rest["id"])
+    assert len(first) + len(rest) == 8
+
+
+def test_pages_continue_into_archived_months(store):
+    store.save_transactions(_rows([d.strftime("%Y-%m-%d") for d in pd.date_range("2024-01-01", periods=61)]), "u")
+    assert store.archive_closed_months(before="2024-03") == ["2024-01", "2024-02"]
+
+    seen = pd.concat(_all_pages(store, limit=7), ignore_index=True)
+
+    assert len(seen) == 61 and seen["id"].is_unique
+    assert seen["date"].is_monotonic_decreasing
+
+
+def test_transactions_endpoint_follows_next_cursor(client):
+    for i in range(5):
+        client.post("/webhooks/sms", json={"body": f"Rs.{i + 1}00 debited from a/c XX1234 at SWIGGY", "id": f"m{i}"})
+
+    first = client.get("/transactions", params={"limit": 3}).json()
+    second = client.get("/transactions", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    assert len(first["items"]) == 3 and first["next_cursor"]
+    assert len(second["items"]) == 2 and second["next_cursor"] is None
+    ids = [item["id"] for item in first["items"] + second["items"]]
+    assert len(set(ids)) == 5
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "!!"])
+def test_transactions_endpoint_rejects_bad_cursor(client, cursor):
+    assert client.get("/transactions", params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,56 @@
+"""
+tests/test_search.py
+--------------------
+Substring search and merchant matching, before and after months are archived.
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def history(store):
+    dates = pd.date_range("2024-01-01", periods=61)
+    store.save_transactions(
+        pd.DataFrame({
+            "date": dates.strftime("%Y-%m-%d"),
+            "amount": [float(i + 1) for i in range(61)],
+            "transaction_type": "Expense",
+            "category": "Food",
+            "merchant": ["Swiggy" if i == 3 else "Other" for i in range(61)],
+            "original_message": [f"Paid Rs.{i + 1} order ZX{i:03d}" for i in range(61)],
+        }),
+        "u",
+    )
+    return store
+
+
+def test_search_covers_archived_months(history):
+    assert len(history.search_transactions("ZX003", "u")) == 1
+    assert history.archive_closed_months(before="2024-03") == ["2024-01", "2024-02"]
+
+    assert len(history.search_transactions("zx003", "u")) == 1
+    assert len(history.search_transactions("ZX060", "u")) == 1
+    assert len(history.search_transactions("swig", "u", field="merchant")) == 1
+    assert history.search_transactions("ZX003", "u", field="merchant").empty
+
+
+def test_search_pages_across_partitions_newest_first(history):
+    history.archive_closed_months(before="2024-03")
+    seen, cursor = [], None
+    while True:
+        page, cursor = history.get_transaction_page("u", limit=7, cursor=cursor, search="order")
+        seen.extend(page["id"])
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 61
+    dates = history.get_transactions("u", search="order")["date"]
+    assert dates.is_monotonic_decreasing
+
+
+def test_matching_merchants_includes_archived_only_merchants(history):
+    history.archive_closed_months(before="2024-03")
+    assert history.matching_merchants("swig", "u") == ["Swiggy"]
+    assert history.matching_merchants("swig", "someone-else") == []
@@ -0,0 +1,86 @@
+"""
+tests/test_webhooks.py
+----------------------
+/webhooks/sms and /webhooks/sms/batch: parsing, idempotent replays and
+per-message results.
+"""
+
+from __future__ import annotations
+
+SMS = "Rs.{} debited from a/c XX1234 at SWIGGY"
+
+
+def test_single_replay_returns_stored_result_with_current_total(client):
+    first = client.post("/webhooks/sms", json={"body": SMS.format(100), "id": "sid-1"})
+    assert first.status_code == 200
+    assert first.json()["saved"] == 1
+    client.post("/webhooks/sms", json={"body": SMS.format(200), "id": "sid-2"})
+
+    replay = client.post("/webhooks/sms", json={"body": SMS.format(100), "id": "sid-1"})
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["transaction"] == first.json()["transaction"]
+    assert replay.json()["total_in_db"] == 2
+
+
+def test_single_duplicate_without_id_is_not_saved_twice(client):
+    client.post("/webhooks/sms", json={"body": SMS.format(100), "date": "2024-03-06 10:00:00"})
+    again = client.post("/webhooks/sms", json={"body": SMS.format(100), "date": "2024-03-06 10:00:00"}).json()
+    assert again["accepted"] is True
+    assert again["saved"] == 0
+    assert again["total_in_db"] == 1
+
+
+def test_batch_reports_one_result_per_message(client):
+    body = client.post(
+        "/webhooks/sms/batch",
+        json=[
+            {"body": SMS.format(100), "id": "a"},
+            {"body": "hello there", "id": "b"},
+            {"id": "c"},
+            "not an object",
+            {"body": SMS.format(100), "id": "a"},
+        ],
+    ).json()
+    results = body["results"]
+    assert body["received"] == 5
+    assert body["accepted"] == 1
+    assert body["total_in_db"] == 1
+    assert results[0]["accepted"] is True and results[0]["saved"] == 1
+    assert results[1]["accepted"] is False and "message" in results[1]
+    assert results[2]["error"] == "Missing SMS body"
+    assert results[3]["error"] == "Payload must be a JSON object"
+    assert results[4]["duplicate_of"] == 0 and results[4]["saved"] == 0
+
+
+def test_batch_replays_seen_message_ids(client):
+    client.post("/webhooks/sms/batch", json=[{"body": SMS.format(100), "id": "a"}])
+    body = client.post(
+        "/webhooks/sms/batch",
+        json=[{"body": SMS.format(100), "id": "a"}, {"body": SMS.format(300), "id": "d"}],
+    ).json()
+    assert body["replayed"] == 1
+    assert body["results"][0]["replayed"] is True
+    assert "total_in_db" not in body["results"][0]
+    assert body["results"][1]["saved"] == 1
+    assert body["total_in_db"] == 2
+
+
+def test_batch_with_mixed_timestamp_formats(client):
+    payload = [
+        {"body": SMS.format(100), "date": "2024-03-06T10:00:00Z", "MessageSid": "m1"},
+        {"body": SMS.format(200), "date": "2024-03-06 11:00:00", "MessageSid": "m2"},
+        {"body": SMS.format(300), "date": "not a date", "MessageSid": "m3"},
+    ]
+    response = client.post("/webhooks/sms/batch", json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["saved"] for r in results[:2]] == [1, 1]
+    assert all(r["transaction"]["date"] != "NaT" for r in results[:2])
+    assert results[2]["accepted"] is False and results[2]["saved"] == 0
+    assert "error" in results[2]
+    assert response.json()["total_in_db"] == 2
+
+    # Receipts were stored, so a gateway retry is answered without re-parsing.
+    retry = client.post("/webhooks/sms/batch", json=payload).json()
+    assert retry["replayed"] == 3
+    assert retry["total_in_db"] == 2